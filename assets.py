@@ -0,0 +1,62 @@
+import os
+import time
+import config
+from tkinter import PhotoImage
+from utils.logging_config import logger
+
+
+IMAGE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "images")
+
+images = {}
+stats = {'local': 0, 'cache': 0, 'remote': 0, 'seconds': 0.0}
+
+
+def load_image(name):
+    #decoded PhotoImages are kept by name so each file is read and decoded once
+    if name in images:
+        return images[name]
+
+    start = time.perf_counter()
+
+    path = os.path.join(IMAGE_DIR, name)
+    if os.path.exists(path):
+        stats['local'] += 1
+    else:
+        path = cached_download(name)
+
+    image = PhotoImage(file=path)
+    images[name] = image
+
+    stats['seconds'] += time.perf_counter() - start
+    return image
+
+
+def cached_download(name):
+    path = os.path.join(config.IMAGE_CACHE_DIR, name)
+    if os.path.exists(path):
+        stats['cache'] += 1
+        return path
+
+    #only reached when images/ is incomplete, so requests is imported here
+    import requests
+
+    url = config.IMAGE_URL + name
+    logger.warning(f"Image {name} missing from {IMAGE_DIR}, downloading {url}")
+    response = requests.get(url, timeout=config.IMAGE_TIMEOUT)
+    response.raise_for_status()
+
+    os.makedirs(config.IMAGE_CACHE_DIR, exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(response.content)
+    os.replace(tmp_path, path)
+
+    stats['remote'] += 1
+    return path
+
+
+def report():
+    message = (f"Loaded {len(images)} images in {stats['seconds'] * 1000:.1f} ms "
+               f"(local: {stats['local']}, cache: {stats['cache']}, remote: {stats['remote']})")
+    logger.info(message)
+    return message
@@ -0,0 +1,76 @@
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+import numpy as np
+import config
+import job_api
+import job_queue
+
+
+async def post(port, payload):
+    #(status, body, seconds) for one POST /jobs on a fresh connection, like an office PC would
+    start = time.perf_counter()
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    body = json.dumps(payload).encode()
+    writer.write(f"POST /jobs HTTP/1.1\r\nHost: 127.0.0.1\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(body)}\r\n\r\n".encode() + body)
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body) if body else None, time.perf_counter() - start
+
+
+async def submit_all(port, count, clients):
+    limit = asyncio.Semaphore(clients)
+
+    async def one(i):
+        async with limit:
+            return await post(port, {'name': f"load {i}", 'horizontal': 12 + i % 24, 'vertical': 12 + i % 12})
+
+    return await asyncio.gather(*(one(i) for i in range(count)))
+
+
+def load(count=500, clients=20):
+    #submissions per second and latency with `clients` PCs posting at once, and a check
+    #that every accepted job landed in the queue exactly once
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "jobs.db")
+        api = job_api.JobApi("127.0.0.1", 0, path).start()
+
+        start = time.perf_counter()
+        responses = asyncio.run(submit_all(api.port, count, clients))
+        elapsed = time.perf_counter() - start
+
+        bad = asyncio.run(post(api.port, {'horizontal': config.MAX_HORIZONTAL + 1, 'vertical': 10}))
+        api.stop()
+
+        accepted = [body['id'] for status, body, _ in responses if status == 201]
+        queued = [job.id for job in job_queue.pending(path)]
+        if len(accepted) != count or sorted(accepted) != queued or len(set(queued)) != count:
+            raise RuntimeError(f"{len(accepted)} of {count} accepted, {len(queued)} in the queue")
+        if bad[0] != 400:
+            raise RuntimeError(f"an oversized cut got {bad[0]}, expected 400")
+
+    latencies = np.array([seconds for _, _, seconds in responses])
+    return {'jobs_per_s': count / elapsed,
+            'p50_ms': np.percentile(latencies, 50) * 1e3,
+            'p99_ms': np.percentile(latencies, 99) * 1e3}
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Load test the job API on a throwaway queue")
+    parser.add_argument("--jobs", type=int, default=500)
+    parser.add_argument("--clients", type=int, default=20)
+    args = parser.parse_args()
+
+    results = load(args.jobs, args.clients)
+    print(f"{args.jobs} jobs from {args.clients} clients: {results['jobs_per_s']:.0f} jobs/s, "
+          f"p50 {results['p50_ms']:.1f} ms, p99 {results['p99_ms']:.1f} ms")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,90 @@
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+import config
+import gcode
+import gpio_backend
+import motor
+import planner
+
+
+def write_program(path, lines, seed=0):
+    #a wandering contour of short feed moves, with the odd rapid to a new start point
+    rng = random.Random(seed)
+    x, y = config.MAX_HORIZONTAL / 2, config.MAX_VERTICAL / 2
+    with open(path, "w") as f:
+        f.write("%\n(generated benchmark program)\nG20 G90\nF120\n")
+        for number in range(lines):
+            if number % 200 == 0:
+                x = rng.uniform(1, config.MAX_HORIZONTAL - 1)
+                y = rng.uniform(1, config.MAX_VERTICAL - 1)
+                f.write(f"G0 X{x:.4f} Y{y:.4f} ; next contour\n")
+                continue
+            x = min(max(x + rng.uniform(-0.5, 0.5), 0), config.MAX_HORIZONTAL)
+            y = min(max(y + rng.uniform(-0.5, 0.5), 0), config.MAX_VERTICAL)
+            f.write(f"G1 X{x:.4f} Y{y:.4f}\n")
+        f.write("G28\n%\n")
+
+
+def measure(function):
+    #tracemalloc slows numpy down badly, so time and memory come from separate passes
+    start = time.perf_counter()
+    count = function()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return count, elapsed, peak
+
+
+def bench_parse(path):
+    return measure(lambda: sum(1 for _ in gcode.interpret(gcode.parse(gcode.read_lines(path)))))
+
+
+def bench_plan(path):
+    #planning and compiling every segment is most of the cost, well ahead of parsing
+    return measure(lambda: sum(1 for _ in gcode.pipeline(path, depth=gcode.LOOKAHEAD_DEPTH)))
+
+
+def check_run(path):
+    #play a short program on the virtual clock and make sure the head ends up home
+    sim = gpio_backend.use_simulator(virtual_clock=True, record=False)
+    motor.init_motors()
+
+    start = sim.clock.now()
+    segments = gcode.run_program(path)
+    for axis in ['x', 'y']:
+        if sim.machine.position(axis) * planner.steps_per_inch(axis) != 0:
+            raise RuntimeError(f"{axis} axis did not return home")
+    return segments, sim.clock.now() - start
+
+
+def run(sizes=(1000, 10000, 100000)):
+    directory = tempfile.mkdtemp()
+
+    print(f"{'lines':>8} {'parse lines/s':>14} {'parse peak KB':>14} {'plan segs/s':>12} {'plan peak KB':>13}")
+    for size in sizes:
+        path = os.path.join(directory, f"bench_{size}.nc")
+        write_program(path, size)
+
+        parsed, parse_time, parse_peak = bench_parse(path)
+        if size <= 10000:
+            planned, plan_time, plan_peak = bench_plan(path)
+            plan_columns = f"{planned / plan_time:>12.0f} {plan_peak / 1024:>13.0f}"
+        else:
+            plan_columns = f"{'-':>12} {'-':>13}"
+
+        print(f"{size:>8} {parsed / parse_time:>14.0f} {parse_peak / 1024:>14.0f} {plan_columns}")
+
+    path = os.path.join(directory, "run.nc")
+    write_program(path, 20)
+    segments, machine_time = check_run(path)
+    print(f"Simulated run: {segments} segments, {machine_time:.1f} s machine time, back home")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,54 @@
+import logging
+import os
+import tempfile
+import time
+import numpy as np
+from utils import logging_config
+
+
+def measure(log, level, count):
+    #time of every single call, the worst ones are what a motion loop would feel
+    durations = np.empty(count)
+    clock = time.perf_counter
+    for i in range(count):
+        start = clock()
+        log.log(level, f"Move xy played {i} steps in 0.125 s, max late 12 us")
+        durations[i] = clock() - start
+    return durations
+
+
+def isolated_logger(name, handler):
+    log = logging.getLogger(name)
+    log.handlers = [handler]
+    log.propagate = False
+    log.setLevel(logging.DEBUG)
+    return log
+
+
+def compare(count=20000):
+    #the old setup (a plain FileHandler, flushed every record) against the queued pipeline
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        sync_handler = logging.FileHandler(os.path.join(directory, "sync.log"))
+        sync_handler.setFormatter(logging.Formatter(logging_config.LOG_FORMAT))
+        results["sync info"] = measure(isolated_logger("benchmark.sync", sync_handler), logging.INFO, count)
+        sync_handler.close()
+
+        pipeline = logging_config.LogPipeline(os.path.join(directory, "async.log"))
+        pipeline.start()
+        log = isolated_logger("benchmark.async", pipeline.handler)
+        results["async info"] = measure(log, logging.INFO, count)
+        results["async debug (ring)"] = measure(log, logging.DEBUG, count)
+        pipeline.stop(timeout=30)
+    return results
+
+
+def run():
+    print(f"{'':>20} {'mean us':>10} {'p99 us':>10} {'max us':>10}")
+    for name, durations in compare().items():
+        print(f"{name:>20} {durations.mean() * 1e6:>10.2f} {np.percentile(durations, 99) * 1e6:>10.2f} "
+              f"{durations.max() * 1e6:>10.1f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,54 @@
+import gc
+import logging
+import threading
+
+import gpio_backend
+import motion_process
+
+
+def ui_load(stop):
+    #what Tk redraws, logging and garbage collection look like to the interpreter
+    log = logging.getLogger("benchmark.ui_load")
+    while not stop.is_set():
+        widgets = [{"text": str(i), "state": [i] * 8} for i in range(2000)]
+        log.debug(f"redraw {len(widgets)} widgets")
+        gc.collect(0)
+
+
+def run_mode(mode, moves, load_threads):
+    controller = motion_process.MotionController(mode=mode)
+    controller.start()
+
+    stop = threading.Event()
+    loaders = [threading.Thread(target=ui_load, args=(stop,), daemon=True) for _ in range(load_threads)]
+    for loader in loaders:
+        loader.start()
+
+    worst = 0.0
+    for dx, dy in moves:
+        job_id = controller.submit_move(dx, dy)
+        status = controller.wait(job_id, timeout=60)
+        worst = max(worst, status.max_late)
+
+    stop.set()
+    for loader in loaders:
+        loader.join()
+    controller.stop()
+
+    return worst
+
+
+def run(load_threads=2):
+    #real clock so lateness is measured, no edge recording to keep memory flat
+    gpio_backend.use_simulator(virtual_clock=False, record=False)
+
+    moves = [(0.5, 0.25), (-0.5, -0.25)] * 3
+
+    print(f"{'mode':>8} {'max late us':>12}")
+    for mode in ["thread", "process"]:
+        worst = run_mode(mode, moves, load_threads)
+        print(f"{mode:>8} {worst * 1e6:>12.0f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,33 @@
+import random
+import time
+import config
+import nesting
+
+
+def synthetic_parts(count, seed):
+    #panel sizes within the machine limits, on the 1/8 inch grid, with repeats like a real order
+    rng = random.Random(seed)
+    low = nesting.to_eighths(config.MIN_HORIZONTAL)
+    high = nesting.to_eighths(config.MAX_HORIZONTAL)
+
+    sizes = [(rng.randint(low, high), rng.randint(low, high)) for _ in range(max(count // 4, 1))]
+    return [rng.choice(sizes) for _ in range(count)]
+
+
+def run(counts=(25, 50, 100, 200), repeat=3):
+    print(f"{'parts':>6} {'sheets':>7} {'yield':>7} {'best ms':>9}")
+    for count in counts:
+        parts = synthetic_parts(count, seed=count)
+
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            result = nesting.nest_best(parts)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+
+        print(f"{count:>6} {result.sheets:>7} {result.yield_fraction():>7.1%} {best * 1000:>9.1f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,44 @@
+import time
+import config
+import gpio_backend
+import motor
+import step_engine
+
+
+def legacy_move(gpio, pin, total_steps, frequency):
+    sleep_time = motor.frequency_sleep_time(frequency)
+
+    start = time.perf_counter()
+    for _ in range(total_steps):
+        gpio.output(pin, gpio.HIGH)
+        time.sleep(sleep_time)
+        gpio.output(pin, gpio.LOW)
+        time.sleep(sleep_time)
+    return time.perf_counter() - start
+
+
+def run(rpms=(100, 300, 600, 1200), seconds=0.5):
+    #real clock, no edge recording: only the timing loop itself is measured
+    gpio = gpio_backend.use_simulator(virtual_clock=False, record=False)
+    player = step_engine.BusyWaitPlayer(gpio)
+    pin = config.X_PWM_PIN
+
+    print(f"{'rpm':>6} {'requested':>12} {'legacy':>12} {'compiled':>12} {'compile ms':>12}")
+    for rpm in rpms:
+        frequency = motor.RPM_to_frequency(rpm)
+        total_steps = int(frequency * seconds)
+
+        legacy_time = legacy_move(gpio, pin, total_steps, frequency)
+
+        compile_start = time.perf_counter()
+        schedule = step_engine.compile_constant_rate(pin, total_steps, frequency)
+        compile_time = time.perf_counter() - compile_start
+
+        result = player.play(schedule)
+
+        print(f"{rpm:>6} {frequency:>12.0f} {total_steps / legacy_time:>12.0f} "
+              f"{result.achieved_rate():>12.0f} {compile_time * 1000:>12.2f}")
+
+
+if __name__ == "__main__":
+    run()
@@ -0,0 +1,228 @@
+import argparse
+import json
+import sys
+import time
+import numpy as np
+import config
+import cycle_estimator
+import gcode
+import gpio_backend
+import homing
+import interpolator
+import metrics
+import motor
+import move_cache
+import path_planner
+import planner
+import sequencer
+import step_engine
+from benchmarks import log_overhead
+
+
+#(horizontal, vertical) in inches, the sizes the shop cuts most
+STANDARD_CUTS = [
+    (12, 12),
+    (24, 12),
+    (24, 24),
+    (36.5, 24.125),
+    (48, 24),
+    (48, 48),
+]
+
+#Allowed slowdown before --compare reports a regression
+REGRESSION_TOLERANCE = 0.2
+
+
+def best_of(function, repeat=5):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def bench_step_throughput(results):
+    #how fast the deadline loop can emit edges when nothing has to wait
+    gpio = gpio_backend.use_simulator(virtual_clock=False, record=False)
+    player = step_engine.BusyWaitPlayer(gpio)
+
+    steps = 100000
+    schedule = step_engine.compile_constant_rate(config.X_PWM_PIN, steps, 1e9)
+    elapsed = best_of(lambda: player.play(schedule), repeat=3)
+    results["step_throughput_steps_per_s"] = steps / elapsed
+
+    compile_time = best_of(lambda: step_engine.compile_constant_rate(config.X_PWM_PIN, steps, 10000))
+    results["compile_100k_steps_ms"] = compile_time * 1000
+
+
+def bench_planner(results):
+    for profile in ["trapezoid", "scurve"]:
+        elapsed = best_of(lambda: [planner.plan_move('x', h, profile) for h, _ in STANDARD_CUTS])
+        results[f"plan_{profile}_ms_per_move"] = elapsed / len(STANDARD_CUTS) * 1000
+
+    elapsed = best_of(lambda: [interpolator.compile_xy(interpolator.plan_xy(h, v))
+                               for h, v in STANDARD_CUTS])
+    results["compile_xy_ms_per_move"] = elapsed / len(STANDARD_CUTS) * 1000
+
+
+def bench_cycle_time(results):
+    #virtual clock: the simulated machine time is exact and costs no wall time
+    sim = gpio_backend.use_simulator(virtual_clock=True, record=False)
+    motor.init_motors()
+
+    machine_time = 0.0
+    start = time.perf_counter()
+    for h, v in STANDARD_CUTS:
+        clock_start = sim.clock.now()
+        motor.move_xy(h, v)
+        motor.move_xy(-h, -v)
+        machine_time += sim.clock.now() - clock_start
+
+        for axis in ['x', 'y']:
+            if abs(sim.machine.position(axis)) > 1e-9:
+                raise RuntimeError(f"{axis} axis did not return home after {h} x {v}")
+    wall_time = time.perf_counter() - start
+
+    results["cut_list_machine_time_s"] = machine_time
+    results["cut_list_wall_time_s"] = wall_time
+
+
+def contour_program():
+    #a 10 in circle in 72 segments and a 12 x 6 in rectangle, the kind of path G-code brings
+    lines = ["G20 G90 F240", "G0 X25 Y20"]
+    for k in range(1, 73):
+        angle = 2 * np.pi * k / 72
+        lines.append(f"G1 X{20 + 5 * np.cos(angle):.4f} Y{20 + 5 * np.sin(angle):.4f}")
+    lines += ["G0 X30 Y30", "G1 X42 Y30", "G1 X42 Y36", "G1 X30 Y36", "G1 X30 Y30", "G28"]
+    return list(gcode.interpret(gcode.parse(enumerate(lines, 1))))
+
+
+def bench_path_blending(results):
+    #cycle time of a chained path with junction blending against stopping at every segment
+    segments = contour_program()
+    blended, stopped = path_planner.compare_cycle_time(segments)
+    results["contour_blended_machine_time_s"] = blended
+    results["contour_stop_machine_time_s"] = stopped
+
+    elapsed = best_of(lambda: list(path_planner.blend(segments)), repeat=3)
+    results["blend_plan_ms_per_segment"] = elapsed / len(segments) * 1000
+
+
+def cut_cycle(h, v):
+    return [sequencer.Operation(sequencer.TRAVEL, h, v), sequencer.Operation(sequencer.PLUNGE),
+            sequencer.Operation(sequencer.RETRACT), sequencer.Operation(sequencer.TRAVEL, -h, -v)]
+
+
+def bench_blade_overlap(results):
+    #full cut cycles with the blade, overlapping Z with XY against one after the other
+    for name, overlap in [("overlap", True), ("sequential", False)]:
+        results[f"blade_{name}_machine_time_s"] = sum(
+            sequencer.cycle_time(cut_cycle(h, v), overlap=overlap) for h, v in STANDARD_CUTS)
+
+
+def bench_move_cache(results):
+    #sequencing the standard cut cycles with an empty move cache, then again with every move in it
+    move_cache.cache = move_cache.MoveCache(config.MOVE_CACHE_MB * 1e6)
+    plan_cycles = lambda: [sequencer.sequence(cut_cycle(h, v)).compile() for h, v in STANDARD_CUTS]
+
+    start = time.perf_counter()
+    plan_cycles()
+    results["cut_cycle_cold_ms_per_cut"] = (time.perf_counter() - start) / len(STANDARD_CUTS) * 1000
+    results["cut_cycle_cached_ms_per_cut"] = best_of(plan_cycles) / len(STANDARD_CUTS) * 1000
+    move_cache.cache = None
+
+
+def bench_logging(results):
+    #cost of a log call to the caller, the motion loop among them
+    durations = log_overhead.compare(count=5000)
+    results["log_info_us_per_call"] = durations["async info"].mean() * 1e6
+    results["log_info_p99_us"] = np.percentile(durations["async info"], 99) * 1e6
+    results["log_debug_us_per_call"] = durations["async debug (ring)"].mean() * 1e6
+
+
+def bench_estimator(results):
+    #what-if estimates for a thousand random 20-cut lists in one call
+    rng = np.random.default_rng(0)
+    plans = [[tuple(cut) for cut in rng.uniform(config.MIN_HORIZONTAL, config.MAX_HORIZONTAL, (20, 2))]
+             for _ in range(1000)]
+    machine = cycle_estimator.Machine()
+    elapsed = best_of(lambda: cycle_estimator.estimate_many(plans, machine), repeat=3)
+    results["estimator_plans_per_s"] = len(plans) / elapsed
+
+
+def bench_metrics(results):
+    #what the motion controller and the UI pay per update, and one scrape
+    counter = metrics.Counter("benchmark_total", "benchmark")
+    histogram = metrics.Histogram("benchmark_seconds", "benchmark", metrics.JOB_BUCKETS)
+    count = 100000
+    results["metrics_counter_us_per_inc"] = best_of(lambda: [counter.inc() for _ in range(count)]) / count * 1e6
+    results["metrics_histogram_us_per_observe"] = best_of(
+        lambda: [histogram.observe(i % 400) for i in range(count)]) / count * 1e6
+    results["metrics_render_ms"] = best_of(metrics.registry.render) * 1000
+
+
+def bench_homing(results):
+    #home from the far corner with the blade down, on the virtual clock
+    sim = gpio_backend.use_simulator(virtual_clock=True, record=False)
+    motor.init_motors()
+    for axis, inches in [('x', config.MAX_HORIZONTAL), ('y', config.MAX_VERTICAL), ('z', config.Z_PLUNGE_DEPTH)]:
+        sim.machine.steps[axis] = int(inches * planner.steps_per_inch(axis))
+
+    start = sim.clock.now()
+    homing.home_all()
+    results["homing_machine_time_s"] = sim.clock.now() - start
+
+
+def compare(results, baseline):
+    #every metric except throughput is "lower is better"
+    regressions = []
+    for name, value in results.items():
+        if name not in baseline:
+            continue
+        old = baseline[name]
+        change = (value - old) / old if old else 0.0
+        worse = change < -REGRESSION_TOLERANCE if name.endswith("per_s") else change > REGRESSION_TOLERANCE
+        flag = "  REGRESSION" if worse else ""
+        print(f"{name:>32} {old:>14.3f} -> {value:>14.3f} ({change:+.0%}){flag}")
+        if worse:
+            regressions.append(name)
+    return regressions
+
+
+def run(save=None, baseline=None):
+    results = {}
+    bench_step_throughput(results)
+    bench_planner(results)
+    bench_cycle_time(results)
+    bench_path_blending(results)
+    bench_blade_overlap(results)
+    bench_move_cache(results)
+    bench_logging(results)
+    bench_estimator(results)
+    bench_metrics(results)
+    bench_homing(results)
+
+    for name, value in results.items():
+        print(f"{name:>32} {value:>14.3f}")
+
+    if save:
+        with open(save, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if baseline:
+        with open(baseline) as f:
+            print()
+            if compare(results, json.load(f)):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Motion benchmarks against the simulated machine")
+    parser.add_argument("--save", help="write results to a JSON file")
+    parser.add_argument("--compare", help="compare against a saved JSON baseline")
+    args = parser.parse_args()
+
+    sys.exit(run(args.save, args.compare))
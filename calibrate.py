@@ -1,6 +1,10 @@
-import RPi.GPIO as GPIO
+from gpio_backend import GPIO
+import sys
 import time
 import config
+import planner
+import step_engine
+import step_trace
 
 GPIO.setmode(GPIO.BOARD)
 GPIO.setwarnings(False)
@@ -14,16 +18,47 @@ GPIO.setup(config.Z_PWM_PIN, GPIO.OUT)
 
 frequency = 2000
 
-def rotate_motor(pin, distance, steps, frequency):
+player = step_engine.get_player(GPIO, config.STEP_BACKEND)
+
+#run with --trace to print a jitter histogram after every move
+trace = step_trace.StepTrace() if "--trace" in sys.argv or config.STEP_TRACE else None
+
+def rotate_motor(pin, distance, steps, frequency, accel):
 
     total_steps = int(distance * steps)
-    SLEEP_TIME = 1 / (frequency*2)
 
-    for _ in range(total_steps):
-        GPIO.output(pin, GPIO.HIGH)
-        time.sleep(SLEEP_TIME) 
-        GPIO.output(pin, GPIO.LOW)
-        time.sleep(SLEEP_TIME)
+    #ramp up to the requested RPM instead of starting at full speed
+    plan = planner.plan_steps(total_steps, frequency, accel)
+    schedule = step_engine.compile_pulse_train(pin, plan.intervals)
+
+    result = player.play(schedule, trace=trace)
+
+    if trace is not None:
+        print(trace.histogram_report())
+        print(f"Trace saved to {trace.save(config.TRACE_DIR, time.strftime('%Y%m%d-%H%M%S-calibrate'))}")
+
+    return result
+
+if "--tune" in sys.argv:
+    #python calibrate.py --tune [x y z]: sweep the axes and write the machine profile
+    import motor
+    import tuning
+    import utils.logging_config
+
+    utils.logging_config.init_logging()
+    axes = [arg for arg in sys.argv[1:] if arg in config.motor_configs]
+    print("Tuning drives every axis until it loses steps. Clear the bed: the blade plunges during the z sweep.")
+    input("Press Enter to start...")
+    try:
+        motor.init_motors()
+        profile = tuning.tune(axes or None)
+        for axis, entry in profile.items():
+            print(f"{axis}: {entry['max_velocity']:.2f} in/s, {entry['max_accel']:.1f} in/s^2 "
+                  f"(passed {entry['tested_velocity']:.2f} in/s, {entry['tested_accel']:.1f} in/s^2)")
+        print(f"Machine profile written to {config.MACHINE_PROFILE}")
+    finally:
+        GPIO.cleanup()
+    sys.exit(0)
 
 try:
     while True:
@@ -41,7 +76,8 @@ try:
             frequency = RPM * config.X_STEPS_PER_REV / 60
             distance = distance * config.X_PITCH
 
-            rotate_motor(config.X_PWM_PIN, distance, config.X_STEPS_PER_REV, frequency)
+            accel = config.X_MAX_ACCEL * config.X_STEPS_PER_REV * config.X_PITCH
+            rotate_motor(config.X_PWM_PIN, distance, config.X_STEPS_PER_REV, frequency, accel)
 
             
         if motor == "y":
@@ -54,7 +90,8 @@ try:
             frequency = RPM * config.Y_STEPS_PER_REV / 60
             distance = distance * config.Y_PITCH
 
-            rotate_motor(config.Y_PWM_PIN, distance, config.Y_STEPS_PER_REV, frequency)
+            accel = config.Y_MAX_ACCEL * config.Y_STEPS_PER_REV * config.Y_PITCH
+            rotate_motor(config.Y_PWM_PIN, distance, config.Y_STEPS_PER_REV, frequency, accel)
 
         if motor == "z":
             direction = input("Enter direction (u/d): ")
@@ -63,9 +100,11 @@ try:
             else:
                 GPIO.output(config.Z_DIR_PIN, GPIO.HIGH)
 
-            frequency = RPM * config.X_STEPS_PER_REV / 60
+            frequency = RPM * config.Z_STEPS_PER_REV / 60
+            distance = distance * config.Z_PITCH
 
-            rotate_motor(config.Z_PWM_PIN, distance, config.Z_STEPS_PER_REV, frequency)
+            accel = config.Z_MAX_ACCEL * config.Z_STEPS_PER_REV * config.Z_PITCH
+            rotate_motor(config.Z_PWM_PIN, distance, config.Z_STEPS_PER_REV, frequency, accel)
             
         time.sleep(1)
 
@@ -1,12 +1,4 @@
-import requests
-import RPi.GPIO as GPIO
-import threading
-import time
-import tkinter as tk
-from tkinter import ttk
-from tkinter import PhotoImage
-from tkinter import messagebox
-from io import BytesIO
+from gpio_backend import GPIO
 
 #MAX CUTS IN INCHES
 MAX_HORIZONTAL = 48
@@ -16,6 +8,12 @@ MAX_VERTICAL = 48
 MIN_HORIZONTAL = 12
 MIN_VERTICAL = 12
 
+#STOCK SHEET AND BLADE IN INCHES, used by the nesting optimizer
+SHEET_WIDTH = 48
+SHEET_HEIGHT = 96
+KERF = 0.125
+NESTING_ALLOW_ROTATION = True
+
 
 
 #Machine pin set ups
@@ -24,35 +22,209 @@ X_PWM_PIN = 13
 X_RPM = 100
 X_STEPS_PER_REV = 1000
 X_PITCH = 4
+X_MAX_VELOCITY = 6      #in/s
+X_MAX_ACCEL = 20        #in/s^2
+X_MAX_JERK = 400        #in/s^3
 
 Y_DIR_PIN = 15
 Y_PWM_PIN = 16
 Y_RPM = 100
 Y_STEPS_PER_REV = 1000
 Y_PITCH = 5
+Y_MAX_VELOCITY = 5      #in/s
+Y_MAX_ACCEL = 16        #in/s^2
+Y_MAX_JERK = 320        #in/s^3
 
 Z_DIR_PIN = 18
 Z_PWM_PIN = 22
+Z_RPM = 100
 Z_STEPS_PER_REV = 1000
+Z_PITCH = 1
+Z_MAX_VELOCITY = 4      #in/s
+Z_MAX_ACCEL = 20        #in/s^2
+Z_MAX_JERK = 400        #in/s^3
+Z_MOTION_PROFILE = "trapezoid"
+
+#Blade travel in inches below the retracted height. The blade reaches the stock at
+#Z_CLEARANCE and is through it at Z_PLUNGE_DEPTH; XY may only travel while the blade
+#is above Z_CLEARANCE. Cut strokes run Z_OVERCUT past the edge of the stock.
+Z_CLEARANCE = 0.5
+Z_PLUNGE_DEPTH = 1.5
+Z_OVERCUT = 0.25
+#The blade goes in this far short of a cut position and strokes the rest of the way,
+#along the travel there; a cut at the head's own position is a plain plunge
+Z_CUT_STROKE = 1.0      #in
+#Start plunging/retracting while XY is still moving where the clearance allows;
+#False runs Z and XY strictly one after the other
+Z_OVERLAP = True
+
+#Homing: each axis has a limit switch at its home (zero) end, wired to ground with the
+#pull-up enabled, so it reads LOW when pressed. Homing seeks fast, backs off, then latches slowly.
+X_LIMIT_PIN = 29
+Y_LIMIT_PIN = 31
+Z_LIMIT_PIN = 32
+LIMIT_ACTIVE = GPIO.LOW
+HOMING_SEEK_VELOCITY = 2        #in/s
+HOMING_LATCH_VELOCITY = 0.05    #in/s
+HOMING_BACKOFF = 0.25           #in
+HOMING_MAX_TRAVEL = 60          #in, give up if the switch is not found within this
+HOMING_CHECK_STEPS = 32         #steps between limit checks during the fast seek
+
+#Stall/fault outputs from the stepper drivers, None where they are not wired
+X_STALL_PIN = None
+Y_STALL_PIN = None
+Z_STALL_PIN = None
+STALL_ACTIVE = GPIO.LOW
+
+#Tuning sweep (python calibrate.py --tune): back-and-forth strokes at rising velocity, then
+#rising acceleration, until an axis loses steps against its home switch or its stall input
+#trips. The best passing settings times TUNING_SAFETY_MARGIN are written to MACHINE_PROFILE,
+#which replaces the MAX_VELOCITY/MAX_ACCEL/MAX_JERK constants above at startup.
+MACHINE_PROFILE = "state/machine_profile.json"
+TUNING_SAFETY_MARGIN = 0.8
+TUNING_START_FACTOR = 0.5       #first try at this fraction of the configured limits
+TUNING_MAX_FACTOR = 3           #never try beyond this multiple of them
+TUNING_GROWTH = 1.15            #each try this much harder than the last
+TUNING_STROKE = {'x': 12, 'y': 12, 'z': 1}  #in, away from home and back
+TUNING_CYCLES = 3               #back-and-forth strokes per try
+TUNING_CONFIRM = 3              #repeats of the winning settings that must all pass
+TUNING_TOLERANCE_STEPS = 4      #position error still counted as no lost steps
+
+#Compiled moves kept for reuse (move_cache.py), least recently used dropped past this size;
+#a 48 x 48 in cut and its return home take about 24 MB. The file keeps them across
+#restarts and is rewritten after any job that compiled a new move; None keeps them in memory only.
+MOVE_CACHE_MB = 256
+MOVE_CACHE_FILE = "state/move_cache.pkl"
+
+#Every cut the machine finishes or cancels goes into this SQLite file (python cut_history.py
+#exports it and reports per day and per blade). None records nothing. Cuts count against the
+#blade last set with "python cut_history.py new-blade ID", DEFAULT_BLADE until there is one.
+HISTORY_DB = "state/cut_history.db"
+HISTORY_FLUSH_INTERVAL = 1.0    #s the writer gathers cuts before one transaction
+DEFAULT_BLADE = "blade-1"
+
+#Job API (python job_api.py): office PCs POST cut jobs as JSON and the touchscreen lists
+#them, running the next one with one tap. There is no authentication, so keep it on
+#localhost or a trusted shop LAN; "0.0.0.0" listens on every interface.
+API_ENABLED = False
+API_HOST = "127.0.0.1"
+API_PORT = 8080
+API_TIMEOUT = 10                #s to send a whole request
+API_MAX_BODY = 65536            #bytes
+API_MAX_CUTS = 200              #per job
+JOB_QUEUE_DB = "state/job_queue.db"
+QUEUE_POLL_MS = 1000            #how often the touchscreen looks for new jobs
+
+#Production metrics (cuts/hour, machine vs operator time, cancels, step rate) in the Prometheus
+#text format at http://METRICS_HOST:METRICS_PORT/metrics, and a stats line on the input screen
+METRICS_ENABLED = True
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+METRICS_PANEL_MS = 2000         #how often the stats line is redrawn
+
+#Machine position, rewritten after every move; a clean restart skips homing when it is valid
+POSITION_FILE = "state/position.json"
+#Home when the saved position can't be trusted (first start, crash mid-move)
+HOME_ON_STARTUP = True
+#Leave the head where the last cut ended; the next cut moves straight there from it
+RETURN_HOME_AFTER_CUT = False
+
+#GPIO backend: "hardware" (RPi.GPIO), "sim" (simulated machine) or "auto" (sim when RPi.GPIO is missing).
+#The ARCHIMEDES_GPIO environment variable overrides this.
+GPIO_BACKEND = "hardware"
+
+#Step pulse backend: "auto" uses pigpio waveforms when the daemon is running,
+#"busy_wait" always plays pulses from the deadline loop
+STEP_BACKEND = "auto"
+
+#Motion profile for moves: "constant" (fixed RPM, no ramps), "trapezoid" or "scurve"
+MOTION_PROFILE = "scurve"
+
+#Chained moves (G-code programs) keep moving through corners instead of stopping at every
+#segment. The corner speed is the one that stays within JUNCTION_DEVIATION inches of the
+#sharp corner at the axes' acceleration limits. False stops at every segment.
+JUNCTION_BLENDING = True
+JUNCTION_DEVIATION = 0.002  #in
+
+#Where the motion controller runs: "process" keeps step timing away from Tk and the GIL,
+#"thread" runs it inside the UI process
+MOTION_MODE = "process"
+MOTION_CPU = 3          #core to pin the motion process to, None to let the OS choose
+MOTION_PRIORITY = 50    #SCHED_FIFO priority for the motion process, None to leave it normal
+
+#Start the motion controller (and GPIO setup) right after the first frame is painted.
+#When False it starts on the first cut instead.
+WARM_UP_MOTION = True
+
+#Batch mode: cut list loaded by "Load List", and the time charged for an axis
+#changing direction when ordering cuts (settling and backlash), in seconds
+BATCH_FILE = "cut_list.csv"
+BATCH_REVERSAL_PENALTY = 0.1
+#Ordering stops improving after this many 2-opt passes or seconds, whichever comes first
+BATCH_ORDER_PASSES = 50
+BATCH_ORDER_TIME_LIMIT = 2.0    #s
+#nesting.py writes its guillotine cuts here for "Load Nested"; they run in file order,
+#each cut frees the piece the next one is measured on
+NESTED_FILE = "nested_cuts.csv"
+
+#Cycle time estimates (python cycle_estimator.py): the time an operator takes per job to
+#load the board and confirm, and how far a home switch needs to open and close again
+ESTIMATE_LOAD_TIME = 20         #s
+ESTIMATE_SWITCH_TRAVEL = 0.02   #in
+
+#How often the UI drains motion events, matched to the display refresh
+UI_REFRESH_HZ = 60
+
+#Record the timing of every step edge and write a trace + jitter histogram per move
+STEP_TRACE = False
+TRACE_DIR = "logs/traces"
 
 motor_configs = {
         'x': {
             'dir_pin': X_DIR_PIN,
             'pwm_pin': X_PWM_PIN,
+            'limit_pin': X_LIMIT_PIN,
+            'stall_pin': X_STALL_PIN,
             'rpm': X_RPM,
             'steps_per_rev': X_STEPS_PER_REV,
             'pitch': X_PITCH,
+            'max_velocity': X_MAX_VELOCITY,
+            'max_accel': X_MAX_ACCEL,
+            'max_jerk': X_MAX_JERK,
             'direction': {'l': GPIO.LOW, 'r': GPIO.HIGH}},
         'y': {
             'dir_pin': Y_DIR_PIN,
             'pwm_pin': Y_PWM_PIN,
+            'limit_pin': Y_LIMIT_PIN,
+            'stall_pin': Y_STALL_PIN,
             'rpm': Y_RPM,
             'steps_per_rev': Y_STEPS_PER_REV,
             'pitch': Y_PITCH,
+            'max_velocity': Y_MAX_VELOCITY,
+            'max_accel': Y_MAX_ACCEL,
+            'max_jerk': Y_MAX_JERK,
+            'direction': {'u': GPIO.LOW, 'd': GPIO.HIGH}},
+        'z': {
+            'dir_pin': Z_DIR_PIN,
+            'pwm_pin': Z_PWM_PIN,
+            'limit_pin': Z_LIMIT_PIN,
+            'stall_pin': Z_STALL_PIN,
+            'rpm': Z_RPM,
+            'steps_per_rev': Z_STEPS_PER_REV,
+            'pitch': Z_PITCH,
+            'max_velocity': Z_MAX_VELOCITY,
+            'max_accel': Z_MAX_ACCEL,
+            'max_jerk': Z_MAX_JERK,
+            'profile': Z_MOTION_PROFILE,
             'direction': {'u': GPIO.LOW, 'd': GPIO.HIGH}}
     }
 
 
-DELETE_IMAGE = "https://raw.githubusercontent.com/nizn1770/Archimedes/main/images/delete.png"
-NEXT_IMAGE = "https://raw.githubusercontent.com/nizn1770/Archimedes/main/images/checkmark.png"
-LOGO_IMAGE = "https://raw.githubusercontent.com/nizn1770/Archimedes/main/images/logo.png"
\ No newline at end of file
+#Images are loaded from images/ first; the URL is only a fallback when a file is missing
+DELETE_IMAGE = "delete.png"
+NEXT_IMAGE = "checkmark.png"
+LOGO_IMAGE = "logo.png"
+
+IMAGE_URL = "https://raw.githubusercontent.com/nizn1770/Archimedes/main/images/"
+IMAGE_CACHE_DIR = "cache/images"
+IMAGE_TIMEOUT = 3       #seconds
@@ -0,0 +1,232 @@
+import argparse
+import csv
+import os
+import queue
+import sqlite3
+import sys
+import threading
+import time
+import config
+import utils.logging_config
+from utils.logging_config import logger
+
+
+#Every finished (or canceled) cut is one row. The motion worker only queues it; a writer
+#thread inserts in batches, so recording never adds time between boards. WAL lets the
+#UI and the command line read while the writer appends.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cuts (
+    id INTEGER PRIMARY KEY,
+    finished REAL NOT NULL,
+    day TEXT NOT NULL,
+    horizontal REAL NOT NULL,
+    vertical REAL NOT NULL,
+    planned_time REAL NOT NULL,
+    actual_time REAL NOT NULL,
+    canceled INTEGER NOT NULL,
+    blade TEXT NOT NULL,
+    job_id INTEGER
+);
+CREATE INDEX IF NOT EXISTS cuts_day ON cuts (day);
+CREATE INDEX IF NOT EXISTS cuts_blade ON cuts (blade);
+CREATE TABLE IF NOT EXISTS blades (
+    id TEXT PRIMARY KEY,
+    installed REAL NOT NULL
+);
+"""
+
+#the blade is whichever was installed last when the row goes in
+INSERT_CUT = """
+INSERT INTO cuts (finished, day, horizontal, vertical, planned_time, actual_time, canceled, blade, job_id)
+VALUES (?, ?, ?, ?, ?, ?, ?, COALESCE((SELECT id FROM blades ORDER BY installed DESC LIMIT 1), ?), ?)
+"""
+
+EXPORT_COLUMNS = ["finished", "horizontal", "vertical", "planned_time", "actual_time", "canceled", "blade", "job_id"]
+
+writer = None
+
+
+def connect(path=None):
+    path = path or config.HISTORY_DB
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    connection.execute("PRAGMA journal_mode=WAL")
+    #one fsync per batch, and a power cut never takes back a cut that was committed
+    connection.execute("PRAGMA synchronous=FULL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+class HistoryWriter:
+    STOP = None
+
+    def __init__(self, path=None):
+        self.path = path or config.HISTORY_DB
+        self.rows = queue.SimpleQueue()
+        self.thread = threading.Thread(target=self.write, name="history-writer", daemon=True)
+        self.thread.start()
+
+    def record(self, row):
+        self.rows.put(row)
+
+    def close(self, timeout=5.0):
+        self.rows.put(self.STOP)
+        self.thread.join(timeout)
+
+    def write(self):
+        connection = connect(self.path)
+        running = True
+        while running:
+            batch = [self.rows.get()]
+            if batch[0] is not self.STOP:
+                #cuts in a batch run finish close together; take the rest of them in one transaction
+                time.sleep(config.HISTORY_FLUSH_INTERVAL)
+            while not self.rows.empty():
+                batch.append(self.rows.get())
+            if self.STOP in batch:
+                running = False
+                batch = [row for row in batch if row is not self.STOP]
+
+            try:
+                with connection:
+                    connection.executemany(INSERT_CUT, batch)
+            except sqlite3.Error:
+                logger.exception(f"Could not record {len(batch)} cuts in {self.path}")
+        connection.close()
+
+
+def record_cut(horizontal, vertical, planned_time, actual_time, canceled=False, job_id=None):
+    #queues the row and returns at once; the writer starts with the first cut
+    global writer
+
+    if config.HISTORY_DB is None:
+        return
+    if writer is None:
+        writer = HistoryWriter()
+
+    finished = time.time()
+    writer.record((finished, time.strftime('%Y-%m-%d', time.localtime(finished)), horizontal, vertical,
+                   planned_time, actual_time, int(canceled), config.DEFAULT_BLADE, job_id))
+
+
+def close():
+    global writer
+
+    if writer is not None:
+        writer.close()
+        writer = None
+
+
+def new_blade(blade_id, path=None):
+    #cuts from now on count against this blade
+    connection = connect(path)
+    with connection:
+        connection.execute("INSERT OR REPLACE INTO blades (id, installed) VALUES (?, ?)", (blade_id, time.time()))
+    connection.close()
+    logger.info(f"Blade {blade_id} installed")
+
+
+def current_blade(connection):
+    row = connection.execute("SELECT id FROM blades ORDER BY installed DESC LIMIT 1").fetchone()
+    return row[0] if row else config.DEFAULT_BLADE
+
+
+def daily_throughput(days=30, path=None):
+    #(day, cuts, canceled, actual seconds, planned seconds), newest day first
+    connection = connect(path)
+    first_day = time.strftime('%Y-%m-%d', time.localtime(time.time() - (days - 1) * 86400))
+    rows = connection.execute("""
+        SELECT day, SUM(1 - canceled), SUM(canceled), SUM(actual_time), SUM(planned_time)
+        FROM cuts WHERE day >= ? GROUP BY day ORDER BY day DESC""", (first_day,)).fetchall()
+    connection.close()
+    return rows
+
+
+def cuts_per_blade(path=None):
+    #(blade, finished cuts) for every blade with a cut, the current blade first
+    connection = connect(path)
+    current = current_blade(connection)
+    rows = connection.execute("""
+        SELECT blade, SUM(1 - canceled) FROM cuts GROUP BY blade
+        ORDER BY blade = ? DESC, MAX(finished) DESC""", (current,)).fetchall()
+    connection.close()
+    return rows
+
+
+def blade_cuts(blade=None, path=None):
+    connection = connect(path)
+    if blade is None:
+        blade = current_blade(connection)
+    count = connection.execute("SELECT COUNT(*) FROM cuts WHERE blade = ? AND canceled = 0", (blade,)).fetchone()[0]
+    connection.close()
+    return count
+
+
+def export_csv(out, first_day=None, last_day=None, path=None):
+    #Rows go from the cursor straight into the CSV a chunk at a time, in insertion order so
+    #SQLite never sorts: a year of history is never all in memory.
+    connection = connect(path)
+    cursor = connection.execute("""
+        SELECT datetime(finished, 'unixepoch', 'localtime'), horizontal, vertical,
+               round(planned_time, 2), round(actual_time, 2), canceled, blade, job_id
+        FROM cuts WHERE day >= ? AND day <= ? ORDER BY id""",
+                                (first_day or "0000-00-00", last_day or "9999-99-99"))
+    cursor.arraysize = 1000
+
+    rows_out = csv.writer(out)
+    rows_out.writerow(EXPORT_COLUMNS)
+    count = 0
+    while True:
+        rows = cursor.fetchmany()
+        if not rows:
+            break
+        rows_out.writerows(rows)
+        count += len(rows)
+    connection.close()
+    return count
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Cut history and blade wear")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    export = commands.add_parser("export", help="write the cut history as CSV")
+    export.add_argument("file", help="output CSV, - for stdout")
+    export.add_argument("--from", dest="first_day", help="first day, YYYY-MM-DD")
+    export.add_argument("--to", dest="last_day", help="last day, YYYY-MM-DD")
+
+    daily = commands.add_parser("daily", help="cuts and cutting time per day")
+    daily.add_argument("--days", type=int, default=30)
+
+    commands.add_parser("blades", help="cuts per blade")
+
+    blade = commands.add_parser("new-blade", help="count cuts against a newly installed blade")
+    blade.add_argument("blade_id")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "export":
+        if args.file == "-":
+            count = export_csv(sys.stdout, args.first_day, args.last_day)
+        else:
+            with open(args.file, "w", newline="") as f:
+                count = export_csv(f, args.first_day, args.last_day)
+        print(f"{count} cuts exported", file=sys.stderr)
+    elif args.command == "daily":
+        print(f"{'day':>10} {'cuts':>6} {'canceled':>9} {'cutting':>9} {'planned':>9}")
+        for day, cuts, canceled, actual, planned in daily_throughput(args.days):
+            print(f"{day:>10} {cuts:>6} {canceled:>9} {actual / 60:>8.1f}m {planned / 60:>8.1f}m")
+    elif args.command == "blades":
+        for blade_id, cuts in cuts_per_blade():
+            print(f"{blade_id:>16} {cuts:>8}")
+    else:
+        new_blade(args.blade_id)
+        print(f"Cuts now count against blade {args.blade_id}")
+
+
+if __name__ == "__main__":
+    utils.logging_config.init_logging()
+    main(sys.argv[1:])
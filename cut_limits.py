@@ -0,0 +1,65 @@
+import config
+
+
+#The size rules for a cut, shared by the touchscreen, cut lists, the job API and headless runs
+
+
+def size_message(horizontal_len, vertical_len):
+    #empty when the cut fits the machine, otherwise what is wrong with it
+    message = ""
+
+    if horizontal_len > config.MAX_HORIZONTAL:
+        message += (f"\nHorizontal cut is too large:\n"
+                   f"Max Horizontal Cut: {config.MAX_HORIZONTAL} in\n"
+                   f"Input Horizontal Cut: {horizontal_len} in\n")
+
+    if horizontal_len < config.MIN_HORIZONTAL:
+        message += (f"\nHorizontal cut is too small:\n"
+                   f"Min Horizontal Cut: {config.MIN_HORIZONTAL} in\n"
+                   f"Input Horizontal Cut: {horizontal_len} in\n")
+
+    if vertical_len > config.MAX_VERTICAL:
+        message += (f"\nVertical cut is too large:\n"
+                   f"Max Vertical Cut: {config.MAX_VERTICAL} in\n"
+                   f"Input Vertical Cut: {vertical_len} in\n")
+
+    if vertical_len < config.MIN_VERTICAL:
+        message += (f"\nVertical cut is too small:\n"
+                   f"Min Vertical Cut: {config.MIN_VERTICAL} in\n"
+                   f"Input Vertical Cut: {vertical_len} in\n")
+
+    return message
+
+
+def entry_value(text):
+    #a touchscreen field in whole inches or eighths: blank is 0, None when it is not a number
+    if not text:
+        return 0
+    return int(text) if text.isnumeric() else None
+
+
+def combine(inches, eighths):
+    return inches + eighths * (1/8)
+
+
+def parse_length(text):
+    #a cut list cell in inches: "24.125", "24 1/8" or "3/8"
+    whole, _, fraction = text.strip().rpartition(" ") if "/" in text else (text, "", "")
+    if fraction:
+        numerator, denominator = (int(part) for part in fraction.split("/"))
+        if denominator <= 0:
+            raise ValueError(f"Bad fraction: {fraction}")
+        return float(whole or 0) + numerator / denominator
+    return float(whole)
+
+
+def check_cuts(cuts):
+    #(cuts that fit, [(row number, cut, what is wrong)]) for a whole cut list
+    valid, rejected = [], []
+    for number, (horizontal_len, vertical_len) in enumerate(cuts, 1):
+        message = size_message(horizontal_len, vertical_len)
+        if message:
+            rejected.append((number, (horizontal_len, vertical_len), " ".join(message.split())))
+        else:
+            valid.append((horizontal_len, vertical_len))
+    return valid, rejected
@@ -0,0 +1,462 @@
+import argparse
+import sys
+import numpy as np
+import config
+import cut_limits
+import machine_profile
+import planner
+import scheduler
+import step_engine
+import utils.logging_config
+from sequencer import DIR_SETUP
+
+
+#Cycle times without the machine: python cycle_estimator.py cuts.csv [--batch] [--upgrades]
+#Moves are timed in closed form from the same limits and profiles the planner uses, and
+#every move of every plan is one numpy array, so a few thousand cut lists take a second.
+#Blocks follow motion_process.job_blocks and sequencer.sequence: the blade plunges into the
+#end of each travel, strokes the last Z_CUT_STROKE into the cut, lifts over the stroke's
+#overcut and the next travel starts once the retracting blade is above Z_CLEARANCE.
+
+AXIS_KEYS = ['rpm', 'steps_per_rev', 'pitch', 'max_velocity', 'max_accel', 'max_jerk', 'profile']
+
+#Hardware changes worth pricing, as what-if changes (see Machine.change). The limits are in
+#inches, so pitch and steps_per_rev only change rounding; rpm only paces the constant profile,
+#a faster motor shows up as a higher max_velocity.
+UPGRADES = {
+    "x/y velocity +25%": ["x.max_velocity*1.25", "y.max_velocity*1.25"],
+    "x/y accel +25%": ["x.max_accel*1.25", "y.max_accel*1.25", "x.max_jerk*1.25", "y.max_jerk*1.25"],
+    "blade +25%": ["z.max_velocity*1.25", "z.max_accel*1.25", "z.max_jerk*1.25"],
+    "rpm +50%": ["*.rpm*1.5"],
+    "no return home": ["return_home=0"],
+    "no Z overlap": ["overlap=0"],
+}
+
+
+class Machine:
+    #The limits an estimate runs on, copied from config (after the machine profile) so a
+    #what-if never touches the real settings
+    def __init__(self, changes=()):
+        self.axes = {axis: {key: data[key] for key in AXIS_KEYS if key in data}
+                     for axis, data in config.motor_configs.items()}
+        self.profile = config.MOTION_PROFILE
+        self.overlap = config.Z_OVERLAP
+        self.return_home = config.RETURN_HOME_AFTER_CUT
+        self.plunge_depth = config.Z_PLUNGE_DEPTH
+        self.clearance = config.Z_CLEARANCE
+        self.cut_stroke = config.Z_CUT_STROKE
+        self.overcut = config.Z_OVERCUT
+        self.load_time = config.ESTIMATE_LOAD_TIME
+
+        for change in changes:
+            self.change(change)
+
+    def change(self, text):
+        #"x.pitch=5", "*.max_accel*1.2" (every axis) or "load_time=10"
+        if "=" in text:
+            key, _, value = text.partition("=")
+            factor = None
+        elif "*" in text:
+            key, _, value = text.rpartition("*")
+            factor = float(value)
+        else:
+            raise ValueError(f"What-if change {text} is neither key=value nor key*factor")
+
+        axis, _, name = key.strip().rpartition(".")
+        if axis:
+            axes = list(self.axes) if axis == "*" else [axis]
+            for axis in axes:
+                if axis not in self.axes or name not in AXIS_KEYS:
+                    raise ValueError(f"Unknown what-if setting {axis}.{name}")
+                old = self.axes[axis].get(name)
+                self.axes[axis][name] = self.new_value(old, value, factor)
+        else:
+            if name not in ['profile', 'overlap', 'return_home', 'plunge_depth', 'clearance', 'cut_stroke', 'overcut',
+                            'load_time']:
+                raise ValueError(f"Unknown what-if setting {name}")
+            setattr(self, name, self.new_value(getattr(self, name), value, factor))
+
+    def new_value(self, old, value, factor):
+        if factor is not None:
+            return old * factor
+        value = value.strip()
+        if isinstance(old, bool):
+            return value.lower() in ("1", "true", "yes", "on")
+        if value in planner.PROFILES:
+            return value
+        return float(value)
+
+    def steps_per_inch(self, axis):
+        return self.axes[axis]['steps_per_rev'] * self.axes[axis]['pitch']
+
+    def limits(self, axis):
+        scale = self.steps_per_inch(axis)
+        data = self.axes[axis]
+        return data['max_velocity'] * scale, data['max_accel'] * scale, data['max_jerk'] * scale
+
+    def constant_rate(self, axis):
+        import motor
+        return motor.RPM_to_frequency(self.axes[axis]['rpm'])
+
+    def axis_profile(self, axis):
+        return self.axes[axis].get('profile', self.profile)
+
+
+class Estimate:
+    def __init__(self, cuts, motion, per_cut, jobs, load_time, homing=0.0):
+        self.cuts = cuts
+        self.motion = motion
+        #machine time of the block that strokes out each cut; a job's first cut also carries
+        #the travel and plunge that open the job
+        self.per_cut = per_cut
+        self.jobs = jobs
+        self.dwell = jobs * load_time
+        self.homing = homing
+
+    def total(self):
+        return self.motion + self.dwell + self.homing
+
+    def cuts_per_hour(self):
+        return len(self.cuts) / self.total() * 3600 if self.total() else 0.0
+
+
+def scurve_accel_times(velocity, accel, jerk):
+    return np.where(velocity <= accel ** 2 / jerk, 2 * np.sqrt(velocity / jerk), velocity / accel + accel / jerk)
+
+
+def scurve_peaks(steps, velocity, accel, jerk):
+    #planner.scurve_peak for a whole array: the same bisection, run on every short move at once
+    accel_time = scurve_accel_times(velocity, accel, jerk)
+    low = np.zeros_like(steps)
+    high = np.broadcast_to(velocity, steps.shape).astype(np.float64)
+    for _ in range(60):
+        mid = (low + high) / 2
+        fits = mid * scurve_accel_times(mid, accel, jerk) <= steps
+        low = np.where(fits, mid, low)
+        high = np.where(fits, high, mid)
+
+    peak = np.where(velocity * accel_time <= steps, velocity, low)
+    return peak, scurve_accel_times(peak, accel, jerk)
+
+
+def move_times(steps, velocity, accel, jerk, profile):
+    #the duration planner.plan_steps gives each move, in closed form
+    steps = np.asarray(steps, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if profile == "constant":
+            times = steps / velocity
+        else:
+            if profile == "scurve":
+                peak, accel_time = scurve_peaks(steps, velocity, accel, jerk)
+            else:
+                peak = np.minimum(velocity, np.sqrt(accel * steps))
+                accel_time = peak / accel
+            times = 2 * accel_time + np.maximum(steps - peak * accel_time, 0.0) / peak
+    return np.where(steps > 0, times, 0.0)
+
+
+def scurve_distances(t, accel, jerk, accel_time):
+    #planner.scurve_position with limits that differ from move to move
+    jerk_time = np.minimum(accel / jerk, accel_time / 2)
+    hold_time = accel_time - 2 * jerk_time
+    accel = jerk * jerk_time
+    v1 = jerk * jerk_time ** 2 / 2
+    s1 = jerk * jerk_time ** 3 / 6
+    v2 = v1 + accel * hold_time
+    s2 = s1 + v1 * hold_time + accel * hold_time ** 2 / 2
+
+    t1 = np.clip(t, 0, jerk_time)
+    t2 = np.clip(t - jerk_time, 0, hold_time)
+    t3 = np.clip(t - jerk_time - hold_time, 0, jerk_time)
+    return np.where(t <= jerk_time, jerk * t1 ** 3 / 6,
+           np.where(t <= jerk_time + hold_time, s1 + v1 * t2 + accel * t2 ** 2 / 2,
+                    s2 + v2 * t3 + accel * t3 ** 2 / 2 - jerk * t3 ** 3 / 6))
+
+
+def tail_times(steps, tail, velocity, accel, jerk, profile):
+    #how long the last `tail` steps of each move take (sequencer's Operation.time_before_end);
+    #the ramp down mirrors the ramp up, as in planner.step_times
+    steps = np.asarray(steps, dtype=np.float64)
+    n = np.clip(steps - tail, 0, steps)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        if profile == "constant":
+            return np.where(steps > 0, (steps - n) / velocity, 0.0)
+
+        if profile == "scurve":
+            peak, accel_time = scurve_peaks(steps, velocity, accel, jerk)
+
+            def ramp(count):
+                #bisect the time the jerk-limited ramp takes to cover count steps
+                low, high = np.zeros_like(count), np.array(accel_time, dtype=np.float64)
+                for _ in range(60):
+                    mid = (low + high) / 2
+                    short = scurve_distances(mid, accel, jerk, accel_time) < count
+                    low = np.where(short, mid, low)
+                    high = np.where(short, high, mid)
+                return (low + high) / 2
+        else:
+            peak = np.minimum(velocity, np.sqrt(accel * steps))
+            accel_time = peak / accel
+            ramp = lambda count: np.sqrt(2 * count / accel)
+
+        accel_steps = peak * accel_time / 2
+        total = 2 * accel_time + np.maximum(steps - 2 * accel_steps, 0.0) / peak
+        at = np.where(n <= accel_steps, ramp(np.minimum(n, accel_steps)),
+             np.where(n >= steps - accel_steps, total - ramp(np.maximum(steps - n, 0.0)),
+                      accel_time + (n - accel_steps) / peak))
+        return np.where(steps > 0, total - at, 0.0)
+
+
+def xy_limits(machine, x_steps, y_steps):
+    #interpolator.plan_xy_steps: the major axis sets the pace, limits scaled so the minor keeps up
+    x_steps, y_steps = np.abs(x_steps), np.abs(y_steps)
+    x_major = x_steps >= y_steps
+    major = np.where(x_major, x_steps, y_steps).astype(np.float64)
+    minor = np.where(x_major, y_steps, x_steps).astype(np.float64)
+
+    x_limits, y_limits = machine.limits('x'), machine.limits('y')
+    with np.errstate(divide='ignore'):
+        ratio = np.where(minor > 0, major / np.maximum(minor, 1), np.inf)
+    velocity, accel, jerk = [np.minimum(np.where(x_major, x_limit, y_limit), np.where(x_major, y_limit, x_limit) * ratio)
+                             for x_limit, y_limit in zip(x_limits, y_limits)]
+
+    if machine.profile == "constant":
+        x_rate, y_rate = machine.constant_rate('x'), machine.constant_rate('y')
+        velocity = np.minimum(np.where(x_major, x_rate, y_rate),
+                              np.where(x_major, y_rate, x_rate) * major / np.maximum(minor, 1))
+
+    return major, velocity, accel, jerk
+
+
+def xy_times(machine, x_steps, y_steps):
+    major, velocity, accel, jerk = xy_limits(machine, x_steps, y_steps)
+    return move_times(major, velocity, accel, jerk, machine.profile)
+
+
+def stroke_steps(machine, steps):
+    #motion_process.approach: the last cut_stroke inches of each move, in whole steps
+    scale = np.array([machine.steps_per_inch('x'), machine.steps_per_inch('y')])
+    distance = np.hypot(*(steps / scale).T)
+    with np.errstate(divide='ignore'):
+        share = np.where(distance > 0, np.minimum(machine.cut_stroke / distance, 1.0), 0.0)
+    return np.round(steps * share[:, None]).astype(np.int64)
+
+
+def stroke_times(machine, steps):
+    #(how long each cut stroke takes, how long its last overcut inches take)
+    scale = np.array([machine.steps_per_inch('x'), machine.steps_per_inch('y')])
+    major, velocity, accel, jerk = xy_limits(machine, steps[:, 0], steps[:, 1])
+    length = np.hypot(*(steps / scale).T)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        overcut = np.where(length > 0, (major * np.minimum(machine.overcut / length, 1.0)).astype(np.int64), 0)
+    return (move_times(major, velocity, accel, jerk, machine.profile),
+            tail_times(major, overcut, velocity, accel, jerk, machine.profile))
+
+
+def blade_times(machine):
+    #(plunge or retract time, time until a plunge reaches the stock, time until a retract clears it)
+    steps = int(machine.plunge_depth * machine.steps_per_inch('z'))
+    clearance_steps = int(machine.clearance * machine.steps_per_inch('z'))
+    profile = machine.axis_profile('z')
+    velocity, accel, jerk = machine.limits('z')
+    if profile == "constant":
+        velocity = machine.constant_rate('z')
+
+    intervals = planner.plan_steps(steps, velocity, accel, jerk, profile).intervals
+    reach = DIR_SETUP + float(intervals[:max(clearance_steps, 0)].sum())
+    clear = DIR_SETUP + float(intervals[:max(steps - clearance_steps, 0)].sum())
+    return DIR_SETUP + float(intervals.sum()), reach, clear
+
+
+def machine_times(plans, machine, batch=False, start=(0.0, 0.0)):
+    #(motion seconds per plan, machine seconds per cut, jobs per plan) for many cut lists at once
+    counts = np.array([len(cuts) for cuts in plans])
+    points = np.array([cut for cuts in plans for cut in cuts], dtype=np.float64).reshape(-1, 2)
+    scale = np.array([machine.steps_per_inch('x'), machine.steps_per_inch('y')])
+    steps = np.round(points * scale).astype(np.int64)
+    start_steps = np.round(np.array(start) * scale).astype(np.int64)
+
+    #positions count from the last cut of the same plan; a plan's first cut comes from start
+    first = np.zeros(len(steps), dtype=bool)
+    first[(np.cumsum(counts) - counts)[counts > 0]] = True
+    previous = np.roll(steps, 1, axis=0)
+    previous[first] = start_steps
+    if machine.return_home and not batch:
+        previous[:] = 0
+        previous[first] = start_steps
+
+    stroke, reach, clear = blade_times(machine)
+    moves = steps - previous
+    cut_steps = stroke_steps(machine, moves)
+    travel = xy_times(machine, moves[:, 0] - cut_steps[:, 0], moves[:, 1] - cut_steps[:, 1])
+    cut, overcut = stroke_times(machine, cut_steps)
+    home = xy_times(machine, steps[:, 0], steps[:, 1]) if machine.return_home else np.zeros(len(steps))
+
+    #each cut's stroke and retract, timed from the start of the block that runs them
+    cut_end = np.where(cut > 0, DIR_SETUP + cut, 0.0)
+    retract_start = np.maximum(cut_end - overcut, 0.0) if machine.overlap else cut_end
+    blade_clear = np.maximum(cut_end, retract_start + clear)
+    retract_end = retract_start + stroke
+
+    #every job starts with the blade up; later cuts of a batch follow the last one's retract
+    opens_job = np.ones(len(steps), dtype=bool) if not batch else first
+    travel_start = np.where(opens_job, 0.0, np.roll(blade_clear, 1))
+    blade_free = np.where(opens_job, 0.0, np.roll(retract_end, 1))
+    travel_end = travel_start + DIR_SETUP + travel
+    if machine.overlap:
+        plunge_start = np.maximum.reduce([blade_free, travel_start, travel_end - reach])
+    else:
+        plunge_start = np.maximum(blade_free, travel_end)
+    enter = np.maximum(travel_end, plunge_start + stroke)
+
+    #the job's last block: stroke out, lift the blade, then home if configured
+    closing = np.maximum(cut_end, retract_end)
+    if machine.return_home:
+        closing = np.maximum(closing, blade_clear + DIR_SETUP + home)
+    if batch:
+        last = np.zeros(len(steps), dtype=bool)
+        last[np.cumsum(counts)[counts > 0] - 1] = True
+        per_cut = np.where(opens_job, enter, 0.0) + np.where(last, closing, np.roll(enter, -1))
+        jobs = (counts > 0).astype(np.int64)
+    else:
+        per_cut = enter + closing
+        jobs = counts
+
+    plan_index = np.repeat(np.arange(len(plans)), counts)
+    motion = np.bincount(plan_index, weights=per_cut, minlength=len(plans))
+    return motion, per_cut, jobs
+
+
+def estimate_many(plans, machine=None, batch=False, start=(0.0, 0.0)):
+    #seconds per plan, motion plus the operator's time per job
+    machine = machine or Machine()
+    motion, _, jobs = machine_times(plans, machine, batch, start)
+    return motion + jobs * machine.load_time
+
+
+def estimate(cuts, machine=None, batch=False, start=(0.0, 0.0), homing=False):
+    machine = machine or Machine()
+    motion, per_cut, jobs = machine_times([cuts], machine, batch, start)
+    return Estimate(cuts, float(motion[0]), per_cut, int(jobs[0]), machine.load_time,
+                    homing_time(machine) if homing else 0.0)
+
+
+def seek_time(machine, distances, velocity, check_steps):
+    #homing.seek: the axes of a group step in bursts of check_steps and look at their switches
+    #in between, so a burst lasts as long as the slowest axis still moving needs, plus the
+    #player's start lead; the ramp up to speed adds half its own length
+    bursts, burst_times = {}, {}
+    for axis, distance in distances.items():
+        scale = machine.steps_per_inch(axis)
+        bursts[axis] = np.ceil(distance * scale / check_steps)
+        burst_times[axis] = check_steps / (velocity * scale)
+
+    moving = sorted((axis for axis in distances if bursts[axis] > 0), key=bursts.get)
+    if not moving:
+        return 0.0
+    total = max(velocity / machine.axes[axis]['max_accel'] / 2 for axis in moving)
+    done = 0
+    while moving:
+        slowest = max(burst_times[axis] for axis in moving)
+        total += (bursts[moving[0]] - done) * (slowest + step_engine.START_LEAD)
+        done = bursts[moving.pop(0)]
+    return float(total)
+
+
+def homing_time(machine, position=None):
+    #homing.home_all from the worst place (far corner, blade down) unless a position is given
+    if position is None:
+        position = {'x': config.MAX_HORIZONTAL, 'y': config.MAX_VERTICAL, 'z': machine.plunge_depth}
+
+    total = 0.0
+    for group in [['z'], ['x', 'y']]:
+        switch = {axis: config.ESTIMATE_SWITCH_TRAVEL for axis in group}
+        total += (seek_time(machine, {axis: position[axis] for axis in group}, config.HOMING_SEEK_VELOCITY,
+                            config.HOMING_CHECK_STEPS)
+                  + seek_time(machine, switch, config.HOMING_SEEK_VELOCITY, config.HOMING_CHECK_STEPS)
+                  + seek_time(machine, switch, config.HOMING_LATCH_VELOCITY, 1))
+    return total
+
+
+def compare(cuts, variants, batch=False, homing=False):
+    #[(name, Estimate)], the current machine first
+    results = [("current", estimate(cuts, Machine(), batch, homing=homing))]
+    for name, changes in variants.items():
+        results.append((name, estimate(cuts, Machine(changes), batch, homing=homing)))
+    return results
+
+
+def read_cuts(inputs):
+    #a cut list file, or one cut as horizontal vertical
+    if len(inputs) == 2:
+        try:
+            return [(float(inputs[0]), float(inputs[1]))]
+        except ValueError:
+            pass
+    if len(inputs) != 1:
+        raise ValueError("Give a cut list file or a horizontal and vertical length")
+    return scheduler.load_cut_list(inputs[0])
+
+
+def print_comparison(results):
+    base = results[0][1].total()
+    print(f"{'':>28} {'machine':>9} {'operator':>9} {'homing':>8} {'total':>9} {'cuts/h':>7} {'saved':>7}")
+    for name, result in results:
+        saved = (base - result.total()) / base if base else 0.0
+        print(f"{name:>28} {result.motion:>8.1f}s {result.dwell:>8.1f}s {result.homing:>7.1f}s "
+              f"{result.total():>8.1f}s {result.cuts_per_hour():>7.0f} {saved:>+7.1%}")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Estimate how long a cut list takes, and what-ifs")
+    parser.add_argument("inputs", nargs="+", help="cut list (CSV or JSON), or HORIZONTAL VERTICAL")
+    parser.add_argument("--batch", action="store_true", help="run the list as one batch in scheduled order")
+    parser.add_argument("--homing", action="store_true", help="add homing from the far corner")
+    parser.add_argument("--what-if", action="append", default=[], metavar="NAME:CHANGE[,CHANGE]",
+                        help="e.g. \"faster x:x.max_velocity*1.5\" or \"pitch 5:x.pitch=5,y.pitch=5\"")
+    parser.add_argument("--upgrades", action="store_true", help="compare the usual hardware upgrades")
+    parser.add_argument("--machine-profile", help=f"limits file instead of {config.MACHINE_PROFILE}")
+    parser.add_argument("--per-cut", action="store_true", help="list the machine time of every cut")
+    args = parser.parse_args(argv)
+
+    if args.machine_profile:
+        config.MACHINE_PROFILE = args.machine_profile
+    machine_profile.apply()
+
+    try:
+        cuts = read_cuts(args.inputs)
+    except (OSError, ValueError) as e:
+        print(f"Could not read the cuts: {e}", file=sys.stderr)
+        return 2
+    cuts, rejected = cut_limits.check_cuts(cuts)
+    for number, (horizontal_len, vertical_len), message in rejected:
+        print(f"Skipping cut {number} ({horizontal_len:g} x {vertical_len:g}): {message}", file=sys.stderr)
+    if not cuts:
+        print("No cuts to estimate", file=sys.stderr)
+        return 2
+    if args.batch:
+        cuts = scheduler.schedule_batch(cuts).cuts
+
+    variants = dict(UPGRADES) if args.upgrades else {}
+    try:
+        for what_if in args.what_if:
+            name, _, changes = what_if.rpartition(":")
+            variants[name or changes] = changes.split(",")
+        results = compare(cuts, variants, args.batch, args.homing)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    mode = "one batch" if args.batch else "one job per cut"
+    print(f"{len(cuts)} cuts, {mode}, {config.ESTIMATE_LOAD_TIME:g} s operator time per job\n")
+    if args.per_cut:
+        for (horizontal_len, vertical_len), seconds in zip(cuts, results[0][1].per_cut):
+            print(f"{horizontal_len:>9g} x {vertical_len:<9g} {seconds:>7.2f}s")
+        print()
+    print_comparison(results)
+    return 0
+
+
+if __name__ == "__main__":
+    utils.logging_config.init_logging()
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,259 @@
+import queue
+import re
+import sys
+import threading
+import time
+import config
+import interpolator
+import motor
+import path_planner
+import planner
+import step_engine
+import utils.logging_config
+from utils.logging_config import logger
+
+
+#Planned segments kept ready ahead of the motors; bounds memory no matter how long the file is
+LOOKAHEAD_DEPTH = 16
+
+MM_PER_INCH = 25.4
+
+WORD = re.compile(r"([A-Z])\s*([-+]?(?:\d+\.?\d*|\.\d+))")
+COMMENT = re.compile(r"\(.*?\)|;.*")
+
+SUPPORTED_G = {0, 1, 20, 21, 28, 90, 91}
+
+
+class Command:
+    def __init__(self, line, words):
+        self.line = line
+        #a line can carry several G words, e.g. "G90 G1 X1"; every other letter appears once
+        self.codes = [value for letter, value in words if letter == "G"]
+        self.values = {letter: value for letter, value in words if letter != "G"}
+
+    def get(self, letter, default=None):
+        return self.values.get(letter, default)
+
+
+class Segment:
+    #one straight move, with its end point in absolute steps so rounding never accumulates
+    def __init__(self, line, start, end, feed, rapid):
+        self.line = line
+        self.start = start
+        self.end = end
+        self.feed = feed
+        self.rapid = rapid
+
+    def delta(self):
+        return self.end[0] - self.start[0], self.end[1] - self.start[1]
+
+
+class ProgramState:
+    def __init__(self):
+        self.absolute = True
+        self.scale = 1.0
+        self.rapid = True
+        self.feed = None
+        self.position = (0, 0)
+
+
+def read_lines(path):
+    with open(path) as f:
+        for number, text in enumerate(f, 1):
+            yield number, text
+
+
+def parse(lines):
+    for number, text in lines:
+        text = COMMENT.sub("", text).upper().strip()
+        if not text or text.startswith("%"):
+            continue
+
+        words = [(letter, float(value)) for letter, value in WORD.findall(text)]
+        if words:
+            yield Command(number, words)
+
+
+def interpret(commands, state=None):
+    if state is None:
+        state = ProgramState()
+
+    for command in commands:
+        home = False
+
+        for code in command.codes:
+            if code != int(code) or int(code) not in SUPPORTED_G:
+                raise ValueError(f"Line {command.line}: unsupported G{code:g}")
+            code = int(code)
+
+            if code == 0:
+                state.rapid = True
+            elif code == 1:
+                state.rapid = False
+            elif code == 20:
+                state.scale = 1.0
+            elif code == 21:
+                state.scale = 1 / MM_PER_INCH
+            elif code == 90:
+                state.absolute = True
+            elif code == 91:
+                state.absolute = False
+            elif code == 28:
+                home = True
+
+        if "F" in command.values:
+            #feed is in units per minute, the planner wants inches per second
+            state.feed = command.get("F") * state.scale / 60
+
+        if "X" in command.values or "Y" in command.values:
+            target = target_steps(command, state)
+            #G28 with coordinates goes through that point on its way home
+            yield from segment_to(command.line, state, target, rapid=state.rapid or home)
+
+        if home:
+            yield from segment_to(command.line, state, (0, 0), rapid=True)
+
+
+def target_steps(command, state):
+    target = []
+    for index, axis in enumerate(['x', 'y']):
+        scale = planner.steps_per_inch(axis)
+        current = state.position[index] / scale
+        value = command.get(axis.upper())
+
+        if value is None:
+            inches = current
+        elif state.absolute:
+            inches = value * state.scale
+        else:
+            inches = current + value * state.scale
+
+        limit = config.MAX_HORIZONTAL if axis == 'x' else config.MAX_VERTICAL
+        if not -1e-9 <= inches <= limit + 1e-9:
+            raise ValueError(f"Line {command.line}: {axis.upper()}{inches:g} in is outside 0 to {limit} in")
+
+        target.append(int(round(inches * scale)))
+    return tuple(target)
+
+
+def segment_to(line, state, target, rapid):
+    if target == state.position:
+        return
+
+    if not rapid and not state.feed:
+        raise ValueError(f"Line {line}: G1 move without a feed rate")
+
+    segment = Segment(line, state.position, target, None if rapid else state.feed, rapid)
+    state.position = target
+    yield segment
+
+
+def plan(segments, profile=None):
+    #junction speeds come from path_planner's own window, ahead of the compiled lookahead
+    for segment, xy_plan in path_planner.blend(segments, profile):
+        yield segment, xy_plan, interpolator.compile_xy(xy_plan)
+
+
+class Lookahead:
+    #Parses and plans on a background thread into a bounded queue, so the next
+    #compiled segment is already waiting whenever the motors finish one
+    DONE = object()
+
+    def __init__(self, items, depth=None):
+        self.items = items
+        self.queue = queue.Queue(maxsize=depth if depth is not None else LOOKAHEAD_DEPTH)
+        self.stopped = threading.Event()
+        self.error = None
+        self.starved = 0
+
+        self.thread = threading.Thread(target=self.fill, daemon=True)
+        self.thread.start()
+
+    def fill(self):
+        try:
+            for item in self.items:
+                while not self.stopped.is_set():
+                    try:
+                        self.queue.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+                if self.stopped.is_set():
+                    return
+        except Exception as e:
+            self.error = e
+        self.queue.put(self.DONE)
+
+    def __iter__(self):
+        try:
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    #the motors are waiting on the planner
+                    self.starved += 1
+                    item = self.queue.get()
+
+                if item is self.DONE:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                yield item
+        finally:
+            self.stopped.set()
+
+
+def pipeline(path, profile=None, depth=None, state=None):
+    return Lookahead(plan(interpret(parse(read_lines(path)), state), profile), depth)
+
+
+def run_program(path, profile=None, depth=None, on_segment=None):
+    #coordinates are machine positions, so the program starts from wherever the head is
+    state = ProgramState()
+    state.position = (motor.position['x'], motor.position['y'])
+
+    lookahead = pipeline(path, profile, depth, state)
+    segments = 0
+    runs = 0
+    machine_time = 0.0
+    start = time.perf_counter()
+
+    #the position goes to disk around the whole program, not between its moves
+    motor.save_position(moving=True)
+    try:
+        for run in path_planner.runs(lookahead):
+            #blended segments play as one schedule, so the motors never wait at a junction
+            plans = [xy_plan for _, xy_plan, _ in run]
+            schedule = path_planner.compile_run(plans, [schedule for _, _, schedule in run])
+            moved = {axis: sum(plan.signed_steps(axis) for plan in plans) for axis in ['x', 'y']}
+            result = motor.run_schedule(schedule, moved, name="gcode", save=False)
+            runs += 1
+            machine_time += step_engine.START_LEAD + schedule.duration()
+
+            if result.stopped:
+                logger.info(f"G-code {path} stopped in the run from line {run[0][0].line}")
+                break
+            segments += len(run)
+            if on_segment is not None:
+                for segment, _, _ in run:
+                    on_segment(segment)
+    finally:
+        motor.save_position(moving=False)
+
+    #the first wait is the pipeline filling; any more mean the planner fell behind
+    logger.info(f"G-code {path}: {segments} segments in {runs} runs, planned {machine_time:.1f} s, "
+                f"ran {time.perf_counter() - start:.1f} s, lookahead ran dry {max(lookahead.starved - 1, 0)} times")
+    return segments
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python gcode.py program.nc")
+        sys.exit(1)
+
+    utils.logging_config.init_logging()
+    motor.init_motors()
+    try:
+        run_program(sys.argv[1])
+    finally:
+        motor.cleanup_motors()
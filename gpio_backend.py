@@ -0,0 +1,270 @@
+import os
+import time
+from array import array
+
+
+#Same values RPi.GPIO uses, so configs can be built before a backend is chosen
+BOARD = 10
+BCM = 11
+OUT = 0
+IN = 1
+LOW = 0
+HIGH = 1
+PUD_OFF = 20
+PUD_DOWN = 21
+PUD_UP = 22
+
+
+class VirtualClock:
+    #Simulated time that only moves when something waits on it
+    def __init__(self):
+        self.time = 0.0
+
+    def now(self):
+        return self.time
+
+    def sleep(self, seconds):
+        if seconds > 0:
+            self.time += seconds
+
+    def advance_to(self, t):
+        if t > self.time:
+            self.time = t
+
+
+#A step this long after the one before starts from rest, if the motor could stop in time;
+#every move starts at least this long after the last one ended (the players' START_LEAD)
+SIM_REST_GAP = 0.001
+
+
+class SimMachine:
+    #Turns step/dir edges into axis positions using pitch and steps per rev.
+    #Step 0 is where each home limit switch closes.
+    def __init__(self, motor_configs):
+        self.axes = {}
+        self.limits = {}
+        self.stalls = {}
+        for axis, config_data in motor_configs.items():
+            self.axes[config_data['pwm_pin']] = (axis, config_data['dir_pin'])
+            if 'limit_pin' in config_data:
+                self.limits[config_data['limit_pin']] = axis
+            if config_data.get('stall_pin') is not None:
+                self.stalls[config_data['stall_pin']] = axis
+
+        self.steps_per_inch = {axis: config_data['steps_per_rev'] * config_data['pitch']
+                               for axis, config_data in motor_configs.items()
+                               if 'pitch' in config_data}
+        self.steps = {axis: 0 for axis in motor_configs}
+
+        #axis -> (steps/s, steps/s^2) past which the motor drops steps; empty never stalls
+        self.pull_out = {}
+        self.stalled = {axis: False for axis in motor_configs}
+        self.last_step = {}
+
+    def edge(self, pin, level, levels, t=0.0):
+        if level and pin in self.axes:
+            axis, dir_pin = self.axes[pin]
+            if axis in self.pull_out and self.over_pull_out(axis, t):
+                self.stalled[axis] = True
+                return
+            self.steps[axis] += 1 if levels.get(dir_pin, LOW) == HIGH else -1
+
+    def over_pull_out(self, axis, t):
+        #Step rate and its change from the previous step, against the motor's torque.
+        #A motor that has pulled out stays stalled until the steps stop coming.
+        last_time, last_rate, lost = self.last_step.get(axis, (None, 0.0, False))
+        max_rate, max_accel = self.pull_out[axis]
+        #a gap is only a rest if the motor was slow enough to brake within one step; one in
+        #the middle of a move is a dead stop, and counts as the deceleration it is
+        rested = last_time is not None and t - last_time > SIM_REST_GAP and last_rate ** 2 <= 2 * max_accel
+        if last_time is None or rested or t <= last_time:
+            self.last_step[axis] = (t, 0.0, False)
+            return False
+
+        rate = 1 / (t - last_time)
+        lost = lost or rate > max_rate
+        if last_rate:
+            #the two rates belong to the middles of neighbouring intervals
+            accel = abs(rate - last_rate) / ((1 / rate + 1 / last_rate) / 2)
+            lost = lost or accel > max_accel
+        self.last_step[axis] = (t, rate, lost)
+        return lost
+
+    def stall_level(self, pin):
+        #driver stall outputs are active low and latch until they are read
+        axis = self.stalls[pin]
+        stalled = self.stalled[axis]
+        self.stalled[axis] = False
+        return LOW if stalled else HIGH
+
+    def position(self, axis):
+        return self.steps[axis] / self.steps_per_inch[axis]
+
+    def limit_level(self, pin):
+        #switches are wired active low
+        return LOW if self.steps[self.limits[pin]] <= 0 else HIGH
+
+    def reset(self):
+        for axis in self.steps:
+            self.steps[axis] = 0
+            self.stalled[axis] = False
+        self.last_step.clear()
+
+
+class SimPWM:
+    def __init__(self, gpio, pin, frequency):
+        self.gpio = gpio
+        self.pin = pin
+        self.frequency = frequency
+        self.duty_cycle = 0
+
+    def start(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+
+    def ChangeDutyCycle(self, duty_cycle):
+        self.duty_cycle = duty_cycle
+
+    def ChangeFrequency(self, frequency):
+        self.frequency = frequency
+
+    def stop(self):
+        self.duty_cycle = 0
+
+
+class SimGPIO:
+    BOARD = BOARD
+    BCM = BCM
+    OUT = OUT
+    IN = IN
+    LOW = LOW
+    HIGH = HIGH
+    PUD_OFF = PUD_OFF
+    PUD_DOWN = PUD_DOWN
+    PUD_UP = PUD_UP
+
+    def __init__(self, machine=None, virtual_clock=True, record=True):
+        self.machine = machine
+        self.clock = VirtualClock() if virtual_clock else None
+        self.record = record
+
+        self.mode = None
+        self.pin_modes = {}
+        self.levels = {}
+        self.inputs = {}
+
+        self.edge_times = array('d')
+        self.edge_pins = array('B')
+        self.edge_levels = array('B')
+
+    def now(self):
+        return self.clock.now() if self.clock is not None else time.perf_counter()
+
+    def setmode(self, mode):
+        self.mode = mode
+
+    def setwarnings(self, flag):
+        pass
+
+    def setup(self, pin, mode, pull_up_down=PUD_OFF, initial=LOW):
+        self.pin_modes[pin] = mode
+        if mode == OUT:
+            self.levels[pin] = initial
+        else:
+            self.inputs.setdefault(pin, HIGH if pull_up_down == PUD_UP else LOW)
+
+    def output(self, pin, level):
+        level = HIGH if level else LOW
+        if self.levels.get(pin) == level:
+            return
+        self.levels[pin] = level
+
+        if self.record:
+            self.edge_times.append(self.now())
+            self.edge_pins.append(pin)
+            self.edge_levels.append(level)
+        if self.machine is not None:
+            self.machine.edge(pin, level, self.levels, self.now())
+
+    def input(self, pin):
+        if self.machine is not None and pin in self.machine.limits:
+            return self.machine.limit_level(pin)
+        if self.machine is not None and pin in self.machine.stalls:
+            return self.machine.stall_level(pin)
+        return self.inputs.get(pin, LOW)
+
+    def PWM(self, pin, frequency):
+        return SimPWM(self, pin, frequency)
+
+    def set_input(self, pin, level):
+        self.inputs[pin] = level
+
+    def cleanup(self, *pins):
+        self.pin_modes.clear()
+        self.levels.clear()
+
+    def clear_edges(self):
+        del self.edge_times[:]
+        del self.edge_pins[:]
+        del self.edge_levels[:]
+
+    def steps_on(self, pin):
+        return sum(1 for p, level in zip(self.edge_pins, self.edge_levels) if p == pin and level)
+
+
+class GPIOProxy:
+    #Modules hold on to this object; the backend behind it is picked at init
+    BOARD = BOARD
+    BCM = BCM
+    OUT = OUT
+    IN = IN
+    LOW = LOW
+    HIGH = HIGH
+    PUD_OFF = PUD_OFF
+    PUD_DOWN = PUD_DOWN
+    PUD_UP = PUD_UP
+
+    def __init__(self):
+        self.backend = None
+
+    def __getattr__(self, name):
+        if self.backend is None:
+            select_default()
+        return getattr(self.backend, name)
+
+
+GPIO = GPIOProxy()
+
+
+def use_hardware():
+    import RPi.GPIO
+    GPIO.backend = RPi.GPIO
+    return RPi.GPIO
+
+
+def use_simulator(virtual_clock=True, record=True):
+    import config
+    sim = SimGPIO(SimMachine(config.motor_configs), virtual_clock, record)
+    GPIO.backend = sim
+    return sim
+
+
+def select_default():
+    #ARCHIMEDES_GPIO=sim runs the whole app against the simulator
+    import config
+    name = os.environ.get("ARCHIMEDES_GPIO", config.GPIO_BACKEND)
+
+    #the app runs the simulator in real time and without an edge log
+    if name == "sim":
+        return use_simulator(virtual_clock=False, record=False)
+    if name == "auto":
+        try:
+            return use_hardware()
+        except ImportError:
+            return use_simulator(virtual_clock=False, record=False)
+    return use_hardware()
+
+
+def simulator():
+    if isinstance(GPIO.backend, SimGPIO):
+        return GPIO.backend
+    return None
@@ -0,0 +1,189 @@
+import argparse
+import cProfile
+import io
+import multiprocessing
+import pstats
+import signal
+import sys
+import time
+import config
+import cut_history
+import cut_limits
+import gpio_backend
+import homing
+import motion_process
+import motor
+import move_cache
+import scheduler
+import utils.logging_config
+from motion_events import PHASE_NAMES, STATE_CANCELED, STATE_DONE, Status
+from utils.logging_config import logger
+
+
+#Runs a cut list without the touchscreen: python headless.py cuts.csv [--dry-run] [--profile]
+#Cuts are checked with the same rules as the touchscreen, then run through the motion
+#worker's own job code on this thread, so a profile sees the whole cut path.
+
+STATE_NAMES = {STATE_DONE: "done", STATE_CANCELED: "canceled"}
+
+
+class StatusLog:
+    #stands in for the status ring; nothing reads progress here, only the final record
+    def __init__(self):
+        self.last = None
+
+    def push(self, *record):
+        self.last = Status(*record)
+        return True
+
+
+class Runner:
+    def __init__(self, sim=None):
+        self.sim = sim
+        self.status = StatusLog()
+        self.control = multiprocessing.RawValue('i', motion_process.CONTROL_RUN)
+        self.job_id = 0
+
+    def start(self):
+        motor.init_motors()
+        motor.control = self.control
+        if config.HOME_ON_STARTUP and not motor.homed:
+            print("Homing...")
+            homing.home_all()
+
+    def stop(self):
+        move_cache.report()
+        cut_history.close()
+        motor.cleanup_motors()
+
+    def cancel(self, *args):
+        #Ctrl+C ramps the head down and lifts the blade instead of leaving it in the stock
+        self.control.value = motion_process.CONTROL_CANCEL
+
+    def canceled(self):
+        return self.control.value == motion_process.CONTROL_CANCEL
+
+    def run(self, command, a=0.0, b=0.0, path=()):
+        #the job's final status, and seconds on the simulator's clock (None on hardware)
+        self.job_id += 1
+        machine_start = self.sim.now() if self.sim is not None else None
+        motion_process.run_job(self.job_id, command, a, b, self.status, self.control, list(path))
+        machine_time = self.sim.now() - machine_start if self.sim is not None else None
+        return self.status.last, machine_time
+
+
+def print_row(label, status, machine_time):
+    state = STATE_NAMES.get(status.state, "error")
+    line = (f"{label:>20} {status.planned_time:>9.2f} {status.elapsed:>9.2f} "
+            f"{status.max_late * 1e6:>9.0f} {state:>9}")
+    if machine_time is not None:
+        line += f" {machine_time:>9.2f}"
+    if status.state != STATE_DONE:
+        line += f"  stopped while {PHASE_NAMES.get(status.phase, '').lower()}"
+    print(line)
+
+
+def run_cuts(runner, cuts, batch):
+    #one job per cut, the way the operator runs them, or the whole list as one batch
+    simulated = runner.sim is not None
+    print(f"{'cut':>20} {'planned s':>9} {'actual s':>9} {'late us':>9} {'state':>9}"
+          + (f" {'machine s':>9}" if simulated else ""))
+
+    results = []
+    if batch:
+        position = motor.position_inches()
+        plan = scheduler.schedule_batch(cuts, (position['x'], position['y']))
+        print(f"Batch order: {plan.summary()}")
+        status, machine_time = runner.run(motion_process.CMD_RUN_PATH, 1.0 if plan.return_home else 0.0,
+                                          path=plan.points())
+        print_row(f"{len(cuts)} cuts", status, machine_time)
+        results.append((status, machine_time))
+    else:
+        for horizontal_len, vertical_len in cuts:
+            if runner.canceled():
+                break
+            status, machine_time = runner.run(motion_process.CMD_CUT, horizontal_len, vertical_len)
+            print_row(f"{horizontal_len:g} x {vertical_len:g}", status, machine_time)
+            results.append((status, machine_time))
+    return results
+
+
+def print_totals(results, count, wall_time):
+    finished = sum(1 for status, _ in results if status.state == STATE_DONE)
+    planned = sum(status.planned_time for status, _ in results)
+    actual = sum(status.elapsed for status, _ in results)
+    print(f"\n{finished} of {count} jobs finished in {wall_time:.2f} s, "
+          f"{actual:.2f} s cutting against {planned:.2f} s planned")
+    if results and results[0][1] is not None:
+        machine = sum(machine_time for _, machine_time in results)
+        print(f"Simulated machine time {machine:.2f} s, {machine / max(finished, 1):.2f} s per job")
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Run a cut list without the touchscreen")
+    parser.add_argument("cut_list", help="CSV (horizontal,vertical per row) or JSON cut list")
+    parser.add_argument("--dry-run", action="store_true", help="run against the simulated machine")
+    parser.add_argument("--real-time", action="store_true",
+                        help="pace the dry run like the machine instead of on a virtual clock")
+    parser.add_argument("--batch", action="store_true", help="reorder the list and run it as one batch")
+    parser.add_argument("--skip-invalid", action="store_true", help="run the cuts that fit, skip the rest")
+    parser.add_argument("--repeat", type=int, default=1, help="run the list this many times, for soak tests")
+    parser.add_argument("--profile", nargs="?", const="-", metavar="FILE",
+                        help="profile the run; print the top functions, or save pstats to FILE")
+    args = parser.parse_args(argv)
+
+    utils.logging_config.init_logging()
+
+    try:
+        cuts = scheduler.load_cut_list(args.cut_list)
+    except (OSError, ValueError) as e:
+        print(f"Could not load {args.cut_list}: {e}", file=sys.stderr)
+        return 2
+
+    cuts, rejected = cut_limits.check_cuts(cuts)
+    for number, (horizontal_len, vertical_len), message in rejected:
+        print(f"Cut {number} ({horizontal_len:g} x {vertical_len:g}): {message}", file=sys.stderr)
+    if rejected and not args.skip_invalid:
+        print(f"{len(rejected)} cuts are outside the machine limits, nothing was cut", file=sys.stderr)
+        return 2
+    if not cuts:
+        print("No cuts to run", file=sys.stderr)
+        return 2
+
+    sim = gpio_backend.use_simulator(virtual_clock=not args.real_time, record=False) if args.dry_run else None
+    runner = Runner(sim)
+    runner.start()
+    signal.signal(signal.SIGINT, runner.cancel)
+    logger.info(f"Headless run of {len(cuts)} cuts from {args.cut_list}"
+                f"{' (dry run)' if args.dry_run else ''}, {args.repeat} times")
+
+    profiler = cProfile.Profile() if args.profile else None
+    results = []
+    start = time.perf_counter()
+    try:
+        if profiler is not None:
+            profiler.enable()
+        for _ in range(args.repeat):
+            if runner.canceled():
+                break
+            results += run_cuts(runner, cuts, args.batch)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        runner.stop()
+    print_totals(results, len(results), time.perf_counter() - start)
+
+    if profiler is not None:
+        if args.profile == "-":
+            out = io.StringIO()
+            pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(25)
+            print(out.getvalue())
+        else:
+            profiler.dump_stats(args.profile)
+            print(f"Profile saved to {args.profile}")
+
+    return 0 if all(status.state == STATE_DONE for status, _ in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,75 @@
+from gpio_backend import GPIO
+import time
+import config
+import interpolator
+import motor
+import planner
+import step_engine
+from utils.logging_config import logger
+
+
+#The blade goes up before the head moves; X and Y then seek together
+HOMING_ORDER = [['z'], ['x', 'y']]
+
+
+def limit_pressed(axis):
+    return GPIO.input(config.motor_configs[axis]['limit_pin']) == config.LIMIT_ACTIVE
+
+
+def seek(axes, toward_home, velocity, max_distance, check_steps, until_pressed=True):
+    #step every axis until its switch reads until_pressed, looking every check_steps steps
+    intervals = {}
+    for axis in axes:
+        config_data = config.motor_configs[axis]
+        direction = interpolator.axis_direction(axis, -1 if toward_home else 1)
+        GPIO.output(config_data['dir_pin'], config_data['direction'][direction])
+
+        scale = planner.steps_per_inch(axis)
+        plan = planner.plan_steps(int(max_distance * scale), velocity * scale, config_data['max_accel'] * scale)
+        intervals[axis] = plan.intervals
+
+    player = motor.get_player()
+    done = {axis: 0 for axis in axes}
+
+    while True:
+        moving = [axis for axis in axes if limit_pressed(axis) != until_pressed]
+        if not moving:
+            return done
+
+        schedules = []
+        for axis in moving:
+            if done[axis] >= len(intervals[axis]):
+                state = "close" if until_pressed else "open"
+                raise RuntimeError(f"{axis} limit switch did not {state} within {max_distance} in")
+            chunk = intervals[axis][done[axis]:done[axis] + check_steps]
+            #the last chunk ended on a falling edge, half an interval before this chunk's first step
+            start = intervals[axis][done[axis] - 1] / 2 if done[axis] else 0.0
+            schedules.append(step_engine.compile_pulse_train(config.motor_configs[axis]['pwm_pin'], chunk, start))
+            done[axis] += len(chunk)
+
+        player.play(step_engine.merge_schedules(*schedules))
+
+
+def home_axes(axes):
+    #fast seek onto the switches, back off until they open, then creep back in for a repeatable latch
+    seek(axes, True, config.HOMING_SEEK_VELOCITY, config.HOMING_MAX_TRAVEL, config.HOMING_CHECK_STEPS)
+    seek(axes, False, config.HOMING_SEEK_VELOCITY, config.HOMING_BACKOFF, config.HOMING_CHECK_STEPS,
+         until_pressed=False)
+    seek(axes, True, config.HOMING_LATCH_VELOCITY, 2 * config.HOMING_BACKOFF, 1)
+
+    for axis in axes:
+        motor.position[axis] = 0
+
+
+def home_all(groups=None):
+    start = time.perf_counter()
+
+    #from here until every axis latches the saved position means nothing
+    motor.set_homed(False)
+    for axes in groups or HOMING_ORDER:
+        home_axes(axes)
+    motor.set_homed(True)
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Homing finished in {elapsed:.1f} s")
+    return elapsed
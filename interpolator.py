@@ -0,0 +1,118 @@
+import numpy as np
+import config
+import planner
+import step_engine
+
+
+class XYPlan:
+    def __init__(self, major, minor, major_plan, minor_ticks, directions, exit=0.0):
+        self.major = major
+        self.minor = minor
+        self.major_plan = major_plan
+        self.minor_ticks = minor_ticks
+        self.directions = directions
+        #speed along the path at the end, in/s; 0 when the move comes to rest
+        self.exit = exit
+
+    def steps(self, axis):
+        if axis == self.major:
+            return self.major_plan.steps
+        return len(self.minor_ticks)
+
+    def total_steps(self):
+        return self.major_plan.steps + len(self.minor_ticks)
+
+    def signed_steps(self, axis):
+        #positions count up toward the HIGH side of the direction pin
+        level = config.motor_configs[axis]['direction'][self.directions[axis]]
+        return self.steps(axis) if level == 1 else -self.steps(axis)
+
+    def duration(self):
+        return self.major_plan.duration()
+
+
+def axis_direction(axis, distance):
+    #positive distances move toward the HIGH side of the direction pin
+    directions = config.motor_configs[axis]['direction']
+    for name, level in directions.items():
+        if (level == 1) == (distance > 0):
+            return name
+
+
+def dda_ticks(major_steps, minor_steps):
+    #integer DDA: the minor axis steps whenever its accumulator rolls over,
+    #which is floor((i + 1) * minor / major) > floor(i * minor / major)
+    if major_steps == 0 or minor_steps == 0:
+        return np.zeros(0, dtype=np.int64)
+
+    i = np.arange(major_steps, dtype=np.int64)
+    fires = ((i + 1) * minor_steps) // major_steps - (i * minor_steps) // major_steps
+    return np.nonzero(fires)[0]
+
+
+def plan_xy(dx, dy, profile=None, feed=None):
+    return plan_xy_steps(int(dx * planner.steps_per_inch('x')),
+                         int(dy * planner.steps_per_inch('y')), profile, feed)
+
+
+def plan_xy_steps(x_steps, y_steps, profile=None, feed=None, entry=0.0, exit=0.0):
+    #signed step counts; feed caps the speed along the path and entry/exit are the
+    #junction speeds picked by path_planner, all in inches per second
+    if profile is None:
+        profile = config.MOTION_PROFILE
+
+    steps = {'x': abs(x_steps), 'y': abs(y_steps)}
+    major = 'x' if steps['x'] >= steps['y'] else 'y'
+    minor = 'y' if major == 'x' else 'x'
+
+    #the minor axis moves at steps[minor] / steps[major] of the major axis rate,
+    #so scale every limit down until the slower axis is the one that binds
+    velocity, accel, jerk = planner.axis_limits(major)
+    if steps[minor]:
+        ratio = steps[major] / steps[minor]
+        minor_velocity, minor_accel, minor_jerk = planner.axis_limits(minor)
+        velocity = min(velocity, minor_velocity * ratio)
+        accel = min(accel, minor_accel * ratio)
+        jerk = min(jerk, minor_jerk * ratio)
+
+    #major axis steps per inch travelled along the path
+    scale = 0.0
+    if steps[major]:
+        scale = steps[major] / np.hypot(steps['x'] / planner.steps_per_inch('x'),
+                                        steps['y'] / planner.steps_per_inch('y'))
+    if feed:
+        velocity = min(velocity, feed * scale)
+
+    if profile == "constant":
+        velocity = min(planner.constant_velocity(major),
+                       planner.constant_velocity(minor) * steps[major] / max(steps[minor], 1))
+
+    if profile != "constant" and (entry or exit):
+        #ramps between non-zero speeds are trapezoids; jerk limiting is only applied from rest
+        major_plan = planner.plan_blended(steps[major], entry * scale, exit * scale, velocity, accel)
+    else:
+        major_plan = planner.plan_steps(steps[major], velocity, accel, jerk, profile)
+    minor_ticks = dda_ticks(steps[major], steps[minor])
+
+    directions = {'x': axis_direction('x', x_steps), 'y': axis_direction('y', y_steps)}
+
+    return XYPlan(major, minor, major_plan, minor_ticks, directions, exit)
+
+
+def compile_xy(plan):
+    major_data = config.motor_configs[plan.major]
+    minor_data = config.motor_configs[plan.minor]
+
+    intervals = plan.major_plan.intervals
+    rising = step_engine.rising_edges(intervals)
+
+    major_schedule = step_engine.compile_pulses(major_data['pwm_pin'], rising, intervals / 2)
+    minor_schedule = step_engine.compile_pulses(minor_data['pwm_pin'],
+                                                rising[plan.minor_ticks],
+                                                intervals[plan.minor_ticks] / 2)
+
+    return step_engine.merge_schedules(major_schedule, minor_schedule)
+
+
+def estimate_xy_time(dx, dy, profile=None):
+    return plan_xy(dx, dy, profile).duration()
@@ -0,0 +1,237 @@
+import argparse
+import asyncio
+import json
+import math
+import sys
+import threading
+import urllib.error
+import urllib.request
+import config
+import cut_limits
+import job_queue
+import utils.logging_config
+from utils.logging_config import logger
+
+
+#A small HTTP/1.1 server on asyncio, standard library only. Office PCs POST cut jobs as JSON:
+#   {"name": "order 1187", "cuts": [{"horizontal": 24.125, "vertical": 12.5}, ...]}
+#or a single {"horizontal": ..., "vertical": ...}. Every cut is checked with the same rules
+#as the touchscreen (cut_limits) before the job goes into the queue on disk.
+#   GET /jobs          the queue, oldest first
+#   POST /jobs         add a job, 201 with the job, 400 with {"error": ...} when a cut is off
+#   GET /jobs/<id>     one job, whatever its state
+#   DELETE /jobs/<id>  take back a job the operator has not started
+
+REASONS = {200: "OK", 201: "Created", 204: "No Content", 400: "Bad Request", 404: "Not Found",
+           405: "Method Not Allowed", 409: "Conflict", 413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class ApiError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+
+
+def length(value):
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not math.isfinite(value):
+        raise TypeError(value)
+    return float(value)
+
+
+def parse_job(body):
+    #(name, [(horizontal, vertical)]) or ApiError(400) saying what is wrong
+    try:
+        data = json.loads(body)
+    except ValueError:
+        raise ApiError(400, "Body is not valid JSON")
+    if not isinstance(data, dict):
+        raise ApiError(400, "A job is a JSON object")
+
+    cuts = data.get('cuts', [data] if 'horizontal' in data else None)
+    if not isinstance(cuts, list) or not cuts:
+        raise ApiError(400, "A job needs \"cuts\": [{\"horizontal\": in, \"vertical\": in}, ...]")
+    if len(cuts) > config.API_MAX_CUTS:
+        raise ApiError(400, f"A job may have at most {config.API_MAX_CUTS} cuts")
+
+    parsed = []
+    for number, cut in enumerate(cuts, 1):
+        try:
+            horizontal, vertical = length(cut['horizontal']), length(cut['vertical'])
+        except (KeyError, TypeError):
+            raise ApiError(400, f"Cut {number}: horizontal and vertical must be numbers in inches")
+        message = cut_limits.size_message(horizontal, vertical)
+        if message:
+            raise ApiError(400, f"Cut {number}: {' '.join(message.split())}")
+        parsed.append((horizontal, vertical))
+
+    return str(data.get('name', ""))[:80], parsed
+
+
+class JobApi:
+    #runs its own event loop on a thread; the touchscreen keeps Tk on the main thread
+    def __init__(self, host=None, port=None, path=None):
+        self.host = host if host is not None else config.API_HOST
+        self.port = port if port is not None else config.API_PORT
+        #the queue database, config.JOB_QUEUE_DB unless given
+        self.path = path
+
+        self.loop = None
+        self.server = None
+        self.ready = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name="job-api", daemon=True)
+        self.thread.start()
+        self.ready.wait(5)
+        return self
+
+    def stop(self):
+        #no server if it never came up, e.g. the port was taken, and then the loop has closed too
+        if self.server is not None and self.loop is not None and not self.loop.is_closed():
+            try:
+                self.loop.call_soon_threadsafe(self.server.close)
+            except RuntimeError:
+                #the loop closed after the check
+                pass
+        if self.thread is not None:
+            self.thread.join(5)
+
+    def run(self):
+        try:
+            asyncio.run(self.serve())
+        except Exception:
+            logger.exception(f"Job API on {self.host}:{self.port} failed")
+            self.ready.set()
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.server = await asyncio.start_server(self.handle, self.host, self.port)
+        #port 0 picks a free one
+        self.port = self.server.sockets[0].getsockname()[1]
+        logger.info(f"Job API listening on {self.host}:{self.port}")
+        self.ready.set()
+        try:
+            await self.server.serve_forever()
+        except asyncio.CancelledError:
+            pass
+
+    async def handle(self, reader, writer):
+        try:
+            status, payload = await asyncio.wait_for(self.respond(reader), config.API_TIMEOUT)
+        except ApiError as e:
+            status, payload = e.status, {'error': e.message}
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, ValueError):
+            status, payload = 400, {'error': "Malformed request"}
+        except Exception:
+            logger.exception("Job API request failed")
+            status, payload = 500, {'error': "Internal error"}
+
+        body = b"" if payload is None else json.dumps(payload).encode()
+        head = (f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: application/json\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n")
+        try:
+            writer.write(head.encode() + body)
+            await writer.drain()
+        except ConnectionError:
+            pass
+        writer.close()
+
+    async def respond(self, reader):
+        method, target, _ = (await reader.readline()).decode('latin-1').split(" ", 2)
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode('latin-1').partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        size = int(headers.get('content-length', 0))
+        if size > config.API_MAX_BODY:
+            raise ApiError(413, f"Body larger than {config.API_MAX_BODY} bytes")
+        body = await reader.readexactly(size)
+        return await self.route(method, target.split("?")[0].rstrip("/"), body)
+
+    async def route(self, method, path, body):
+        #the queue is SQLite with an fsync per change, so it runs off the event loop
+        call = lambda function, *args: self.loop.run_in_executor(None, function, *args, self.path)
+
+        if path == "/jobs":
+            if method == "GET":
+                return 200, {'jobs': [job.as_dict() for job in await call(job_queue.pending)]}
+            if method == "POST":
+                name, cuts = parse_job(body)
+                job = await call(job_queue.add, cuts, name)
+                logger.info(f"Job API queued job {job.id}: {job.label()}")
+                return 201, job.as_dict()
+            raise ApiError(405, f"{method} not allowed on /jobs")
+
+        prefix, _, job_id = path.rpartition("/")
+        if prefix != "/jobs" or not job_id.isdigit():
+            raise ApiError(404, f"No such resource {path}")
+
+        job = await call(job_queue.get, int(job_id))
+        if job is None:
+            raise ApiError(404, f"No job {job_id}")
+        if method == "GET":
+            return 200, job.as_dict()
+        if method == "DELETE":
+            if not await call(job_queue.remove, job.id):
+                raise ApiError(409, f"Job {job_id} is {job.state} and can't be removed")
+            logger.info(f"Job API removed job {job.id}")
+            return 204, None
+        raise ApiError(405, f"{method} not allowed on /jobs/<id>")
+
+
+def request(url, method="GET", payload=None):
+    #a minimal client: (status, decoded JSON body or None)
+    data = None if payload is None else json.dumps(payload).encode()
+    req = urllib.request.Request(url, data=data, method=method, headers={'Content-Type': "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=10) as response:
+            status, body = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, body = e.code, e.read()
+    return status, json.loads(body) if body else None
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description="Cut job API: run the server or talk to one")
+    parser.add_argument("--url", default=f"http://127.0.0.1:{config.API_PORT}")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="run the API without the touchscreen")
+    serve.add_argument("--host", default=config.API_HOST)
+    serve.add_argument("--port", type=int, default=config.API_PORT)
+
+    submit = commands.add_parser("submit", help="queue one cut")
+    submit.add_argument("horizontal", type=float)
+    submit.add_argument("vertical", type=float)
+    submit.add_argument("--name", default="")
+
+    commands.add_parser("list", help="show the queue")
+
+    args = parser.parse_args(argv)
+
+    if args.command == "serve":
+        api = JobApi(args.host, args.port).start()
+        print(f"Listening on {api.host}:{api.port}, Ctrl+C to stop")
+        try:
+            api.thread.join()
+        except KeyboardInterrupt:
+            api.stop()
+    elif args.command == "submit":
+        cut = {'name': args.name, 'horizontal': args.horizontal, 'vertical': args.vertical}
+        print(*request(f"{args.url}/jobs", "POST", cut))
+    else:
+        status, body = request(f"{args.url}/jobs")
+        for job in body['jobs']:
+            cuts = ", ".join(f"{cut['horizontal']:g} x {cut['vertical']:g}" for cut in job['cuts'])
+            print(f"{job['id']:>6} {job['submitted']} {job['state']:>8} {job['name']} {cuts}")
+
+
+if __name__ == "__main__":
+    utils.logging_config.init_logging()
+    main(sys.argv[1:])
@@ -0,0 +1,125 @@
+import json
+import os
+import sqlite3
+import time
+import config
+
+
+#Cut jobs waiting for the operator, oldest first. Jobs are rows in SQLite so a crash or
+#power cut loses nothing that was accepted; a job that was running at the time comes
+#back marked as interrupted rather than silently cut twice.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    submitted REAL NOT NULL,
+    name TEXT NOT NULL,
+    cuts TEXT NOT NULL,
+    state TEXT NOT NULL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, id);
+"""
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+CANCELED = "canceled"
+REMOVED = "removed"
+
+
+class Job:
+    def __init__(self, job_id, submitted, name, cuts, state):
+        self.id = job_id
+        self.submitted = submitted
+        self.name = name
+        #[(horizontal, vertical)] in inches
+        self.cuts = cuts
+        self.state = state
+
+    def label(self, interrupted=True):
+        #interrupted=False for the job the touchscreen is running right now
+        if len(self.cuts) == 1:
+            text = f"{self.cuts[0][0]:g} x {self.cuts[0][1]:g}"
+        else:
+            text = f"{len(self.cuts)} cuts"
+        if self.name:
+            text = f"{self.name}: {text}"
+        if self.state == RUNNING:
+            text += " (interrupted)" if interrupted else " (running)"
+        return text
+
+    def as_dict(self):
+        return {'id': self.id, 'name': self.name, 'state': self.state,
+                'submitted': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.submitted)),
+                'cuts': [{'horizontal': h, 'vertical': v} for h, v in self.cuts]}
+
+
+def connect(path=None):
+    path = path or config.JOB_QUEUE_DB
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    connection = sqlite3.connect(path, timeout=10)
+    connection.execute("PRAGMA journal_mode=WAL")
+    #an accepted job is on disk before the submitter hears back
+    connection.execute("PRAGMA synchronous=FULL")
+    connection.executescript(SCHEMA)
+    return connection
+
+
+def from_row(row):
+    job_id, submitted, name, cuts, state = row
+    return Job(job_id, submitted, name, [tuple(cut) for cut in json.loads(cuts)], state)
+
+
+def add(cuts, name="", path=None):
+    connection = connect(path)
+    submitted = time.time()
+    with connection:
+        cursor = connection.execute("INSERT INTO jobs (submitted, name, cuts, state) VALUES (?, ?, ?, ?)",
+                                    (submitted, name, json.dumps([list(cut) for cut in cuts]), QUEUED))
+    connection.close()
+    return Job(cursor.lastrowid, submitted, name, [tuple(cut) for cut in cuts], QUEUED)
+
+
+def pending(path=None):
+    #what the operator still has to run, interrupted jobs included
+    connection = connect(path)
+    rows = connection.execute("SELECT id, submitted, name, cuts, state FROM jobs WHERE state IN (?, ?) "
+                              "ORDER BY id", (QUEUED, RUNNING)).fetchall()
+    connection.close()
+    return [from_row(row) for row in rows]
+
+
+def get(job_id, path=None):
+    connection = connect(path)
+    row = connection.execute("SELECT id, submitted, name, cuts, state FROM jobs WHERE id = ?",
+                             (job_id,)).fetchone()
+    connection.close()
+    return from_row(row) if row else None
+
+
+def set_state(job_id, state, allowed, path=None):
+    #True when the job was in one of the allowed states and now is in state
+    finished = time.time() if state in (DONE, CANCELED, REMOVED) else None
+    marks = ", ".join("?" * len(allowed))
+    connection = connect(path)
+    with connection:
+        cursor = connection.execute(f"UPDATE jobs SET state = ?, finished = ? WHERE id = ? AND state IN ({marks})",
+                                    (state, finished, job_id, *allowed))
+    connection.close()
+    return cursor.rowcount == 1
+
+
+def start(job_id, path=None):
+    return set_state(job_id, RUNNING, [QUEUED, RUNNING], path)
+
+
+def finish(job_id, state, path=None):
+    return set_state(job_id, state, [RUNNING], path)
+
+
+def remove(job_id, path=None):
+    #only jobs nobody has started can be taken back
+    return set_state(job_id, REMOVED, [QUEUED], path)
@@ -0,0 +1,62 @@
+import json
+import os
+import time
+import config
+from utils.logging_config import logger
+
+
+#Per-axis limits measured by the tuning sweep (tuning.py). When the file exists its
+#limits replace the max_velocity/max_accel/max_jerk constants from config.py.
+LIMIT_KEYS = ['max_velocity', 'max_accel', 'max_jerk']
+
+
+def save(axes, margin):
+    #axes: axis -> {'max_velocity', 'max_accel', 'max_jerk', plus what the sweep measured}
+    state = {'tuned': time.strftime('%Y-%m-%d %H:%M:%S'), 'safety_margin': margin, 'axes': axes}
+
+    directory = os.path.dirname(config.MACHINE_PROFILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = config.MACHINE_PROFILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, config.MACHINE_PROFILE)
+
+
+def load():
+    #axis -> limits for the axes the file covers, {} when there is no usable profile
+    try:
+        with open(config.MACHINE_PROFILE) as f:
+            state = json.load(f)
+    except OSError:
+        return {}
+    except ValueError:
+        logger.warning(f"Machine profile {config.MACHINE_PROFILE} is not valid JSON, using config.py limits")
+        return {}
+
+    axes = {}
+    for axis, limits in state.get('axes', {}).items():
+        if axis not in config.motor_configs:
+            continue
+        try:
+            values = {key: float(limits[key]) for key in LIMIT_KEYS}
+        except (KeyError, TypeError, ValueError):
+            logger.warning(f"Machine profile entry for {axis} is incomplete, using config.py limits")
+            continue
+        if min(values.values()) <= 0:
+            logger.warning(f"Machine profile entry for {axis} has a non-positive limit, using config.py limits")
+            continue
+        axes[axis] = values
+    return axes
+
+
+def apply():
+    axes = load()
+    for axis, values in axes.items():
+        config.motor_configs[axis].update(values)
+        logger.info(f"Machine profile {axis}: {values['max_velocity']:.2f} in/s, "
+                    f"{values['max_accel']:.1f} in/s^2")
+    return axes
@@ -1,16 +1,48 @@
-import touchscreen
-import utils.logging_config 
-from utils.logging_config import logger
+from utils import startup_profiler
+
+with startup_profiler.phase("imports"):
+    import config
+    import machine_profile
+    import touchscreen
+    import utils.logging_config 
+    from utils.logging_config import logger
 
 
 def main():
 
     utils.logging_config.init_logging()
     logger.info("Archimedes started.")
-    app = touchscreen.Application(logger)
+
+    #the UI estimates cut times too, so it needs the tuned limits as well as the motion worker
+    machine_profile.apply()
+
+    with startup_profiler.phase("widget build"):
+        app = touchscreen.Application(logger)
+
+    app.after_idle(lambda: first_paint(app))
     app.mainloop()
 
 
+def first_paint(app):
+    app.update_idletasks()
+    startup_profiler.mark("first paint")
+
+    #hardware comes up after the operator can already see the input screen
+    if config.WARM_UP_MOTION:
+        with startup_profiler.phase("motion + GPIO setup"):
+            app.start_motion()
+
+    if config.METRICS_ENABLED:
+        with startup_profiler.phase("metrics endpoint"):
+            app.start_metrics()
+
+    if config.API_ENABLED:
+        with startup_profiler.phase("job API"):
+            app.start_job_api()
+
+    startup_profiler.report(logger)
+
+
 
 
 if __name__ == "__main__":
@@ -0,0 +1,259 @@
+import bisect
+import collections
+import threading
+import time
+import config
+from motion_events import STATE_CANCELED, STATE_DONE, STATE_ERROR
+from utils.logging_config import logger
+
+
+#Counters, gauges and histograms kept in the UI process and served in the Prometheus text
+#format at http://METRICS_HOST:METRICS_PORT/metrics. The motion worker already reports every
+#job's end in its status records, so the motion controller updates these from those and the
+#worker never pays for them. An update is one lock and one add.
+
+STATE_NAMES = {STATE_DONE: "done", STATE_CANCELED: "canceled", STATE_ERROR: "error"}
+
+#seconds; a cycle runs from one job starting to the next, board handling included
+JOB_BUCKETS = [1, 2, 5, 10, 15, 20, 30, 60, 120, 300]
+CYCLE_BUCKETS = [10, 15, 20, 30, 45, 60, 90, 120, 300, 900]
+
+
+def number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        #label values -> value
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def label_text(self, values, extra=()):
+        pairs = list(zip(self.labels, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{value}"' for name, value in pairs) + "}"
+
+    def value(self, *labels):
+        return self.values.get(labels, 0.0)
+
+    def samples(self):
+        with self.lock:
+            values = sorted(self.values.items())
+        if not values and not self.labels:
+            values = [((), 0.0)]
+        for labels, value in values:
+            yield f"{self.name}{self.label_text(labels)}", value
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount=1.0, *labels):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0.0) + amount
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def __init__(self, name, help_text, labels=(), function=None):
+        super().__init__(name, help_text, labels)
+        #read when the metrics are rendered instead of being set
+        self.function = function
+
+    def set(self, value, *labels):
+        with self.lock:
+            self.values[labels] = value
+
+    def value(self, *labels):
+        if self.function is not None:
+            return self.function()
+        return super().value(*labels)
+
+    def samples(self):
+        if self.function is not None:
+            yield self.name, self.function()
+        else:
+            yield from super().samples()
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help_text, buckets):
+        super().__init__(name, help_text)
+        self.buckets = sorted(buckets)
+        #one count per bucket plus +Inf, not cumulative until rendered
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+
+    def mean(self):
+        return self.sum / self.count if self.count else 0.0
+
+    def samples(self):
+        with self.lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        cumulative = 0
+        for bound, bucket in zip(self.buckets + [float("inf")], counts):
+            cumulative += bucket
+            yield f"{self.name}_bucket{self.label_text((), [('le', number(bound))])}", cumulative
+        yield f"{self.name}_sum", total
+        yield f"{self.name}_count", count
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def add(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for sample, value in metric.samples():
+                lines.append(f"{sample} {number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class Production:
+    #what one job start and end mean for throughput: finished cuts in the last hour,
+    #and the machine's idle gap while the operator handles boards
+    def __init__(self):
+        self.started = time.monotonic()
+        #the last job start with cuts in it, and the last job end
+        self.last_start = None
+        self.last_finish = None
+        #(finish time, cuts) of the last hour
+        self.recent = collections.deque()
+        self.lock = threading.Lock()
+
+    def job_started(self, cut_count):
+        now = time.monotonic()
+        with self.lock:
+            if self.last_finish is not None:
+                idle_seconds.inc(now - self.last_finish)
+                self.last_finish = None
+            #jogging and homing are not production cycles
+            if cut_count:
+                if self.last_start is not None:
+                    cycle_seconds.observe(now - self.last_start)
+                self.last_start = now
+
+    def job_finished(self, status, cut_count):
+        now = time.monotonic()
+        jobs.inc(1, STATE_NAMES.get(status.state, "error"))
+        job_seconds.observe(status.elapsed)
+        motion_seconds.inc(status.elapsed)
+        steps.inc(status.steps_done)
+        if status.steps_done:
+            step_rate.set(status.achieved_rate)
+            max_late.set(status.max_late)
+
+        with self.lock:
+            self.last_finish = now
+            if status.state == STATE_DONE and cut_count:
+                cuts.inc(cut_count)
+                self.recent.append((now, cut_count))
+
+    def cuts_per_hour(self):
+        now = time.monotonic()
+        with self.lock:
+            while self.recent and self.recent[0][0] < now - 3600:
+                self.recent.popleft()
+            count = sum(cut_count for _, cut_count in self.recent)
+        #in the first hour, the rate so far
+        return count * 3600 / min(max(now - self.started, 60), 3600)
+
+    def utilization(self):
+        uptime = time.monotonic() - self.started
+        return motion_seconds.value() / uptime if uptime > 0 else 0.0
+
+    def uptime(self):
+        return time.monotonic() - self.started
+
+
+registry = Registry()
+production = Production()
+
+jobs = registry.add(Counter("archimedes_jobs_total", "Motion jobs finished, by how they ended", ["state"]))
+cuts = registry.add(Counter("archimedes_cuts_total", "Cuts completed"))
+rejected_cuts = registry.add(Counter("archimedes_rejected_cuts_total", "Cuts refused for being outside the machine limits"))
+cancels = registry.add(Counter("archimedes_cancel_requests_total", "Cancel presses during a job"))
+pauses = registry.add(Counter("archimedes_pause_requests_total", "Pause presses during a job"))
+job_seconds = registry.add(Histogram("archimedes_job_seconds", "Machine time per job, pauses included", JOB_BUCKETS))
+cycle_seconds = registry.add(Histogram("archimedes_cycle_seconds", "Time from one job starting to the next starting",
+                                       CYCLE_BUCKETS))
+motion_seconds = registry.add(Counter("archimedes_motion_seconds_total", "Time the machine spent running jobs"))
+idle_seconds = registry.add(Counter("archimedes_operator_idle_seconds_total",
+                                    "Time between a job ending and the next one starting"))
+steps = registry.add(Counter("archimedes_steps_total", "Steps played"))
+step_rate = registry.add(Gauge("archimedes_step_rate", "Achieved step rate of the last job, steps/s"))
+max_late = registry.add(Gauge("archimedes_max_late_seconds", "Latest step of the last job against its schedule"))
+queue_depth = registry.add(Gauge("archimedes_queue_depth", "Jobs waiting in the job queue"))
+cuts_per_hour = registry.add(Gauge("archimedes_cuts_per_hour", "Cuts completed in the last hour",
+                                   function=production.cuts_per_hour))
+utilization = registry.add(Gauge("archimedes_utilization", "Share of the uptime spent running jobs",
+                                 function=production.utilization))
+uptime = registry.add(Gauge("archimedes_uptime_seconds", "Seconds since start", function=production.uptime))
+
+
+def summary():
+    #one line for the stats panel
+    hours, minutes = divmod(int(production.uptime()) // 60, 60)
+    return (f"{cuts.value():.0f} cuts in {hours}:{minutes:02d}   {production.cuts_per_hour():.0f} cuts/h   "
+            f"machine busy {production.utilization():.0%}   average job {job_seconds.mean():.0f} s   "
+            f"canceled {jobs.value('canceled'):.0f}")
+
+
+def serve(host=None, port=None):
+    #the server on a daemon thread, or None when the port can't be had. http.server is
+    #imported here, the touchscreen imports this module before its first paint
+    import http.server
+
+    class MetricsHandler(http.server.BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.debug(f"Metrics {self.address_string()} {format % args}")
+
+    host = host if host is not None else config.METRICS_HOST
+    port = port if port is not None else config.METRICS_PORT
+    try:
+        server = http.server.ThreadingHTTPServer((host, port), MetricsHandler)
+    except OSError as e:
+        logger.warning(f"Metrics endpoint on {host}:{port} not started: {e}")
+        return None
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Metrics at http://{host}:{server.server_address[1]}/metrics")
+    return server
@@ -0,0 +1,113 @@
+STATE_IDLE = 0
+STATE_RUNNING = 1
+STATE_DONE = 2
+STATE_CANCELED = 3
+STATE_ERROR = 4
+#stopped partway through a move, waiting to resume or cancel
+STATE_PAUSED = 5
+
+PHASE_MOVING = 0
+PHASE_POSITIONING = 1
+PHASE_RETURNING = 2
+PHASE_CUTTING = 3
+PHASE_HOMING = 4
+
+PHASE_NAMES = {
+    PHASE_MOVING: "Moving",
+    PHASE_POSITIONING: "Positioning Cut Head",
+    PHASE_RETURNING: "Returning Cut Head to Home",
+    PHASE_CUTTING: "Cutting Board",
+    PHASE_HOMING: "Homing"
+}
+
+EVENT_PROGRESS = "progress"
+EVENT_PHASE = "phase"
+EVENT_DONE = "done"
+
+
+class Status:
+    def __init__(self, job_id, state, phase, steps_done, steps_planned, x, y,
+                 achieved_rate, max_late, elapsed, planned_time):
+        self.job_id = job_id
+        self.state = state
+        self.phase = phase
+        self.steps_done = steps_done
+        self.steps_planned = steps_planned
+        self.x = x
+        self.y = y
+        self.achieved_rate = achieved_rate
+        self.max_late = max_late
+        self.elapsed = elapsed
+        self.planned_time = planned_time
+
+    def finished(self):
+        return self.state in (STATE_DONE, STATE_CANCELED, STATE_ERROR)
+
+    def fraction(self):
+        if self.steps_planned == 0:
+            return 1.0 if self.finished() else 0.0
+        return self.steps_done / self.steps_planned
+
+
+def coalesce(statuses, last_phase=None):
+    #Many progress records can arrive between two UI frames; only the newest one
+    #is worth drawing, but every phase change and the completion are kept in order.
+    events = []
+    latest = None
+
+    for status in statuses:
+        if status.phase != last_phase and not status.finished():
+            events.append((EVENT_PHASE, status))
+            last_phase = status.phase
+
+        if status.finished():
+            if latest is not None:
+                events.append((EVENT_PROGRESS, latest))
+                latest = None
+            events.append((EVENT_DONE, status))
+        else:
+            latest = status
+
+    if latest is not None:
+        events.append((EVENT_PROGRESS, latest))
+
+    return events, last_phase
+
+
+class ProgressTracker:
+    #Turns the event stream for one job into what the progress screen shows
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+        self.fraction = 0.0
+        self.phase = None
+        self.eta = None
+        self.paused = False
+        self.final = None
+
+    def apply(self, events):
+        for kind, status in events:
+            if status.job_id != self.job_id:
+                continue
+
+            if kind == EVENT_PHASE:
+                self.phase = status.phase
+            elif kind == EVENT_DONE:
+                self.final = status
+
+            self.fraction = status.fraction()
+            self.eta = max(status.planned_time - status.elapsed, 0.0)
+            self.paused = status.state == STATE_PAUSED
+
+    def finished(self):
+        return self.final is not None
+
+    def phase_name(self):
+        return PHASE_NAMES.get(self.phase, "")
+
+    def eta_text(self):
+        if self.paused:
+            return "Paused"
+        if self.eta is None:
+            return ""
+        return f"{self.eta:.0f} s remaining"
@@ -0,0 +1,421 @@
+import math
+import multiprocessing
+import os
+import threading
+import time
+import config
+import cut_history
+import homing
+import metrics
+import motor
+import motion_events
+import move_cache
+import planner
+import sequencer
+import utils.logging_config
+from motion_events import (STATE_RUNNING, STATE_DONE, STATE_CANCELED, STATE_ERROR,
+                           STATE_PAUSED, PHASE_MOVING, PHASE_POSITIONING, PHASE_RETURNING, PHASE_CUTTING,
+                           PHASE_HOMING, Status)
+from ring_buffer import RingBuffer
+from sequencer import Operation, TRAVEL, CUT, PLUNGE, RETRACT
+from utils.logging_config import logger
+
+
+#job_id, command, a, b
+COMMAND_FORMAT = "<IIdd"
+#job_id, state, phase, steps_done, steps_planned, x, y, achieved_rate, max_late, elapsed, planned_time
+STATUS_FORMAT = "<IIIQQdddddd"
+
+CMD_CUT = 1
+CMD_MOVE_XY = 2
+CMD_SHUTDOWN = 3
+CMD_PATH_POINT = 4
+CMD_RUN_PATH = 5       #a: 1.0 to return home after the last cut
+CMD_HOME = 6
+
+#Control word shared with the motion worker. The step players read it before every edge
+#and ramp down to a stop when it is not CONTROL_RUN; a paused job resumes where it stopped.
+CONTROL_RUN = 0
+CONTROL_CANCEL = 1
+CONTROL_PAUSE = 2
+
+POLL_INTERVAL = 0.001
+
+
+def configure_realtime(cpu, priority):
+    if cpu is not None and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, {cpu})
+            logger.info(f"Motion process pinned to CPU {cpu}")
+        except OSError as e:
+            logger.warning(f"Could not pin motion process to CPU {cpu}: {e}")
+
+    if priority is not None and hasattr(os, "SCHED_FIFO"):
+        try:
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+            logger.info(f"Motion process running SCHED_FIFO priority {priority}")
+        except OSError as e:
+            logger.warning(f"Could not set SCHED_FIFO priority {priority}: {e}")
+
+
+def job_blocks(command, a, b, path):
+    #Blocks end with XY stopped and the blade through the stock at the start of a cut
+    #stroke, so cancel can be checked there while the retract still overlaps both the end
+    #of the stroke and the travel to the next cut
+    if command == CMD_CUT:
+        #a cut goes straight from wherever the head is to the cut position
+        path = [(a, b)]
+        return_home = config.RETURN_HOME_AFTER_CUT
+    elif command == CMD_RUN_PATH:
+        return_home = bool(a)
+    elif command == CMD_MOVE_XY:
+        return [[Operation(TRAVEL, a, b, PHASE_MOVING)]]
+    else:
+        raise ValueError(f"Unknown motion command {command}")
+
+    #absolute cut positions, relative moves from one to the next
+    blocks = []
+    steps = dict(motor.position)
+    block = []
+    for px, py in path:
+        travel, stroke = approach(px, py, steps)
+        blocks.append(block + [travel, Operation(PLUNGE, phase=PHASE_CUTTING)])
+        block = stroke + [Operation(RETRACT, phase=PHASE_CUTTING)]
+
+    if path:
+        if return_home:
+            block.append(travel_to(0.0, 0.0, steps, PHASE_RETURNING))
+        blocks.append(block)
+    return blocks
+
+
+def approach(x, y, steps):
+    #(travel to where the blade goes in, [the cut stroke from there to x, y] or [])
+    deltas = {axis: int(round(target * planner.steps_per_inch(axis))) - steps[axis]
+              for axis, target in [('x', x), ('y', y)]}
+    distance = math.hypot(*[deltas[axis] / planner.steps_per_inch(axis) for axis in ['x', 'y']])
+    share = min(config.Z_CUT_STROKE / distance, 1.0) if distance else 0.0
+
+    stroke = {axis: int(round(delta * share)) for axis, delta in deltas.items()}
+    travel = step_move(TRAVEL, {axis: deltas[axis] - stroke[axis] for axis in deltas}, steps, PHASE_POSITIONING)
+    if not any(stroke.values()):
+        return travel, []
+    return travel, [step_move(CUT, stroke, steps, PHASE_CUTTING)]
+
+
+def step_move(kind, deltas, steps, phase):
+    #whole steps from the tracked position, which moves on with them
+    for axis, delta in deltas.items():
+        steps[axis] += delta
+    return Operation(kind, deltas['x'] / planner.steps_per_inch('x'), deltas['y'] / planner.steps_per_inch('y'), phase)
+
+
+def travel_to(x, y, steps, phase):
+    #work in whole steps from the tracked position so rounding never builds up
+    deltas = []
+    for axis, target in [('x', x), ('y', y)]:
+        scale = planner.steps_per_inch(axis)
+        target_steps = int(round(target * scale))
+        deltas.append((target_steps - steps[axis]) / scale)
+        steps[axis] = target_steps
+    return Operation(TRAVEL, deltas[0], deltas[1], phase)
+
+
+def motion_worker(command_args, status_args, control, cpu=None, priority=None):
+    if multiprocessing.parent_process() is not None:
+        #a worker process logs to its own file; in a thread the UI's log already covers it
+        utils.logging_config.init_logging()
+    configure_realtime(cpu, priority)
+
+    commands = RingBuffer(*command_args)
+    status = RingBuffer(*status_args)
+
+    init_start = time.perf_counter()
+    motor.init_motors()
+    motor.control = control
+    logger.info(f"Motor GPIO setup took {(time.perf_counter() - init_start) * 1000:.1f} ms")
+
+    #a clean shutdown leaves a trusted position behind and the machine can skip homing;
+    #job 0 is never one the UI waits on
+    if config.HOME_ON_STARTUP and not motor.homed:
+        run_homing(0, status)
+
+    paths = {}
+
+    while True:
+        record = commands.pop()
+        if record is None:
+            time.sleep(POLL_INTERVAL)
+            continue
+
+        job_id, command, a, b = record
+        if command == CMD_SHUTDOWN:
+            break
+        if command == CMD_PATH_POINT:
+            paths.setdefault(job_id, []).append((a, b))
+            continue
+
+        run_job(job_id, command, a, b, status, control, paths.pop(job_id, []))
+
+    #written once on the way out: a full cache is hundreds of MB, and pickling it between
+    #jobs would hold up the next one
+    move_cache.report()
+    move_cache.save()
+    cut_history.close()
+    commands.close()
+    status.close()
+
+    if multiprocessing.parent_process() is not None:
+        #a worker process ends without running atexit, so its log is written out here
+        utils.logging_config.shutdown()
+
+
+def run_job(job_id, command, a, b, status, control, path):
+    if command == CMD_HOME:
+        return run_homing(job_id, status)
+
+    blocks = job_blocks(command, a, b, path)
+    timelines = [sequencer.sequence(block, blade_down=motor.position['z'] > 0) for block in blocks]
+    #block i plunges for cut i and block i + 1 strokes it out, so a cut is recorded with
+    #the block that finishes it; canceling the first block cancels the first cut
+    cuts = [(a, b)] if command == CMD_CUT else path if command == CMD_RUN_PATH else []
+    planned = sum(timeline.total_steps() for timeline in timelines)
+    planned_time = sum(timeline.duration() for timeline in timelines)
+
+    done = 0
+    #steps of the current timeline played before it was last stopped
+    offset = 0
+    phase = blocks[0][0].phase if blocks else PHASE_MOVING
+    state = STATE_RUNNING
+    rate = 0.0
+    max_late = 0.0
+    start = time.perf_counter()
+
+    def report(steps):
+        push_status(status, job_id, STATE_RUNNING, timeline.phase_at(offset + steps), done + offset + steps,
+                    planned, rate, max_late, time.perf_counter() - start, planned_time)
+
+    try:
+        for index, timeline in enumerate(timelines):
+            offset = 0
+            result = None
+            block_start = time.perf_counter()
+            paused = 0.0
+            while result is None or result.stopped:
+                if control.value == CONTROL_PAUSE:
+                    pause_start = time.perf_counter()
+                    phase = timeline.phase_at(offset)
+                    while not push_status(status, job_id, STATE_PAUSED, phase, done + offset, planned, rate,
+                                          max_late, time.perf_counter() - start, planned_time):
+                        time.sleep(POLL_INTERVAL)
+                    while control.value == CONTROL_PAUSE:
+                        time.sleep(POLL_INTERVAL)
+                    paused += time.perf_counter() - pause_start
+                if control.value == CONTROL_CANCEL:
+                    break
+
+                if result is None:
+                    result = run_timeline(timeline, report)
+                else:
+                    #the position is exact, so the rest of the move goes on from here
+                    result = motor.resume(report)
+                if result.stopped:
+                    offset += result.steps
+
+                rate = result.achieved_rate()
+                max_late = max(max_late, result.max_late)
+
+            canceled = result is None or result.stopped
+            number = max(index - 1, 0)
+            if number < len(cuts) and (index or canceled):
+                record_cut(job_id, cuts[number], timeline, time.perf_counter() - block_start - paused, canceled)
+
+            if canceled:
+                motor.discard_interrupted()
+                phase = timeline.phase_at(offset)
+                done += offset
+                state = STATE_CANCELED
+                break
+
+            phase = timeline.phase_at(timeline.total_steps())
+            done += timeline.total_steps()
+        else:
+            state = STATE_DONE
+
+        if motor.position['z'] > 0:
+            #never leave the blade in the stock, whatever the control word says
+            retract = Operation(RETRACT, phase=PHASE_CUTTING, z_steps=motor.position['z'])
+            run_timeline(sequencer.sequence([retract]), stoppable=False)
+    except Exception:
+        logger.exception(f"Motion job {job_id} failed")
+        state = STATE_ERROR
+
+    #progress records may be dropped when the UI falls behind, the final one may not
+    while not push_status(status, job_id, state, phase, done, planned, rate, max_late,
+                          time.perf_counter() - start, planned_time):
+        time.sleep(POLL_INTERVAL)
+
+
+def record_cut(job_id, cut, timeline, actual_time, canceled):
+    #the simulator's cuts are not the shop's, same as its position
+    if motor.persist:
+        cut_history.record_cut(cut[0], cut[1], timeline.duration(), actual_time, canceled, job_id)
+
+
+def run_timeline(timeline, on_progress=None, stoppable=True):
+    schedule = timeline.compile()
+    if on_progress is not None:
+        on_progress(0)
+    return motor.run_schedule(schedule, timeline.moved(), on_progress, stoppable=stoppable)
+
+
+def run_homing(job_id, status):
+    push_status(status, job_id, STATE_RUNNING, PHASE_HOMING, 0, 0, 0.0, 0.0, 0.0, 0.0)
+    start = time.perf_counter()
+    try:
+        homing.home_all()
+        state = STATE_DONE
+    except Exception:
+        logger.exception("Homing failed")
+        state = STATE_ERROR
+
+    while not push_status(status, job_id, state, PHASE_HOMING, 0, 0, 0.0, 0.0,
+                          time.perf_counter() - start, 0.0):
+        time.sleep(POLL_INTERVAL)
+
+
+def push_status(status, job_id, state, phase, done, planned, rate, max_late, elapsed, planned_time):
+    position = motor.position_inches()
+    return status.push(job_id, state, phase, done, planned, position['x'], position['y'],
+                       rate, max_late, elapsed, planned_time)
+
+
+class MotionController:
+    def __init__(self, mode=None, cpu=None, priority=None):
+        self.mode = mode if mode is not None else config.MOTION_MODE
+        self.cpu = cpu if cpu is not None else config.MOTION_CPU
+        self.priority = priority if priority is not None else config.MOTION_PRIORITY
+
+        self.commands = RingBuffer(COMMAND_FORMAT, 256)
+        self.status = RingBuffer(STATUS_FORMAT, 1024)
+        self.control = multiprocessing.RawValue('i', CONTROL_RUN)
+
+        self.next_job_id = 1
+        #job_id -> cuts in it, until its final status comes back
+        self.job_cuts = {}
+        self.last_status = None
+        self.last_phase = None
+        self.worker = None
+
+    def start(self):
+        args = (self.commands.attach_args(), self.status.attach_args(), self.control)
+
+        if self.mode == "process":
+            self.worker = multiprocessing.Process(target=motion_worker,
+                                                  args=args + (self.cpu, self.priority),
+                                                  daemon=True)
+        else:
+            #in-process mode leaves scheduling alone, it would affect the UI too
+            self.worker = threading.Thread(target=motion_worker, args=args, daemon=True)
+
+        self.worker.start()
+        logger.info(f"Motion controller started in {self.mode} mode")
+
+    def submit(self, command, a=0.0, b=0.0, job_id=None, cuts=0):
+        if job_id is None:
+            job_id = self.new_job_id()
+
+        self.control.value = CONTROL_RUN
+        self.push_command(job_id, command, a, b)
+        self.job_cuts[job_id] = cuts
+        metrics.production.job_started(cuts)
+        return job_id
+
+    def new_job_id(self):
+        job_id = self.next_job_id
+        self.next_job_id += 1
+        return job_id
+
+    def push_command(self, job_id, command, a, b, timeout=1.0):
+        #long paths can outrun the worker briefly; give it a moment before failing
+        deadline = time.monotonic() + timeout
+        while not self.commands.push(job_id, command, a, b):
+            if time.monotonic() > deadline:
+                raise RuntimeError("Motion command queue is full")
+            time.sleep(POLL_INTERVAL)
+
+    def submit_cut(self, horizontal, vertical):
+        return self.submit(CMD_CUT, horizontal, vertical, cuts=1)
+
+    def submit_move(self, dx, dy):
+        return self.submit(CMD_MOVE_XY, dx, dy)
+
+    def submit_path(self, points, return_home=None):
+        #points are absolute (x, y) cut positions visited in order as one job
+        if return_home is None:
+            return_home = config.RETURN_HOME_AFTER_CUT
+
+        job_id = self.new_job_id()
+        for x, y in points:
+            self.push_command(job_id, CMD_PATH_POINT, x, y)
+        return self.submit(CMD_RUN_PATH, 1.0 if return_home else 0.0, job_id=job_id, cuts=len(points))
+
+    def submit_home(self):
+        return self.submit(CMD_HOME)
+
+    def cancel(self):
+        self.control.value = CONTROL_CANCEL
+        metrics.cancels.inc()
+
+    def pause(self):
+        #the head ramps down and holds position; resume() picks up the same move
+        if self.control.value == CONTROL_RUN:
+            self.control.value = CONTROL_PAUSE
+            metrics.pauses.inc()
+
+    def resume(self):
+        if self.control.value == CONTROL_PAUSE:
+            self.control.value = CONTROL_RUN
+
+    def read_status(self):
+        #only the newest record matters to the UI
+        for record in self.status.drain():
+            self.last_status = Status(*record)
+            self.count_finished(self.last_status)
+        return self.last_status
+
+    def drain_events(self):
+        #everything since the last call, coalesced into progress/phase/done events
+        statuses = [Status(*record) for record in self.status.drain()]
+        for status in statuses:
+            self.count_finished(status)
+        if statuses:
+            self.last_status = statuses[-1]
+
+        events, self.last_phase = motion_events.coalesce(statuses, self.last_phase)
+        return events
+
+    def count_finished(self, status):
+        #final records are never dropped, so every submitted job is counted once
+        if status.finished() and status.job_id in self.job_cuts:
+            metrics.production.job_finished(status, self.job_cuts.pop(status.job_id))
+
+    def wait(self, job_id, timeout=None, poll=0.01):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            status = self.read_status()
+            if status is not None and status.job_id == job_id and status.finished():
+                return status
+            if deadline is not None and time.monotonic() > deadline:
+                return status
+            time.sleep(poll)
+
+    def stop(self):
+        if self.worker is not None:
+            self.commands.push(0, CMD_SHUTDOWN, 0.0, 0.0)
+            #the worker is a daemon and writes the move cache before it exits
+            self.worker.join(timeout=30)
+            self.worker = None
+
+        self.commands.close()
+        self.status.close()
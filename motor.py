@@ -1,18 +1,210 @@
-import RPi.GPIO as GPIO
+from gpio_backend import GPIO
 import time
+import numpy as np
 import config
+import gpio_backend
+import interpolator
+import machine_profile
+import move_cache
+import planner
+import position_store
+import step_engine
+import step_trace
+from utils.logging_config import logger
+
+player = None
+trace = None
+
+#Shared control word, set by the motion worker; players ramp down and stop when it is nonzero
+control = None
+#what a stopped move left unplayed, for resume()
+interrupted = None
+
+#absolute steps per axis, 0 where each home switch closes
+position = {axis: 0 for axis in config.motor_configs}
+homed = False
+#the simulator starts fresh every run, so its position never goes to disk
+persist = True
 
 def init_motors():
+    global player
+
+    #measured limits from the last tuning sweep, if there was one
+    machine_profile.apply()
+
     GPIO.setmode(GPIO.BOARD)
     GPIO.setwarnings(False)
 
-    for pin in [config.X_DIR_PIN, config.X_PWM_PIN, config.Y_DIR_PIN, config.Y_PWM_PIN]:
-        GPIO.setup(pin, GPIO.OUT)
-        
+    for config_data in config.motor_configs.values():
+        GPIO.setup(config_data['dir_pin'], GPIO.OUT)
+        GPIO.setup(config_data['pwm_pin'], GPIO.OUT)
+        if 'limit_pin' in config_data:
+            GPIO.setup(config_data['limit_pin'], GPIO.IN, pull_up_down=GPIO.PUD_UP)
+        if config_data.get('stall_pin') is not None:
+            GPIO.setup(config_data['stall_pin'], GPIO.IN, pull_up_down=GPIO.PUD_UP)
+
+    player = step_engine.get_player(GPIO, config.STEP_BACKEND)
+
+    if config.STEP_TRACE:
+        enable_trace()
+
+    restore_position()
+
 def cleanup_motors():
+    move_cache.save()
     GPIO.cleanup()
 
-def move_motor(motor, distance, direction):
+def restore_position():
+    global homed, persist
+
+    sim = gpio_backend.simulator()
+    persist = sim is None
+    if sim is not None:
+        position.update(sim.machine.steps)
+        homed = True
+        return
+
+    steps, homed = position_store.load()
+    if homed:
+        position.update(steps)
+        logger.info(f"Restored machine position {position_inches()}, homing skipped")
+    else:
+        logger.warning("Saved machine position missing or interrupted mid-move, the machine needs homing")
+
+def position_inches():
+    return {axis: steps / planner.steps_per_inch(axis) for axis, steps in position.items()}
+
+def save_position(moving):
+    if persist:
+        position_store.save(position, homed, moving)
+
+def set_homed(value):
+    global homed
+    homed = value
+    save_position(moving=False)
+
+class Interrupted:
+    #the rest of a move stopped by the control word, ready to play from rest
+    def __init__(self, schedule, moved, directions, name):
+        self.schedule = schedule
+        self.moved = moved
+        self.directions = directions
+        self.name = name
+
+def step_limits():
+    #acceleration limit per step pin, for ramps the players build on their own
+    return {config_data['pwm_pin']: planner.axis_limits(axis)[1]
+            for axis, config_data in config.motor_configs.items()}
+
+def play(schedule, moved, on_progress=None, name="move", directions=None, ramp_up=False, stoppable=True,
+         save=True):
+    #every move is bracketed by position saves, so a crash mid-move is detected on restart;
+    #save=False when the caller brackets a whole program of moves itself.
+    #directions are the levels set on the dir pins beforehand; a stop needs them to sign its steps
+    global homed, interrupted
+
+    interrupted = None
+    if save:
+        save_position(moving=True)
+    logger.debug(f"Move {name}: {schedule.steps} steps over {schedule.duration():.3f} s, moved {moved}")
+    try:
+        result = get_player().play(schedule, on_progress, trace, control if stoppable else None,
+                                   step_limits(), ramp_up)
+    except BaseException:
+        #some steps went out, but not a known number of them
+        homed = False
+        raise
+    record_trace(name)
+    logger.debug(f"Move {name} played {result.steps} steps in {result.actual_time:.3f} s, "
+                 f"max late {result.max_late * 1e6:.0f} us")
+
+    if result.stopped:
+        #stepped exactly this far, the position stays good and the rest can be resumed
+        done, levels = executed_steps(schedule, result.played, directions or {})
+        interrupted = Interrupted(schedule.tail(result.played),
+                                  {axis: steps - done.get(axis, 0) for axis, steps in moved.items()},
+                                  levels, name)
+        moved = done
+        logger.info(f"Move {name} stopped after {result.steps} steps, position {position_inches()}")
+
+    for axis, steps in moved.items():
+        position[axis] += steps
+    if save:
+        save_position(moving=False)
+    return result
+
+def resume(on_progress=None):
+    #play what the last stopped move left, accelerating from rest; no homing needed
+    rest = interrupted
+    if rest is None:
+        return None
+
+    for axis, level in rest.directions.items():
+        GPIO.output(config.motor_configs[axis]['dir_pin'], level)
+    return play(rest.schedule, rest.moved, on_progress, rest.name, rest.directions, True)
+
+def discard_interrupted():
+    global interrupted
+    interrupted = None
+
+def executed_steps(schedule, played, directions):
+    #signed steps per axis in the first `played` edges, and the direction level each axis
+    #ended on; direction edges in the schedule override the levels set before it started
+    pins = schedule.pins[:played]
+    levels = schedule.levels[:played]
+
+    done = {}
+    last_levels = {}
+    for axis, config_data in config.motor_configs.items():
+        dir_index = np.flatnonzero(pins == config_data['dir_pin'])
+        initial = directions.get(axis, GPIO.HIGH)
+        if len(dir_index):
+            last_levels[axis] = int(levels[dir_index[-1]])
+        elif axis in directions:
+            last_levels[axis] = initial
+
+        step_index = np.flatnonzero((pins == config_data['pwm_pin']) & (levels == 1))
+        if len(step_index) == 0:
+            continue
+        if len(dir_index):
+            before = np.searchsorted(dir_index, step_index) - 1
+            step_levels = np.where(before >= 0, levels[dir_index[np.maximum(before, 0)]], initial)
+        else:
+            step_levels = np.full(len(step_index), initial)
+        #positions count up toward the HIGH side of the direction pin
+        forward = int(np.count_nonzero(step_levels == GPIO.HIGH))
+        done[axis] = forward - (len(step_index) - forward)
+
+    return done, last_levels
+
+def get_player():
+    global player
+
+    if player is None:
+        player = step_engine.get_player(GPIO, config.STEP_BACKEND)
+    return player
+
+def enable_trace(capacity=500000):
+    global trace
+    trace = step_trace.StepTrace(capacity)
+    return trace
+
+def disable_trace():
+    global trace
+    trace = None
+
+def record_trace(name):
+    #summarize the move that just finished and keep its trace on disk
+    if trace is None:
+        return None
+
+    summary = trace.summary()
+    logger.info(f"Step timing {name}: {summary}")
+    stamp = time.strftime('%Y%m%d-%H%M%S') + f"-{int(time.time() * 1000) % 1000:03d}"
+    trace.save(config.TRACE_DIR, f"{stamp}-{name}")
+    return summary
+
+def move_motor(motor, distance, direction, profile=None, on_progress=None):
     if motor not in config.motor_configs:
         print("Invalid motor specified.")
         return
@@ -21,19 +213,41 @@ def move_motor(motor, distance, direction):
     config_data = config.motor_configs[motor]
 
     #configure direction
-    GPIO.output(config_data['dir_pin'], config_data['direction'][direction])
+    level = config_data['direction'][direction]
+    GPIO.output(config_data['dir_pin'], level)
+
+    #the whole move is planned and compiled up front (or reused), then played out against deadlines
+    move = move_cache.axis_move(motor, int(distance * planner.steps_per_inch(motor)), profile)
+
+    moved = move.plan.steps if level == GPIO.HIGH else -move.plan.steps
+    return play(move.schedule, {motor: moved}, on_progress, motor, {motor: level})
+
+
+def move_xy(dx, dy, profile=None, on_progress=None):
+    #both axes step from one schedule and finish together
+    move = move_cache.xy_move(int(dx * planner.steps_per_inch('x')), int(dy * planner.steps_per_inch('y')),
+                              profile)
+    return run_xy_plan(move.plan, on_progress, move.schedule)
+
+
+def run_xy_plan(plan, on_progress=None, schedule=None):
+    directions = {}
+    for axis in ['x', 'y']:
+        config_data = config.motor_configs[axis]
+        directions[axis] = config_data['direction'][plan.directions[axis]]
+        GPIO.output(config_data['dir_pin'], directions[axis])
+
+    #callers that compile ahead (the G-code lookahead) pass the schedule in
+    if schedule is None:
+        schedule = interpolator.compile_xy(plan)
 
-    #calculate steps and time
-    total_steps = int(distance * config_data['steps_per_rev'] * config_data['pitch'])
-    sleep_time = frequency_sleep_time(RPM_to_frequency(config_data['rpm']))
+    moved = {axis: plan.signed_steps(axis) for axis in ['x', 'y']}
+    return play(schedule, moved, on_progress, "xy", directions)
 
-    #move motor
-    for _ in range(total_steps):
 
-        GPIO.output(config_data['pwm_pin'], GPIO.HIGH)
-        time.sleep(sleep_time)
-        GPIO.output(config_data['pwm_pin'], GPIO.LOW)
-        time.sleep(sleep_time)
+def run_schedule(schedule, moved, on_progress=None, name="cycle", stoppable=True, save=True):
+    #schedules that carry their own direction edges, e.g. a sequenced cut cycle
+    return play(schedule, moved, on_progress, name, stoppable=stoppable, save=save)
 
     
 
@@ -42,4 +256,4 @@ def RPM_to_frequency(rpm):
     return rpm * 2000 / 60
 
 def frequency_sleep_time(frequency):
-    return 1 / (frequency*2)
\ No newline at end of file
+    return 1 / (frequency*2)
@@ -0,0 +1,218 @@
+import hashlib
+import json
+import os
+import pickle
+import time
+from collections import OrderedDict
+import config
+import interpolator
+import planner
+import step_engine
+from utils.logging_config import logger
+
+
+#The shop cuts the same few panel sizes all day, so whole compiled moves (plan and pulse
+#schedule) are kept and reused. Keys hold the move in 1/8 in units plus the profile version,
+#a hash of every setting a compiled move depends on: a new machine profile or an edited
+#config.py never reuses a stale move.
+EIGHTHS = 8
+
+#Bump when CompiledMove or the schedule layout changes, so old cache files are ignored
+FORMAT = 1
+
+#motor_configs entries a compiled move depends on
+VERSION_KEYS = ['pwm_pin', 'steps_per_rev', 'pitch', 'rpm', 'max_velocity', 'max_accel', 'max_jerk', 'profile']
+
+cache = None
+
+
+class CompiledMove:
+    #Shared by everything that looks the move up, so neither part may be modified.
+    #The schedule starts at 0; PulseSchedule.shifted places it in a longer timeline.
+    def __init__(self, plan, schedule, build_time):
+        self.plan = plan
+        self.schedule = schedule
+        self.build_time = build_time
+
+    def nbytes(self):
+        arrays = [self.schedule.times, self.schedule.pins, self.schedule.levels, self.schedule.counts]
+        if isinstance(self.plan, interpolator.XYPlan):
+            arrays += [self.plan.major_plan.intervals, self.plan.minor_ticks]
+        else:
+            arrays.append(self.plan.intervals)
+        return sum(array.nbytes for array in arrays if array is not None)
+
+
+class MoveCache:
+    #least recently used moves go first once the entries pass max_bytes
+    def __init__(self, max_bytes, path=None):
+        self.max_bytes = max_bytes
+        self.path = path
+        self.entries = OrderedDict()
+        self.size = 0
+        self.version = None
+        self.dirty = False
+
+        self.hits = 0
+        self.misses = 0
+        #moves that are not a whole number of eighths (jogs, G-code) and are never cached
+        self.uncached = 0
+        self.saved_time = 0.0
+
+    def get(self, key, build):
+        #build() -> (plan, schedule), called on a miss
+        self.check_version()
+        if key is None or self.max_bytes <= 0:
+            self.uncached += 1
+            return self.build(build)
+
+        key = key + (self.version,)
+        move = self.entries.get(key)
+        if move is not None:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.saved_time += move.build_time
+            return move
+
+        move = self.build(build)
+        self.misses += 1
+        logger.debug(f"Move cache miss {key[:-1]}: compiled in {move.build_time * 1000:.1f} ms")
+
+        self.entries[key] = move
+        self.size += move.nbytes()
+        self.dirty = True
+        while self.size > self.max_bytes and len(self.entries) > 1:
+            _, old = self.entries.popitem(last=False)
+            self.size -= old.nbytes()
+        return move
+
+    def build(self, build):
+        start = time.perf_counter()
+        plan, schedule = build()
+        return CompiledMove(plan, schedule, time.perf_counter() - start)
+
+    def check_version(self):
+        version = profile_version()
+        if version == self.version:
+            return
+        if self.entries:
+            logger.info(f"Move cache: motion settings changed, dropping {len(self.entries)} compiled moves")
+            self.dirty = True
+        self.entries.clear()
+        self.size = 0
+        self.version = version
+
+    def report(self):
+        looked_up = self.hits + self.misses
+        rate = self.hits / looked_up if looked_up else 0.0
+        logger.info(f"Move cache: {self.hits} hits, {self.misses} misses ({rate:.0%}), {self.uncached} uncached, "
+                    f"{self.saved_time * 1000:.0f} ms of compiling saved, {len(self.entries)} moves in "
+                    f"{self.size / 1e6:.1f} MB")
+
+    def save(self):
+        if self.path is None or not self.dirty:
+            return
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        state = {'format': FORMAT, 'version': self.version, 'entries': list(self.entries.items())}
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+        logger.info(f"Move cache: saved {len(self.entries)} compiled moves to {self.path}")
+
+    def load(self):
+        #only ever a file this cache wrote itself; anything unreadable starts the cache empty
+        if self.path is None:
+            return
+        try:
+            with open(self.path, "rb") as f:
+                state = pickle.load(f)
+        except OSError:
+            return
+        except Exception as e:
+            logger.warning(f"Move cache file {self.path} is unreadable, starting empty: {e}")
+            return
+
+        self.check_version()
+        if state.get('format') != FORMAT or state.get('version') != self.version:
+            logger.info("Move cache file was written for other motion settings, starting empty")
+            return
+
+        for key, move in state['entries']:
+            self.entries[key] = move
+            self.size += move.nbytes()
+        logger.info(f"Move cache: loaded {len(self.entries)} compiled moves from {self.path}")
+
+
+def get_cache():
+    global cache
+
+    if cache is None:
+        cache = MoveCache(config.MOVE_CACHE_MB * 1e6, config.MOVE_CACHE_FILE)
+        cache.load()
+    return cache
+
+
+def save():
+    if cache is not None:
+        cache.save()
+
+
+def report():
+    if cache is not None:
+        cache.report()
+
+
+def profile_version():
+    settings = {axis: {key: config_data.get(key) for key in VERSION_KEYS}
+                for axis, config_data in config.motor_configs.items()}
+    settings['motion_profile'] = config.MOTION_PROFILE
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+
+
+def eighths(axis, steps):
+    #a step count as whole eighths of an inch, None when it is not exactly one
+    per_eighth = planner.steps_per_inch(axis) / EIGHTHS
+    count = int(round(steps / per_eighth))
+    if int(round(count * per_eighth)) != steps:
+        return None
+    return count
+
+
+def xy_move(x_steps, y_steps, profile=None):
+    #a coordinated move from rest to rest, signed steps per axis
+    if profile is None:
+        profile = config.MOTION_PROFILE
+
+    x = eighths('x', x_steps)
+    y = eighths('y', y_steps)
+    key = None if x is None or y is None else ('xy', x, y, profile)
+
+    def build():
+        plan = interpolator.plan_xy_steps(x_steps, y_steps, profile)
+        return plan, interpolator.compile_xy(plan)
+
+    return get_cache().get(key, build)
+
+
+def axis_move(axis, steps, profile=None):
+    #one axis from rest to rest; the direction pin is up to the caller
+    if profile is None:
+        profile = planner.axis_profile(axis)
+
+    count = eighths(axis, steps)
+    key = None if count is None else (axis, count, profile)
+
+    def build():
+        plan = planner.plan_axis_steps(axis, steps, profile)
+        pin = config.motor_configs[axis]['pwm_pin']
+        return plan, step_engine.compile_pulse_train(pin, plan.intervals)
+
+    return get_cache().get(key, build)
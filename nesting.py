@@ -0,0 +1,300 @@
+import csv
+import sys
+import config
+import utils.logging_config
+
+
+#Everything in here works in 1/8 inch units, the same units the keypad takes
+EIGHTHS = 8
+
+#Part orders tried by nest_best; the layout is greedy, so the order matters
+SORT_KEYS = {
+    "area": lambda part: part[0] * part[1],
+    "longest side": lambda part: max(part),
+    "perimeter": lambda part: part[0] + part[1],
+    "width": lambda part: (part[0], part[1]),
+    "height": lambda part: (part[1], part[0]),
+}
+
+
+class Board:
+    #Part of a sheet the machine can reach in one loading: the whole sheet when it fits
+    #MAX_HORIZONTAL x MAX_VERTICAL, otherwise one of the pieces it is ripped into first.
+    #Its corner goes in the machine's home corner.
+    def __init__(self, index, sheet, x, y, width, height):
+        self.index = index
+        self.sheet = sheet
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+
+
+class Placement:
+    def __init__(self, sheet, x, y, width, height, rotated, board=None):
+        self.sheet = sheet
+        self.board = board
+        self.x = x
+        self.y = y
+        self.width = width
+        self.height = height
+        self.rotated = rotated
+
+    def inches(self):
+        return self.width / EIGHTHS, self.height / EIGHTHS
+
+
+class GuillotineCut:
+    #position is the edge of the part the cut frees; the kerf goes on the far side of it.
+    #board is None for a rip that splits a sheet into boards before any goes on the machine.
+    def __init__(self, sheet, direction, position, start, length, board=None):
+        self.sheet = sheet
+        self.direction = direction
+        self.position = position
+        self.start = start
+        self.length = length
+        self.board = board
+
+    def machine_position(self, board):
+        #(horizontal, vertical) in inches from the board's corner: across the cut at its
+        #position, along it where the stroke ends
+        end = self.start + self.length
+        if self.direction == "vertical":
+            return (self.position - board.x) / EIGHTHS, (end - board.y) / EIGHTHS
+        return (end - board.x) / EIGHTHS, (self.position - board.y) / EIGHTHS
+
+    def __repr__(self):
+        where = f"sheet {self.sheet + 1}" if self.board is None else f"board {self.board + 1}"
+        return (f"{where} {self.direction} cut at {self.position / EIGHTHS} in, "
+                f"from {self.start / EIGHTHS} in, {self.length / EIGHTHS} in long")
+
+
+class NestingResult:
+    def __init__(self, placements, cuts, sheets, sheet_size, rejected, boards=()):
+        self.placements = placements
+        #in the order they are made; every cut comes after the one that freed its piece
+        self.cuts = cuts
+        self.sheets = sheets
+        self.sheet_size = sheet_size
+        self.rejected = rejected
+        self.boards = list(boards)
+
+    def used_area(self):
+        return sum(p.width * p.height for p in self.placements)
+
+    def yield_fraction(self):
+        if self.sheets == 0:
+            return 0.0
+        return self.used_area() / (self.sheets * self.sheet_size[0] * self.sheet_size[1])
+
+    def rip_cuts(self):
+        #what splits the sheets into boards, made before the boards go on the machine
+        return [cut for cut in self.cuts if cut.board is None]
+
+    def machine_cuts(self):
+        #[(board, cut, (horizontal, vertical))] board by board, each board's cuts in the
+        #order the guillotine layout needs them
+        cuts = [cut for cut in self.cuts if cut.board is not None]
+        cuts.sort(key=lambda cut: cut.board)
+        return [(self.boards[cut.board], cut, cut.machine_position(self.boards[cut.board])) for cut in cuts]
+
+    def cut_list(self):
+        #(horizontal, vertical) head positions in inches for every through-cut, in cutting order
+        return [position for _, _, position in self.machine_cuts()]
+
+
+def to_eighths(inches):
+    return int(round(inches * EIGHTHS))
+
+
+def fits_machine(width, height):
+    return (to_eighths(config.MIN_HORIZONTAL) <= width <= to_eighths(config.MAX_HORIZONTAL) and
+            to_eighths(config.MIN_VERTICAL) <= height <= to_eighths(config.MAX_VERTICAL))
+
+
+def orientations(width, height, allow_rotation):
+    options = []
+    if fits_machine(width, height):
+        options.append((width, height, False))
+    if allow_rotation and width != height and fits_machine(height, width):
+        options.append((height, width, True))
+    return options
+
+
+def nest(parts, sheet_width=None, sheet_height=None, kerf=None, allow_rotation=None, sort_key="area"):
+    #parts: list of (width, height) in 1/8 inch units, one entry per piece
+    sheet_width = sheet_width if sheet_width is not None else to_eighths(config.SHEET_WIDTH)
+    sheet_height = sheet_height if sheet_height is not None else to_eighths(config.SHEET_HEIGHT)
+    kerf = kerf if kerf is not None else to_eighths(config.KERF)
+    if allow_rotation is None:
+        allow_rotation = config.NESTING_ALLOW_ROTATION
+    #a sheet bigger than the machine reaches is ripped into boards that fit it
+    board_width = min(sheet_width, to_eighths(config.MAX_HORIZONTAL))
+    board_height = min(sheet_height, to_eighths(config.MAX_VERTICAL))
+
+    #biggest parts first leaves the small ones to fill the offcuts
+    key = SORT_KEYS[sort_key]
+    order = sorted(range(len(parts)), key=lambda i: key(parts[i]), reverse=True)
+
+    #free rectangles: (board, x, y, width, height) in sheet coordinates
+    free = []
+    boards = []
+    placements = []
+    cuts = []
+    rejected = []
+    sheets = 0
+
+    for index in order:
+        width, height = parts[index]
+        options = [(w, h, r) for w, h, r in orientations(width, height, allow_rotation)
+                   if w <= board_width and h <= board_height]
+        if not options:
+            rejected.append(parts[index])
+            continue
+
+        best = find_best_fit(free, options)
+        if best is None:
+            first = len(free)
+            for board in rip(sheets, sheet_width, sheet_height, board_width, board_height, kerf, boards, cuts):
+                free.append((board.index, board.x, board.y, board.width, board.height))
+            sheets += 1
+            #the first board of a sheet is always a full one
+            best = find_best_fit(free[first:first + 1], options)
+            best = (first,) + best[1:]
+
+        slot, w, h, rotated = best
+        board, x, y, free_width, free_height = free.pop(slot)
+        sheet = boards[board].sheet
+        placements.append(Placement(sheet, x, y, w, h, rotated, board))
+        free.extend(split(board, sheet, x, y, free_width, free_height, w, h, kerf, cuts))
+
+    return NestingResult(placements, cuts, sheets, (sheet_width, sheet_height), rejected, boards)
+
+
+def rip(sheet, sheet_width, sheet_height, board_width, board_height, kerf, boards, cuts):
+    #Splits a new sheet into boards of at most board_width x board_height: rows across the
+    #whole sheet first, then each row into boards, all before anything goes on the machine.
+    #Returns the new boards; a strip too narrow for any part is a board nothing fits on.
+    rows = offsets(sheet_height, board_height, kerf)
+    columns = offsets(sheet_width, board_width, kerf)
+    new = []
+    for row_y, row_height in rows:
+        if row_y + row_height < sheet_height:
+            cuts.append(GuillotineCut(sheet, "horizontal", row_y + row_height, 0, sheet_width))
+    for row_y, row_height in rows:
+        for column_x, column_width in columns:
+            if column_x + column_width < sheet_width:
+                cuts.append(GuillotineCut(sheet, "vertical", column_x + column_width, row_y, row_height))
+            board = Board(len(boards), sheet, column_x, row_y, column_width, row_height)
+            boards.append(board)
+            new.append(board)
+    return new
+
+
+def offsets(length, most, kerf):
+    #(start, length) of the pieces a length is cut into, none longer than most
+    pieces = []
+    start = 0
+    while start < length:
+        pieces.append((start, min(most, length - start)))
+        start += most + kerf
+    return pieces
+
+
+def nest_best(parts, **options):
+    #a handful of greedy passes is still only milliseconds for a few hundred parts
+    best = None
+    for sort_key in SORT_KEYS:
+        result = nest(parts, sort_key=sort_key, **options)
+        if best is None or (result.sheets, -result.yield_fraction()) < (best.sheets, -best.yield_fraction()):
+            best = result
+    return best
+
+
+def find_best_fit(free, options):
+    #best area fit: the free rectangle that leaves the least waste around the part
+    best = None
+    best_waste = None
+    for slot, (_, _, _, free_width, free_height) in enumerate(free):
+        for w, h, rotated in options:
+            if w <= free_width and h <= free_height:
+                waste = free_width * free_height - w * h
+                if best_waste is None or waste < best_waste:
+                    best = (slot, w, h, rotated)
+                    best_waste = waste
+    return best
+
+
+def split(board, sheet, x, y, free_width, free_height, w, h, kerf, cuts):
+    #Each placement splits its free rectangle with two straight through-cuts, so every
+    #layout stays guillotine-feasible. The kerf is taken out of the offcut side.
+    right = free_width - w - kerf
+    top = free_height - h - kerf
+    pieces = []
+
+    #split along the shorter leftover so the bigger offcut stays in one piece
+    if right < top:
+        if top > 0:
+            cuts.append(GuillotineCut(sheet, "horizontal", y + h, x, free_width, board))
+            pieces.append((board, x, y + h + kerf, free_width, top))
+        if right > 0:
+            cuts.append(GuillotineCut(sheet, "vertical", x + w, y, h, board))
+            pieces.append((board, x + w + kerf, y, right, h))
+    else:
+        if right > 0:
+            cuts.append(GuillotineCut(sheet, "vertical", x + w, y, free_height, board))
+            pieces.append((board, x + w + kerf, y, right, free_height))
+        if top > 0:
+            cuts.append(GuillotineCut(sheet, "horizontal", y + h, x, w, board))
+            pieces.append((board, x, y + h + kerf, w, top))
+
+    return pieces
+
+
+def load_parts(path):
+    #one part per row: horizontal,vertical[,quantity] in inches; a header row is skipped
+    parts = []
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0].strip().startswith("#"):
+                continue
+            try:
+                width, height = to_eighths(float(row[0])), to_eighths(float(row[1]))
+                quantity = int(row[2]) if len(row) > 2 and row[2].strip() else 1
+            except ValueError:
+                if parts:
+                    raise ValueError(f"Bad parts list row: {row}")
+                continue
+            parts.extend([(width, height)] * quantity)
+    return parts
+
+
+def write_cut_list(result, path):
+    #the nested cut list CSV, one row per through-cut in cutting order; the board and direction
+    #columns are for the operator, cut list readers only take the first two
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["horizontal", "vertical", "board", "direction"])
+        for board, cut, (horizontal, vertical) in result.machine_cuts():
+            writer.writerow([horizontal, vertical, board.index + 1, cut.direction])
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python nesting.py parts.csv [nested_cuts.csv]")
+        sys.exit(1)
+
+    utils.logging_config.init_logging()
+    #not the batch file: Run Batch reorders that one, a guillotine sequence must run as written
+    output = sys.argv[2] if len(sys.argv) > 2 else config.NESTED_FILE
+    result = nest_best(load_parts(sys.argv[1]))
+    write_cut_list(result, output)
+
+    print(f"{len(result.placements)} parts on {result.sheets} sheets, yield {result.yield_fraction():.1%}")
+    for cut in result.rip_cuts():
+        print(f"Before loading: {cut}")
+    for board, cut, (horizontal, vertical) in result.machine_cuts():
+        print(f"{cut}: head to {horizontal} x {vertical}")
+    if result.rejected:
+        print(f"{len(result.rejected)} parts do not fit the machine limits or the sheet")
+    print(f"Cut list written to {output}, Load Nested runs it in this order")
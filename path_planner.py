@@ -0,0 +1,191 @@
+import collections
+import numpy as np
+import config
+import interpolator
+import planner
+import sequencer
+import step_engine
+
+
+#Segments looked at before the first one is committed; the window always ends in a stop
+PLANNER_WINDOW = 16
+
+#Step edges blended before the path is brought to rest. Everything between two stops is
+#compiled into one schedule before it plays, at about 10 bytes an edge, so this bounds
+#its memory and the wait for first motion on a program that would otherwise never stop
+RUN_EDGES = 400000
+
+
+class PathSegment:
+    #one straight move of a chained path with its limits along the path, in inches
+    def __init__(self, x_steps, y_steps, feed=None):
+        self.x_steps = x_steps
+        self.y_steps = y_steps
+        self.feed = feed
+        #rising and falling edge of every step, once compiled
+        self.edges = 2 * (abs(x_steps) + abs(y_steps))
+
+        inches = (x_steps / planner.steps_per_inch('x'), y_steps / planner.steps_per_inch('y'))
+        self.length = float(np.hypot(*inches))
+        self.unit = (inches[0] / self.length, inches[1] / self.length) if self.length else (0.0, 0.0)
+
+        #the axis that has to move fastest for its share of the path sets the limit
+        self.max_velocity = feed if feed else np.inf
+        self.accel = np.inf
+        for axis, component in zip(['x', 'y'], self.unit):
+            if component:
+                config_data = config.motor_configs[axis]
+                self.max_velocity = min(self.max_velocity, config_data['max_velocity'] / abs(component))
+                self.accel = min(self.accel, config_data['max_accel'] / abs(component))
+
+        self.entry = 0.0
+        self.exit = 0.0
+
+    def plan(self, profile=None):
+        return interpolator.plan_xy_steps(self.x_steps, self.y_steps, profile, self.feed,
+                                          self.entry, self.exit)
+
+
+def junction_velocity(previous, segment):
+    #junction deviation: the speed at which a circle that stays JUNCTION_DEVIATION
+    #from the corner can be followed at the acceleration limit
+    cos_theta = -(previous.unit[0] * segment.unit[0] + previous.unit[1] * segment.unit[1])
+    if cos_theta > 0.999999:
+        #straight back the way it came
+        return 0.0
+
+    limit = min(previous.max_velocity, segment.max_velocity)
+    if cos_theta < -0.999999:
+        return limit
+
+    sin_half = np.sqrt((1 - cos_theta) / 2)
+    accel = min(previous.accel, segment.accel)
+    return min(limit, np.sqrt(accel * config.JUNCTION_DEVIATION * sin_half / (1 - sin_half)))
+
+
+def plan_velocities(segments, entry=0.0):
+    #boundary speeds: entry, one per junction, then a full stop after the last segment
+    speeds = [entry] + [junction_velocity(a, b) for a, b in zip(segments, segments[1:])] + [0.0]
+
+    #backward pass: from every junction the rest of the path must still be able to stop
+    for i in range(len(segments) - 1, 0, -1):
+        segment = segments[i]
+        speeds[i] = min(speeds[i], np.sqrt(speeds[i + 1] ** 2 + 2 * segment.accel * segment.length))
+
+    #forward pass: and every junction must be reachable from the one before it
+    for i, segment in enumerate(segments):
+        speeds[i + 1] = min(speeds[i + 1], np.sqrt(speeds[i] ** 2 + 2 * segment.accel * segment.length))
+
+    for i, segment in enumerate(segments):
+        segment.entry = speeds[i]
+        segment.exit = speeds[i + 1]
+
+
+def blend(items, profile=None, window=None):
+    #items only need delta() in signed steps and a feed; yields (item, XYPlan) in order.
+    #Only the first segment of the window is committed, so its exit speed never depends
+    #on segments that have not been read yet. A window of 1 stops at every segment.
+    if window is None:
+        window = PLANNER_WINDOW if config.JUNCTION_BLENDING else 1
+
+    pending = collections.deque()
+    entry = 0.0
+    #edges since the path was last at rest
+    run_edges = 0
+
+    for item in items:
+        segment = PathSegment(*item.delta(), feed=item.feed)
+        if run_edges and run_edges + segment.edges > RUN_EDGES:
+            #the run is full: what is pending comes to rest and this segment starts the next
+            yield from flush(pending, entry, window, profile)
+            entry = 0.0
+            run_edges = 0
+        pending.append((item, segment))
+        run_edges += segment.edges
+
+        if len(pending) >= window:
+            item, segment = commit(pending, entry, window)
+            entry = segment.exit
+            if not entry:
+                run_edges = sum(waiting.edges for _, waiting in pending)
+            yield item, segment.plan(profile)
+
+    yield from flush(pending, entry, window, profile)
+
+
+def flush(pending, entry, window, profile):
+    #the window always ends in a stop, so the last segment comes to rest
+    while pending:
+        item, segment = commit(pending, entry, window)
+        entry = segment.exit
+        yield item, segment.plan(profile)
+
+
+def commit(pending, entry, window):
+    if window > 1:
+        plan_velocities([segment for _, segment in pending], entry)
+    return pending.popleft()
+
+
+def runs(planned):
+    #groups (item, XYPlan, ...) tuples from rest to rest; a run plays as one schedule,
+    #so the motors never wait between its segments
+    run = []
+    for item in planned:
+        run.append(item)
+        if not item[1].exit:
+            yield run
+            run = []
+    if run:
+        yield run
+
+
+def run_timing(plans):
+    #Start of every segment on the run's clock, the direction pins it changes and when,
+    #and the time of the run's last edge. A segment starts the moment the one before it
+    #ends, unless an axis turns round: its pin changes after the last edge, then waits DIR_SETUP.
+    levels = {}
+    timing = []
+    time = 0.0
+    last_edge = 0.0
+    for plan in plans:
+        pins, changes = [], []
+        for axis in ['x', 'y']:
+            config_data = config.motor_configs[axis]
+            level = config_data['direction'][plan.directions[axis]]
+            if plan.steps(axis) and levels.get(axis) != level:
+                levels[axis] = level
+                pins.append(config_data['dir_pin'])
+                changes.append(level)
+        if pins:
+            time = max(time, last_edge + sequencer.DIR_SETUP)
+
+        timing.append((time, last_edge, pins, changes))
+        duration = plan.duration()
+        last_edge = time + duration - float(plan.major_plan.intervals[-1]) / 2
+        time += duration
+    return timing, last_edge
+
+
+def compile_run(plans, schedules):
+    #the segments' own schedules on one clock, with their direction edges in between
+    timing, _ = run_timing(plans)
+    parts = []
+    for (start, turn, pins, levels), schedule in zip(timing, schedules):
+        if pins:
+            parts.append(step_engine.compile_levels([turn] * len(pins), pins, levels))
+        parts.append(schedule.shifted(start))
+    return step_engine.join_schedules(*parts)
+
+
+def path_time(items, profile=None, blended=True):
+    #machine time for a whole path, with junction blending or stopping at every segment;
+    #the player starts every run START_LEAD after the last one's final edge
+    window = PLANNER_WINDOW if blended else 1
+    return sum(step_engine.START_LEAD + run_timing([plan for _, plan in run])[1]
+               for run in runs(blend(items, profile, window)))
+
+
+def compare_cycle_time(items, profile=None):
+    items = list(items)
+    return path_time(items, profile, blended=True), path_time(items, profile, blended=False)
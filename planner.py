@@ -0,0 +1,247 @@
+import numpy as np
+import config
+
+
+PROFILES = ("constant", "trapezoid", "scurve")
+
+
+class MovePlan:
+    def __init__(self, steps, intervals, peak_velocity, profile, axis=None, distance=None):
+        self.steps = steps
+        self.intervals = intervals
+        self.peak_velocity = peak_velocity
+        self.profile = profile
+        self.axis = axis
+        self.distance = distance
+
+    def duration(self):
+        return float(self.intervals.sum())
+
+    def __repr__(self):
+        return (f"MovePlan(axis={self.axis}, steps={self.steps}, profile={self.profile}, "
+                f"peak={self.peak_velocity:.0f} steps/s, duration={self.duration():.3f} s)")
+
+
+def steps_per_inch(axis):
+    config_data = config.motor_configs[axis]
+    return config_data['steps_per_rev'] * config_data['pitch']
+
+
+def axis_limits(axis):
+    #motor_configs holds limits in inches, the planner works in steps
+    config_data = config.motor_configs[axis]
+    scale = steps_per_inch(axis)
+
+    return (config_data['max_velocity'] * scale,
+            config_data['max_accel'] * scale,
+            config_data['max_jerk'] * scale)
+
+
+def constant_velocity(axis):
+    #the legacy fixed-RPM step rate used by the "constant" profile
+    import motor
+    return motor.RPM_to_frequency(config.motor_configs[axis]['rpm'])
+
+
+def axis_profile(axis):
+    #an axis can carry its own profile in motor_configs, e.g. the blade
+    return config.motor_configs[axis].get('profile', config.MOTION_PROFILE)
+
+
+def plan_move(axis, distance, profile=None):
+    plan = plan_axis_steps(axis, int(distance * steps_per_inch(axis)), profile)
+    plan.distance = distance
+    return plan
+
+
+def plan_axis_steps(axis, total_steps, profile=None):
+    if profile is None:
+        profile = axis_profile(axis)
+
+    velocity, accel, jerk = axis_limits(axis)
+
+    if profile == "constant":
+        velocity = constant_velocity(axis)
+
+    plan = plan_steps(total_steps, velocity, accel, jerk, profile)
+    plan.axis = axis
+    return plan
+
+
+def plan_steps(total_steps, max_velocity, max_accel, max_jerk=None, profile="trapezoid"):
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown motion profile: {profile}")
+
+    if total_steps <= 0:
+        return MovePlan(0, np.zeros(0), 0.0, profile)
+
+    if profile == "constant":
+        intervals = np.full(total_steps, 1 / max_velocity)
+        return MovePlan(total_steps, intervals, max_velocity, profile)
+
+    if profile == "scurve" and max_jerk:
+        peak, accel_time = scurve_peak(total_steps, max_velocity, max_accel, max_jerk)
+        accel_steps = peak * accel_time / 2
+        ramp = lambda n: scurve_time_at(n, peak, max_accel, max_jerk, accel_time)
+    else:
+        profile = "trapezoid"
+        peak = min(max_velocity, np.sqrt(max_accel * total_steps))
+        accel_time = peak / max_accel
+        accel_steps = peak * accel_time / 2
+        ramp = lambda n: np.sqrt(2 * n / max_accel)
+
+    times = step_times(total_steps, peak, accel_steps, accel_time, ramp)
+    return MovePlan(total_steps, np.diff(times), peak, profile)
+
+
+def plan_blended(total_steps, entry, exit, max_velocity, max_accel):
+    #trapezoid that starts at entry and ends at exit steps/s instead of at rest,
+    #for segments that flow into each other through a junction
+    if total_steps <= 0:
+        return MovePlan(0, np.zeros(0), 0.0, "trapezoid")
+
+    entry = min(entry, max_velocity)
+    exit = min(exit, max_velocity)
+
+    peak = max_velocity
+    if (2 * peak ** 2 - entry ** 2 - exit ** 2) / (2 * max_accel) > total_steps:
+        peak = np.sqrt((2 * max_accel * total_steps + entry ** 2 + exit ** 2) / 2)
+    #the lookahead passes keep entry/exit reachable; this only absorbs rounding
+    peak = max(peak, entry, exit)
+
+    accel_steps = (peak ** 2 - entry ** 2) / (2 * max_accel)
+    decel_steps = (peak ** 2 - exit ** 2) / (2 * max_accel)
+    cruise_steps = max(total_steps - accel_steps - decel_steps, 0.0)
+    total_time = (peak - entry) / max_accel + cruise_steps / peak + (peak - exit) / max_accel
+
+    n = np.arange(total_steps + 1, dtype=np.float64)
+    times = np.empty_like(n)
+
+    accel = n <= accel_steps
+    decel = n >= total_steps - decel_steps
+    cruise = ~(accel | decel)
+
+    times[accel] = (np.sqrt(entry ** 2 + 2 * max_accel * n[accel]) - entry) / max_accel
+    times[cruise] = (peak - entry) / max_accel + (n[cruise] - accel_steps) / peak
+    remaining = np.maximum(total_steps - n[decel], 0.0)
+    times[decel] = total_time - (np.sqrt(exit ** 2 + 2 * max_accel * remaining) - exit) / max_accel
+
+    return MovePlan(total_steps, np.diff(times), peak, "trapezoid")
+
+
+def step_times(total_steps, peak, accel_steps, accel_time, ramp):
+    #time at which the axis reaches each whole step, 0..total_steps
+    n = np.arange(total_steps + 1, dtype=np.float64)
+    cruise_steps = max(total_steps - 2 * accel_steps, 0.0)
+    total_time = 2 * accel_time + cruise_steps / peak
+
+    times = np.empty_like(n)
+
+    accel = n <= accel_steps
+    decel = n >= total_steps - accel_steps
+    cruise = ~(accel | decel)
+
+    times[accel] = ramp(n[accel])
+    times[cruise] = accel_time + (n[cruise] - accel_steps) / peak
+    #deceleration mirrors acceleration from the far end of the move
+    times[decel] = total_time - ramp(np.maximum(total_steps - n[decel], 0.0))
+
+    return times
+
+
+def scurve_accel_time(velocity, max_accel, max_jerk):
+    if velocity <= max_accel ** 2 / max_jerk:
+        return 2 * np.sqrt(velocity / max_jerk)
+    return velocity / max_accel + max_accel / max_jerk
+
+
+def scurve_peak(total_steps, max_velocity, max_accel, max_jerk):
+    accel_time = scurve_accel_time(max_velocity, max_accel, max_jerk)
+    if max_velocity * accel_time <= total_steps:
+        return max_velocity, accel_time
+
+    #short move: find the highest peak whose ramps still fit in the distance
+    low, high = 0.0, max_velocity
+    for _ in range(60):
+        mid = (low + high) / 2
+        if mid * scurve_accel_time(mid, max_accel, max_jerk) <= total_steps:
+            low = mid
+        else:
+            high = mid
+
+    return low, scurve_accel_time(low, max_accel, max_jerk)
+
+
+def scurve_position(t, peak, max_accel, max_jerk, accel_time):
+    #jerk-limited ramp from rest: jerk up, constant accel, jerk down
+    t = np.asarray(t, dtype=np.float64)
+    jerk_time = min(max_accel / max_jerk, accel_time / 2)
+    hold_time = accel_time - 2 * jerk_time
+    accel = max_jerk * jerk_time
+
+    v1 = max_jerk * jerk_time ** 2 / 2
+    s1 = max_jerk * jerk_time ** 3 / 6
+    v2 = v1 + accel * hold_time
+    s2 = s1 + v1 * hold_time + accel * hold_time ** 2 / 2
+
+    t1 = np.clip(t, 0, jerk_time)
+    t2 = np.clip(t - jerk_time, 0, hold_time)
+    t3 = np.clip(t - jerk_time - hold_time, 0, jerk_time)
+
+    return np.where(t <= jerk_time, max_jerk * t1 ** 3 / 6,
+           np.where(t <= jerk_time + hold_time, s1 + v1 * t2 + accel * t2 ** 2 / 2,
+                    s2 + v2 * t3 + accel * t3 ** 2 / 2 - max_jerk * t3 ** 3 / 6))
+
+
+def scurve_time_at(n, peak, max_accel, max_jerk, accel_time):
+    #invert position(t) by interpolating a dense grid, then polish with Newton steps
+    n = np.asarray(n, dtype=np.float64)
+    grid = np.linspace(0, accel_time, max(2048, 4 * len(n)))
+    positions = scurve_position(grid, peak, max_accel, max_jerk, accel_time)
+    t = np.interp(n, positions, grid)
+
+    jerk_time = min(max_accel / max_jerk, accel_time / 2)
+    hold_time = accel_time - 2 * jerk_time
+    accel = max_jerk * jerk_time
+    v1 = max_jerk * jerk_time ** 2 / 2
+    v2 = v1 + accel * hold_time
+
+    for _ in range(3):
+        t3 = np.clip(t - jerk_time - hold_time, 0, jerk_time)
+        velocity = np.where(t <= jerk_time, max_jerk * t ** 2 / 2,
+                   np.where(t <= jerk_time + hold_time, v1 + accel * (t - jerk_time),
+                            v2 + accel * t3 - max_jerk * t3 ** 2 / 2))
+        error = scurve_position(t, peak, max_accel, max_jerk, accel_time) - n
+        safe = velocity > 1e-9
+        t = np.where(safe, t - error / np.where(safe, velocity, 1.0), t)
+        t = np.clip(t, 0, accel_time)
+
+    return t
+
+
+def estimate_move_time(axis, distance, profile=None):
+    if profile is None:
+        profile = axis_profile(axis)
+
+    total_steps = int(distance * steps_per_inch(axis))
+    if total_steps <= 0:
+        return 0.0
+
+    velocity, accel, jerk = axis_limits(axis)
+
+    if profile == "constant":
+        return total_steps / constant_velocity(axis)
+
+    if profile == "scurve":
+        peak, accel_time = scurve_peak(total_steps, velocity, accel, jerk)
+    else:
+        peak = min(velocity, np.sqrt(accel * total_steps))
+        accel_time = peak / accel
+
+    accel_steps = peak * accel_time / 2
+    return 2 * accel_time + max(total_steps - 2 * accel_steps, 0.0) / peak
+
+
+def estimate_cycle_time(moves, profile=None):
+    #moves is a list of (axis, distance) pairs run back to back
+    return sum(estimate_move_time(axis, distance, profile) for axis, distance in moves)
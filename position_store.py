@@ -0,0 +1,39 @@
+import json
+import os
+import config
+
+
+#The machine position survives restarts only if the file says the last move finished.
+#A crash or power cut mid-move leaves "moving" set and the next start homes again.
+
+def save(steps, homed, moving):
+    state = {'steps': steps, 'homed': homed, 'moving': moving}
+
+    directory = os.path.dirname(config.POSITION_FILE)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    #write a temp file and swap it in, so a reader never sees half a file
+    tmp_path = config.POSITION_FILE + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, config.POSITION_FILE)
+
+
+def load():
+    #(steps per axis, homed), or (None, False) when the position can't be trusted
+    try:
+        with open(config.POSITION_FILE) as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None, False
+
+    if state.get('moving') or not state.get('homed'):
+        return None, False
+
+    steps = state.get('steps', {})
+    if set(steps) != set(config.motor_configs):
+        return None, False
+    return {axis: int(value) for axis, value in steps.items()}, True
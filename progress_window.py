@@ -1,13 +1,7 @@
-import sys
-import config
-import requests
-import threading
-import time
 import tkinter as tk
 from tkinter import ttk
-from tkinter import PhotoImage
-from tkinter import messagebox
-from io import BytesIO
+import config
+import motion_events
 
 class ProgressWindow:
     def __init__(self, parent, logger, message_var):
@@ -15,6 +9,9 @@ class ProgressWindow:
         self.message_var = message_var
         
         self.cancel_flag = False
+        self.motion = None
+        self.progress = None
+        self.on_finish = None
 
         self.progress_window = tk.Toplevel(parent)
         self.progress_window.attributes("-topmost", True)
@@ -22,23 +19,34 @@ class ProgressWindow:
         self.progress_window.title("Cutting")
 
         self.progress_window.columnconfigure(0, weight=1)
+        self.progress_window.columnconfigure(1, weight=1)
 
         self.progress_window.rowconfigure(0, weight=1)
         self.progress_window.rowconfigure(1, weight=1)
         self.progress_window.rowconfigure(2, weight=1)
-        self.progress_window.rowconfigure(3, weight=3)
+        self.progress_window.rowconfigure(3, weight=1)
+        self.progress_window.rowconfigure(4, weight=3)
 
-        progress_label = ttk.Label(self.progress_window, text="Cutting Board", font="Arial 32", anchor="center")
-        progress_label.grid(row=0, column=0, sticky="nsew")
+        self.phase_var = tk.StringVar(value="Cutting Board")
+        progress_label = ttk.Label(self.progress_window, textvariable=self.phase_var, font="Arial 32", anchor="center")
+        progress_label.grid(row=0, column=0, columnspan=2, sticky="nsew")
 
         cut_length = ttk.Label(self.progress_window, textvariable=self.message_var, font="Arial 24", anchor="center")
-        cut_length.grid(row=1, column=0, sticky="nsew")
+        cut_length.grid(row=1, column=0, columnspan=2, sticky="nsew")
 
         self.progress_bar = ttk.Progressbar(self.progress_window, maximum=100)
-        self.progress_bar.grid(row=2, column=0, sticky="nsew")
+        self.progress_bar.grid(row=2, column=0, columnspan=2, sticky="nsew")
+
+        self.eta_var = tk.StringVar(value="")
+        eta_label = ttk.Label(self.progress_window, textvariable=self.eta_var, font="Arial 16", anchor="center")
+        eta_label.grid(row=3, column=0, columnspan=2, sticky="nsew")
+
+        self.pause_text = tk.StringVar(value="Pause")
+        pause_button = ttk.Button(self.progress_window, textvariable=self.pause_text, command=lambda: self.toggle_pause())
+        pause_button.grid(row=4, column=0, sticky="nsew")
 
         cancel_button = ttk.Button(self.progress_window, text="Cancel Cut", command=lambda: self.cancel_process())
-        cancel_button.grid(row=3, column=0, sticky="nsew")
+        cancel_button.grid(row=4, column=1, sticky="nsew")
 
         self.hide_progress_window()
 
@@ -48,27 +56,52 @@ class ProgressWindow:
     def hide_progress_window(self):
         self.progress_window.withdraw()
 
-    def begin_progress(self):
+    def begin_progress(self, motion, job_id, on_finish=None):
         self.cancel_flag = False
+        self.motion = motion
+        self.on_finish = on_finish
+        self.progress = motion_events.ProgressTracker(job_id)
+
         self.progress_bar["value"]=0
-        threading.Thread(target=self.cut).start()
+        self.phase_var.set("Cutting Board")
+        self.pause_text.set("Pause")
+        self.eta_var.set("")
         self.logger.info("Starting Cut") 
 
-    def cut(self):
-        for i in range(50):
-            if self.cancel_flag:
-                self.cut_title = "Cut Canceled"
-                self.cut_message = "The cut has been canceled without completing."
-                break
-            else:
-                self.progress_bar.step(2)
-            time.sleep(0.1)
-        if not self.cancel_flag:
+        self.progress_window.after(self.refresh_ms(), self.poll_progress)
+
+    def refresh_ms(self):
+        return max(int(1000 / config.UI_REFRESH_HZ), 1)
+
+    def poll_progress(self):
+        #runs on the Tk thread: drain everything the motion layer sent since the last frame
+        self.progress.apply(self.motion.drain_events())
+
+        self.progress_bar["value"] = self.progress.fraction * 100
+        self.eta_var.set(self.progress.eta_text())
+        if self.progress.phase is not None:
+            self.phase_var.set(self.progress.phase_name())
+
+        if self.progress.finished():
+            self.finish_cut(self.progress.final)
+        else:
+            self.progress_window.after(self.refresh_ms(), self.poll_progress)
+
+    def finish_cut(self, status):
+        if status.state == motion_events.STATE_DONE:
             self.cut_title = "Cut Completed"
             self.cut_message = "The cut has been completed successfully"
+        elif status.state == motion_events.STATE_CANCELED:
+            self.cut_title = "Cut Canceled"
+            self.cut_message = "The cut has been canceled without completing."
+        else:
+            self.cut_title = "Cut Failed"
+            self.cut_message = "The cut stopped because of a motion error."
         self.logger.info(f"{self.cut_title} - {self.cut_message}")
-        print("done")
         self.hide_progress_window()
+
+        if self.on_finish is not None:
+            self.on_finish(status)
         
     def get_cut_message(self):
         return self.cut_title, self.cut_message
@@ -76,4 +109,17 @@ class ProgressWindow:
 
     def cancel_process(self):
         self.cancel_flag = True
-  
\ No newline at end of file
+        if self.motion is not None:
+            self.motion.cancel()
+
+    def toggle_pause(self):
+        #the head ramps down and holds; resuming finishes the same board without homing
+        if self.motion is None or self.cancel_flag:
+            return
+        if self.pause_text.get() == "Pause":
+            self.motion.pause()
+            self.pause_text.set("Resume")
+        else:
+            self.motion.resume()
+            self.pause_text.set("Pause")
+  
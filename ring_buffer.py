@@ -0,0 +1,69 @@
+import struct
+from multiprocessing import shared_memory
+
+
+HEADER = struct.Struct("<QQ")
+COUNTER = struct.Struct("<Q")
+
+
+class RingBuffer:
+    #Single-producer single-consumer ring of fixed-size records in shared memory.
+    #The producer only ever writes head and the consumer only ever writes tail,
+    #so neither side needs a lock.
+    def __init__(self, record_format, capacity=256, name=None):
+        self.record = struct.Struct(record_format)
+        self.record_format = record_format
+        self.capacity = capacity
+
+        if name is None:
+            size = HEADER.size + capacity * self.record.size
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            HEADER.pack_into(self.shm.buf, 0, 0, 0)
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+
+        self.name = self.shm.name
+        self.buf = self.shm.buf
+
+    def attach_args(self):
+        return (self.record_format, self.capacity, self.name)
+
+    def push(self, *values):
+        head, tail = HEADER.unpack_from(self.buf, 0)
+        if head - tail >= self.capacity:
+            return False
+
+        offset = HEADER.size + (head % self.capacity) * self.record.size
+        self.record.pack_into(self.buf, offset, *values)
+        COUNTER.pack_into(self.buf, 0, head + 1)
+        return True
+
+    def pop(self):
+        head, tail = HEADER.unpack_from(self.buf, 0)
+        if tail == head:
+            return None
+
+        offset = HEADER.size + (tail % self.capacity) * self.record.size
+        values = self.record.unpack_from(self.buf, offset)
+        COUNTER.pack_into(self.buf, COUNTER.size, tail + 1)
+        return values
+
+    def drain(self):
+        records = []
+        record = self.pop()
+        while record is not None:
+            records.append(record)
+            record = self.pop()
+        return records
+
+    def __len__(self):
+        head, tail = HEADER.unpack_from(self.buf, 0)
+        return head - tail
+
+    def close(self):
+        self.buf = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
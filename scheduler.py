@@ -0,0 +1,255 @@
+import csv
+import json
+import time
+import config
+import cut_limits
+import planner
+
+
+class BatchPlan:
+    def __init__(self, cuts, estimated_time, naive_time, return_home=False):
+        self.cuts = cuts
+        self.estimated_time = estimated_time
+        self.naive_time = naive_time
+        self.return_home = return_home
+
+    def points(self):
+        #absolute head positions, in cutting order
+        return list(self.cuts)
+
+    def summary(self):
+        minutes, seconds = divmod(int(round(self.estimated_time)), 60)
+        return f"{len(self.cuts)} cuts, estimated run time {minutes}:{seconds:02d}"
+
+
+class TravelCost:
+    #move times are looked up many times while ordering, so each pair is estimated once
+    def __init__(self):
+        self.axis_times = {}
+
+    def axis_time(self, axis, distance):
+        key = (axis, round(abs(distance), 4))
+        if key not in self.axis_times:
+            self.axis_times[key] = planner.estimate_move_time(axis, abs(distance))
+        return self.axis_times[key]
+
+    def move_time(self, a, b):
+        #both axes run together, so the slower one sets the time
+        return max(self.axis_time('x', b[0] - a[0]), self.axis_time('y', b[1] - a[1]))
+
+    def path_time(self, points, start=(0.0, 0.0)):
+        total = 0.0
+        previous = start
+        for point in points:
+            total += self.move_time(previous, point)
+            previous = point
+        return total
+
+    def path_cost(self, points, start=(0.0, 0.0)):
+        #travel time plus a settle penalty every time an axis changes direction
+        cost = self.path_time(points, start)
+
+        last_sign = {0: 0, 1: 0}
+        previous = start
+        for point in points:
+            for axis in (0, 1):
+                delta = point[axis] - previous[axis]
+                sign = (delta > 0) - (delta < 0)
+                if sign and last_sign[axis] and sign != last_sign[axis]:
+                    cost += config.BATCH_REVERSAL_PENALTY
+                if sign:
+                    last_sign[axis] = sign
+            previous = point
+        return cost
+
+
+def sign(value):
+    return (value > 0) - (value < 0)
+
+
+def direction_changes(signs):
+    #reversals along a run of per-move directions; a move that leaves the axis still (0)
+    #doesn't end a run, the same as path_cost
+    count = 0
+    last = 0
+    for direction in signs:
+        if direction:
+            if last and direction != last:
+                count += 1
+            last = direction
+    return count
+
+
+class Route:
+    #A path as node indices, with what a 2-opt move needs to price itself in O(1): the
+    #travel time between every pair of nodes and, per axis, each move's direction and
+    #where the nearest moves that actually travel on that axis are.
+    def __init__(self, points, times, nodes):
+        self.points = points
+        self.times = times
+        self.nodes = nodes
+        self.update()
+
+    def update(self):
+        #after the route changes; O(n), only done when a move is taken
+        moves = len(self.nodes) - 1
+        self.signs = []
+        self.last_moving = []
+        self.next_moving = []
+        for axis in (0, 1):
+            #move k runs from nodes[k - 1] to nodes[k]; index 0 stands for "none"
+            signs = [0] + [sign(self.points[self.nodes[k]][axis] - self.points[self.nodes[k - 1]][axis])
+                           for k in range(1, moves + 1)]
+            last_moving = [0] * (moves + 2)
+            for k in range(1, moves + 1):
+                last_moving[k] = k if signs[k] else last_moving[k - 1]
+            next_moving = [0] * (moves + 2)
+            for k in range(moves, 0, -1):
+                next_moving[k] = k if signs[k] else next_moving[k + 1]
+            self.signs.append(signs)
+            self.last_moving.append(last_moving)
+            self.next_moving.append(next_moving)
+
+    def direction(self, axis, a, b):
+        return sign(self.points[b][axis] - self.points[a][axis])
+
+    def reversal_delta(self, p, q):
+        #change in (travel time, direction changes) from reversing nodes[p..q]. Only the
+        #moves into and out of the stretch change; the ones inside run backwards, which
+        #keeps their own direction changes
+        nodes = self.nodes
+        moves = len(nodes) - 1
+        a, b, c = nodes[p - 1], nodes[p], nodes[q]
+        d = nodes[q + 1] if q < moves else None
+
+        travel = self.times[a][c] - self.times[a][b]
+        if d is not None:
+            travel += self.times[b][d] - self.times[c][d]
+
+        changes = 0
+        for axis in (0, 1):
+            signs = self.signs[axis]
+            before = signs[self.last_moving[axis][p - 1]]
+            first = self.next_moving[axis][p + 1] if p + 1 <= moves else 0
+            last = self.last_moving[axis][q]
+            inside = (signs[first], signs[last]) if first and first <= q else (0, 0)
+            after = signs[self.next_moving[axis][q + 2]] if q + 2 <= moves else 0
+
+            old_out = signs[q + 1] if d is not None else 0
+            new_out = self.direction(axis, b, d) if d is not None else 0
+            changes += (self.boundary_changes(before, self.direction(axis, a, c), (-inside[1], -inside[0]), new_out, after)
+                        - self.boundary_changes(before, signs[p], inside, old_out, after))
+        return travel, changes
+
+    def boundary_changes(self, before, move_in, inside, move_out, after):
+        #direction changes around the stretch; those inside it are counted by neither side
+        if not inside[0]:
+            return direction_changes([before, move_in, move_out, after])
+        return direction_changes([before, move_in, inside[0]]) + direction_changes([inside[1], move_out, after])
+
+    def reverse(self, p, q):
+        self.nodes[p:q + 1] = self.nodes[p:q + 1][::-1]
+        self.update()
+
+
+def order_cuts(cuts, cost=None, start=(0.0, 0.0), end=None):
+    if cost is None:
+        cost = TravelCost()
+    if len(cuts) < 3:
+        return list(cuts)
+
+    #node 0 is the start, 1..n the cuts and n + 1 the end when the head has to finish
+    #somewhere in particular, otherwise the path is left open
+    points = [start] + list(cuts) + ([end] if end is not None else [])
+    times = [[0.0] * len(points) for _ in points]
+    for i in range(len(points)):
+        for j in range(i + 1, len(points)):
+            times[i][j] = times[j][i] = cost.move_time(points[i], points[j])
+
+    #nearest neighbour from home, then 2-opt until no reversal of a stretch helps
+    remaining = set(range(1, len(cuts) + 1))
+    nodes = [0]
+    while remaining:
+        current = times[nodes[-1]]
+        nearest = min(remaining, key=lambda node: (current[node], node))
+        remaining.remove(nearest)
+        nodes.append(nearest)
+    if end is not None:
+        nodes.append(len(points) - 1)
+
+    route = Route(points, times, nodes)
+    deadline = time.monotonic() + config.BATCH_ORDER_TIME_LIMIT
+    for _ in range(config.BATCH_ORDER_PASSES):
+        improved = False
+        for p in range(1, len(cuts)):
+            for q in range(p + 1, len(cuts) + 1):
+                travel, changes = route.reversal_delta(p, q)
+                if travel + changes * config.BATCH_REVERSAL_PENALTY < -1e-9:
+                    route.reverse(p, q)
+                    improved = True
+            if time.monotonic() > deadline:
+                break
+        if not improved or time.monotonic() > deadline:
+            break
+
+    return [points[node] for node in route.nodes[1:len(cuts) + 1]]
+
+
+def schedule_batch(cuts, start=(0.0, 0.0), return_home=None, keep_order=False):
+    #start is wherever the head is now; it only goes home at the end if configured to.
+    #keep_order is for sequences that only work as given, e.g. nested guillotine cuts
+    if return_home is None:
+        return_home = config.RETURN_HOME_AFTER_CUT
+
+    if keep_order:
+        order = list(cuts)
+    else:
+        order = order_cuts(cuts, TravelCost(), start, (0.0, 0.0) if return_home else None)
+
+    #machine time as the motion worker runs it, blade strokes and all, not just the travel
+    import cycle_estimator
+    machine = cycle_estimator.Machine()
+    machine.return_home = return_home
+    estimated_time = cycle_estimator.estimate(order, machine, batch=True, start=start).motion
+    #what the same list costs when every cut goes out from and back to home
+    machine.return_home = True
+    naive_time = cycle_estimator.estimate(cuts, machine).motion
+
+    return BatchPlan(order, estimated_time, naive_time, return_home)
+
+
+def load_cut_list(path):
+    #CSV with one cut per row, horizontal,vertical in inches ("24 3/8" works too) and a header
+    #row skipped; or JSON, a list of cuts or a job as the job API takes it
+    if path.lower().endswith(".json"):
+        return load_json_cuts(path)
+
+    cuts = []
+    with open(path, newline="") as f:
+        for row in csv.reader(f):
+            if not row or row[0].strip().startswith("#"):
+                continue
+            try:
+                cuts.append((cut_limits.parse_length(row[0]), cut_limits.parse_length(row[1])))
+            except (ValueError, IndexError):
+                if cuts:
+                    raise ValueError(f"Bad cut list row: {row}")
+    return cuts
+
+
+def load_json_cuts(path):
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, dict):
+        data = data.get('cuts', [])
+
+    cuts = []
+    for cut in data:
+        try:
+            if isinstance(cut, dict):
+                cuts.append((float(cut['horizontal']), float(cut['vertical'])))
+            else:
+                cuts.append((float(cut[0]), float(cut[1])))
+        except (KeyError, IndexError, TypeError, ValueError):
+            raise ValueError(f"Bad cut in {path}: {cut}")
+    return cuts
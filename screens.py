@@ -0,0 +1,97 @@
+import time
+import config
+import tkinter as tk
+from tkinter import ttk
+
+
+class ConfirmScreen:
+    def __init__(self, parent, message_var, on_response):
+        self.window = tk.Toplevel(parent)
+        self.window.attributes("-topmost", True)
+        self.window.attributes("-fullscreen", True)
+        self.window.title("Confirm")
+
+        self.window.columnconfigure(0, weight=1)
+        self.window.columnconfigure(1, weight=1)
+        self.window.rowconfigure(0, weight=1)
+        self.window.rowconfigure(1, weight=1)
+        self.window.rowconfigure(2, weight=3)
+
+        question_label = ttk.Label(self.window, text="Is this the correct cut?", font="Arial 32", anchor='center')
+        question_label.grid(row=0, column=0, columnspan=2, sticky="nsew")
+
+        cut_length = ttk.Label(self.window, textvariable=message_var, font="Arial 24", anchor='center')
+        cut_length.grid(row=1, column=0, columnspan=2, sticky="nsew")
+
+        confirmation_button = ttk.Button(self.window, text="Confirm", command=lambda: on_response(True))
+        confirmation_button.grid(row=2, column=0, sticky="nsew")
+
+        cancelation_button = ttk.Button(self.window, text="Cancel", command=lambda: on_response(False))
+        cancelation_button.grid(row=2, column=1, sticky="nsew")
+
+        self.window.withdraw()
+
+
+class HomingScreen:
+    def __init__(self, parent, on_ready):
+        self.window = tk.Toplevel(parent)
+        self.window.attributes("-topmost", True)
+        self.window.attributes("-fullscreen", True)
+        self.window.title("Returning to Home")
+
+        self.window.columnconfigure(0, weight=1)
+        self.window.rowconfigure(0, weight=1)
+        self.window.rowconfigure(1, weight=1)
+        self.window.rowconfigure(2, weight=3)
+
+        self.title_var = tk.StringVar(value="")
+        title_label = ttk.Label(self.window, textvariable=self.title_var, font="Arial 32", anchor="center")
+        title_label.grid(row=0, column=0, sticky="nsew")
+
+        self.message_var = tk.StringVar(value="")
+        message_label = ttk.Label(self.window, textvariable=self.message_var, font="Arial 24", anchor="center", justify="center")
+        message_label.grid(row=1, column=0, sticky="nsew")
+
+        ready_button = ttk.Button(self.window, text="Board Loaded", command=on_ready)
+        ready_button.grid(row=2, column=0, sticky="nsew")
+
+        self.window.withdraw()
+
+    def set_result(self, title, message):
+        self.title_var.set(title)
+        if config.RETURN_HOME_AFTER_CUT:
+            self.message_var.set(f"{message}\nReturning Cut Head to Home.  Wait to retrieve and load")
+        else:
+            self.message_var.set(f"{message}\nThe cut head stays here for the next cut.  Retrieve and load")
+
+
+class ScreenManager:
+    #Every screen is built once; switching only withdraws one window and raises another
+    def __init__(self, root, logger):
+        self.root = root
+        self.logger = logger
+        self.windows = {}
+        self.current = "input"
+        self.transitions = []
+
+    def add(self, name, window):
+        self.windows[name] = window
+
+    def show(self, name):
+        start = time.perf_counter()
+        previous = self.current
+
+        if previous != "input":
+            self.windows[previous].withdraw()
+        if name != "input":
+            self.windows[name].deiconify()
+            self.windows[name].lift()
+
+        self.current = name
+        self.root.after_idle(lambda: self.painted(previous, name, start))
+
+    def painted(self, previous, name, start):
+        self.root.update_idletasks()
+        elapsed = time.perf_counter() - start
+        self.transitions.append((previous, name, elapsed))
+        self.logger.info(f"Screen {previous} -> {name} painted in {elapsed * 1000:.1f} ms")
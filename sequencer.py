@@ -0,0 +1,193 @@
+import bisect
+import numpy as np
+import config
+import move_cache
+import planner
+import step_engine
+
+
+TRAVEL = "travel"
+CUT = "cut"
+PLUNGE = "plunge"
+RETRACT = "retract"
+
+#Direction pins change this long before the first step of the move that needs them
+DIR_SETUP = 10e-6
+
+
+class Operation:
+    #travel and cut are XY moves in inches; plunge and retract move the blade the full depth
+    #unless given z_steps, e.g. lifting a blade that was stopped partway down
+    def __init__(self, kind, dx=0.0, dy=0.0, phase=None, z_steps=None):
+        self.kind = kind
+        self.dx = dx
+        self.dy = dy
+        self.phase = phase
+        self.z_steps = z_steps
+
+        self.plan = None
+        #the compiled move, starting at 0; shared with the move cache
+        self.schedule = None
+        self.start = 0.0
+
+    def is_xy(self):
+        return self.kind in (TRAVEL, CUT)
+
+    def duration(self):
+        return self.plan.duration()
+
+    def end(self):
+        return self.start + DIR_SETUP + self.duration()
+
+    def intervals(self):
+        return self.plan.major_plan.intervals if self.is_xy() else self.plan.intervals
+
+    def time_after(self, steps):
+        #from the start of the operation until its step number `steps` goes out
+        return DIR_SETUP + float(self.intervals()[:max(steps, 0)].sum())
+
+    def time_before_end(self, steps):
+        #from the step `steps` before the last one until the end of the move
+        if steps <= 0:
+            return 0.0
+        return float(self.intervals()[-steps:].sum())
+
+    def steps(self):
+        return self.plan.total_steps() if self.is_xy() else self.plan.steps
+
+    def moved(self):
+        #signed steps per axis; the blade counts down from 0 at the top
+        if self.is_xy():
+            return {axis: self.plan.signed_steps(axis) for axis in ['x', 'y']}
+        return {'z': self.plan.steps if self.kind == PLUNGE else -self.plan.steps}
+
+
+class Timeline:
+    #Operations with start times; Z moves may run under the tail or head of an XY move
+    def __init__(self, operations):
+        self.operations = operations
+        self.phase_marks = []
+
+    def duration(self):
+        return max((op.end() for op in self.operations), default=0.0)
+
+    def total_steps(self):
+        return sum(op.steps() for op in self.operations)
+
+    def moved(self):
+        moved = {}
+        for op in self.operations:
+            for axis, steps in op.moved().items():
+                moved[axis] = moved.get(axis, 0) + steps
+        return moved
+
+    def compile(self):
+        schedules = []
+        for op in self.operations:
+            first_step = op.start + DIR_SETUP
+            if op.is_xy():
+                pins, levels = [], []
+                for axis in ['x', 'y']:
+                    config_data = config.motor_configs[axis]
+                    pins.append(config_data['dir_pin'])
+                    levels.append(config_data['direction'][op.plan.directions[axis]])
+                schedules.append(step_engine.compile_levels([op.start] * 2, pins, levels))
+            else:
+                config_data = config.motor_configs['z']
+                direction = 'd' if op.kind == PLUNGE else 'u'
+                schedules.append(step_engine.compile_levels([op.start], [config_data['dir_pin']],
+                                                            [config_data['direction'][direction]]))
+            schedules.append(op.schedule.shifted(first_step))
+
+        schedule = step_engine.merge_schedules(*schedules)
+        self.phase_marks = self.mark_phases(schedule)
+        return schedule
+
+    def mark_phases(self, schedule):
+        #steps already played when each operation starts, to name the phase from a step count
+        step_times = schedule.times[schedule.step_edges() == 1]
+        marks = []
+        for op in sorted(self.operations, key=lambda op: op.start):
+            if op.phase is not None:
+                marks.append((int(np.searchsorted(step_times, op.start)), op.phase))
+        return marks
+
+    def phase_at(self, steps_done):
+        if not self.phase_marks:
+            #not compiled yet, so nothing has run; e.g. a pause between two blocks
+            return next((op.phase for op in self.operations if op.phase is not None), None)
+        index = bisect.bisect_right([steps for steps, _ in self.phase_marks], steps_done) - 1
+        return self.phase_marks[max(index, 0)][1]
+
+
+def plan_operation(op, profile=None):
+    #the same panel sizes come round again and again, so moves come out of the cache
+    if op.is_xy():
+        move = move_cache.xy_move(int(round(op.dx * planner.steps_per_inch('x'))),
+                                  int(round(op.dy * planner.steps_per_inch('y'))), profile)
+    elif op.z_steps is not None:
+        move = move_cache.axis_move('z', op.z_steps)
+    else:
+        move = move_cache.axis_move('z', int(config.Z_PLUNGE_DEPTH * planner.steps_per_inch('z')))
+    op.plan = move.plan
+    op.schedule = move.schedule
+
+
+def sequence(operations, profile=None, overlap=None, blade_down=False):
+    #Give every operation a start time. XY may only travel with the blade above
+    #Z_CLEARANCE; with overlap on, Z runs into the end of an XY move whenever that rule holds.
+    if overlap is None:
+        overlap = config.Z_OVERLAP
+
+    clearance_steps = int(config.Z_CLEARANCE * planner.steps_per_inch('z'))
+
+    xy_free = 0.0
+    z_free = 0.0
+    #when the blade is next above the stock
+    blade_clear = np.inf if blade_down else 0.0
+    last_xy = None
+
+    for op in operations:
+        plan_operation(op, profile)
+
+        if op.kind == TRAVEL:
+            if blade_clear == np.inf:
+                raise ValueError("XY travel with the blade down; retract first")
+            op.start = max(xy_free, blade_clear)
+            xy_free = op.end()
+            last_xy = op
+
+        elif op.kind == CUT:
+            #the stroke starts once the blade is all the way through
+            op.start = max(xy_free, z_free)
+            xy_free = op.end()
+            last_xy = op
+
+        elif op.kind == PLUNGE:
+            op.start = max(z_free, xy_free)
+            if overlap and last_xy is not None and last_xy.kind == TRAVEL:
+                #start early enough that the blade reaches the stock just as XY stops
+                early = xy_free - op.time_after(clearance_steps)
+                op.start = max(z_free, last_xy.start, early)
+            z_free = op.end()
+            blade_clear = np.inf
+
+        elif op.kind == RETRACT:
+            op.start = max(z_free, xy_free)
+            if overlap and last_xy is not None and last_xy.kind == CUT:
+                #the last Z_OVERCUT of the stroke is past the stock, the blade can lift there
+                length = np.hypot(last_xy.dx, last_xy.dy)
+                major_steps = last_xy.plan.major_plan.steps
+                overcut_steps = int(major_steps * min(config.Z_OVERCUT / length, 1.0)) if length else 0
+                op.start = max(z_free, xy_free - last_xy.time_before_end(overcut_steps))
+            z_free = op.end()
+            blade_clear = op.start + op.time_after(op.steps() - clearance_steps)
+
+        else:
+            raise ValueError(f"Unknown operation: {op.kind}")
+
+    return Timeline(operations)
+
+
+def cycle_time(operations, profile=None, overlap=None):
+    return sequence(operations, profile, overlap).duration()
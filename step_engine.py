@@ -0,0 +1,555 @@
+import time
+import numpy as np
+
+try:
+    import pigpio
+except ImportError:
+    pigpio = None
+
+
+#Sleep until this close to a deadline, then busy-wait the rest
+SPIN_THRESHOLD = 0.002
+
+#Delay before the first edge so setup work does not eat into the schedule
+START_LEAD = 0.001
+
+#Edges played between progress callbacks
+PROGRESS_EDGES = 512
+
+#Edges looked at to find the step pin that leads a ramp
+LEAD_WINDOW = 2048
+
+#pigpio can only hold a limited number of pulses per waveform
+MAX_WAVE_PULSES = 5000
+
+#Physical header pin -> BCM GPIO number (pigpio only speaks BCM)
+BOARD_TO_BCM = {
+    3: 2, 5: 3, 7: 4, 8: 14, 10: 15, 11: 17, 12: 18, 13: 27,
+    15: 22, 16: 23, 18: 24, 19: 10, 21: 9, 22: 25, 23: 11, 24: 8,
+    26: 7, 29: 5, 31: 6, 32: 12, 33: 13, 35: 19, 36: 16, 37: 26,
+    38: 20, 40: 21
+}
+
+
+class PulseSchedule:
+    def __init__(self, times, pins, levels, steps, counts=None):
+        self.times = times
+        self.pins = pins
+        self.levels = levels
+        self.steps = steps
+        #1 where an edge is a step; None when every rising edge is one (no direction edges)
+        self.counts = counts
+
+    def step_edges(self):
+        return self.levels if self.counts is None else self.counts
+
+    def __len__(self):
+        return len(self.times)
+
+    def tail(self, first):
+        #the edges from `first` on, timed from the edge before them: what a stop left unplayed
+        base = self.times[first - 1] if first else 0.0
+        counts = None if self.counts is None else self.counts[first:]
+        steps = int(self.step_edges()[first:].sum())
+        return PulseSchedule(self.times[first:] - base, self.pins[first:], self.levels[first:], steps, counts)
+
+    def shifted(self, offset):
+        #the same edges offset seconds later, leaving this schedule as it is (compiled moves are shared)
+        return PulseSchedule(self.times + offset, self.pins, self.levels, self.steps, self.counts)
+
+    def duration(self):
+        if len(self.times) == 0:
+            return 0.0
+        return float(self.times[-1])
+
+
+class PlaybackResult:
+    def __init__(self, steps, requested_time, actual_time, max_late=0.0, mean_late=0.0,
+                 played=None, stopped=False):
+        self.steps = steps
+        self.requested_time = requested_time
+        self.actual_time = actual_time
+        self.max_late = max_late
+        self.mean_late = mean_late
+        #edges that went out; short of the whole schedule when a stop was requested
+        self.played = played
+        self.stopped = stopped
+
+    def requested_rate(self):
+        if self.requested_time <= 0:
+            return 0.0
+        return self.steps / self.requested_time
+
+    def achieved_rate(self):
+        if self.actual_time <= 0:
+            return 0.0
+        return self.steps / self.actual_time
+
+    def __repr__(self):
+        return (f"PlaybackResult(steps={self.steps}, "
+                f"requested={self.requested_rate():.0f} steps/s, "
+                f"achieved={self.achieved_rate():.0f} steps/s)")
+
+
+def compile_pulse_train(pin, intervals, start=0.0, duty=0.5):
+    #intervals[i] is the time from rising edge i to rising edge i+1
+    intervals = np.asarray(intervals, dtype=np.float64)
+    return compile_pulses(pin, rising_edges(intervals, start), intervals * duty)
+
+
+def rising_edges(intervals, start=0.0):
+    rising = np.empty(len(intervals), dtype=np.float64)
+    if len(intervals):
+        rising[0] = start
+        np.cumsum(intervals[:-1], out=rising[1:])
+        rising[1:] += start
+    return rising
+
+
+def compile_pulses(pin, rising, widths):
+    #pulses at arbitrary rising edge times, e.g. the minor axis of a coordinated move
+    rising = np.asarray(rising, dtype=np.float64)
+    steps = len(rising)
+
+    times = np.empty(steps * 2, dtype=np.float64)
+    times[0::2] = rising
+    times[1::2] = rising + widths
+
+    levels = np.empty(steps * 2, dtype=np.uint8)
+    levels[0::2] = 1
+    levels[1::2] = 0
+
+    pins = np.full(steps * 2, pin, dtype=np.uint8)
+
+    return PulseSchedule(times, pins, levels, steps)
+
+
+def compile_levels(times, pins, levels):
+    #plain level changes, e.g. direction pins, that are not counted as steps
+    times = np.asarray(times, dtype=np.float64)
+    return PulseSchedule(times, np.asarray(pins, dtype=np.uint8), np.asarray(levels, dtype=np.uint8),
+                         0, np.zeros(len(times), dtype=np.uint8))
+
+
+def compile_constant_rate(pin, total_steps, frequency, start=0.0):
+    intervals = np.full(total_steps, 1 / frequency, dtype=np.float64)
+    return compile_pulse_train(pin, intervals, start)
+
+
+def progress_counts(schedule, chunk):
+    #steps completed at the end of each chunk of edges
+    if chunk <= 0 or len(schedule) == 0:
+        return [schedule.steps]
+    rising = np.cumsum(schedule.step_edges(), dtype=np.int64)
+    ends = np.minimum(np.arange(chunk, len(schedule) + chunk, chunk), len(schedule)) - 1
+    return rising[ends].tolist()
+
+
+def lead_pin(pins, rising, limits):
+    #The busiest step pin near the start sets the pace of a ramp. Its acceleration is the
+    #tightest of every stepping pin's limit, scaled by how many steps that pin makes per
+    #lead step, so no axis goes over its own limit when they all stretch together.
+    window = pins[:LEAD_WINDOW][rising[:LEAD_WINDOW]]
+    counts = {}
+    for pin in limits:
+        count = int(np.count_nonzero(window == pin))
+        if count:
+            counts[pin] = count
+    if not counts:
+        return None, 0.0
+
+    lead = max(counts, key=counts.get)
+    return lead, min(limits[pin] * counts[lead] / count for pin, count in counts.items())
+
+
+def warp(times, lead_times, lead_walls, origin, wall_origin):
+    #every edge keeps its place between the lead steps around it
+    walls = np.interp(times, np.concatenate(([origin], lead_times)), np.concatenate(([wall_origin], lead_walls)))
+    if len(lead_times):
+        walls += np.maximum(times - lead_times[-1], 0.0)
+    return walls
+
+
+def ramp_up_times(schedule, limits):
+    #playback times for a move resumed from rest: the lead pin speeds up at its limit
+    #until it meets the schedule's own speed, and the other edges stretch along with it
+    times = schedule.times
+    rising = schedule.step_edges() == 1
+    lead, accel = lead_pin(schedule.pins, rising, limits or {})
+    if lead is None:
+        return times
+
+    lead_times = times[rising & (schedule.pins == lead)]
+    k = np.arange(len(lead_times))
+    with np.errstate(divide="ignore"):
+        schedule_sq = 1 / np.diff(lead_times, prepend=0.0) ** 2
+
+    #v^2 = 2 a n at the middle of each step, never faster than the schedule
+    speed_sq = 2 * accel * k + np.minimum(accel, np.minimum.accumulate(schedule_sq - 2 * accel * k))
+    return warp(times, lead_times, np.cumsum(1 / np.sqrt(speed_sq)), 0.0, 0.0)
+
+
+def stop_times(schedule, walls, first, limits):
+    #Playback times for the edges from `first` on that still fit while the lead pin brakes
+    #from the speed it is stepping at now to rest at its limit. Everything moves slower
+    #by the same factor, so a coordinated move stays on its path up to the stop.
+    times = schedule.times
+    none = times[:0]
+    rising = schedule.step_edges() == 1
+    lead, accel = lead_pin(schedule.pins[first:], rising[first:], limits or {})
+    if lead is None:
+        return none
+
+    is_lead = rising & (schedule.pins == lead)
+    past = np.flatnonzero(is_lead[:first])
+    if len(past) < 2:
+        #not stepping yet, nothing to slow down
+        return none
+    last = past[-1]
+    speed = 1 / (walls[last] - walls[past[-2]])
+
+    tail = times[first:]
+    lead_times = tail[is_lead[first:]]
+    k = np.arange(len(lead_times))
+    with np.errstate(divide="ignore"):
+        schedule_sq = 1 / np.diff(lead_times, prepend=times[last]) ** 2
+
+    #v^2 = v0^2 - 2 a n at the middle of each step, never faster than the schedule
+    speed_sq = np.minimum(speed ** 2 - accel, np.minimum.accumulate(schedule_sq + 2 * accel * k)) - 2 * accel * k
+    stopped = np.flatnonzero(speed_sq <= 0)
+    fit = int(stopped[0]) if len(stopped) else len(lead_times)
+    if fit == 0:
+        return none
+
+    lead_walls = walls[last] + np.cumsum(1 / np.sqrt(speed_sq[:fit]))
+    count = int(np.searchsorted(tail, lead_times[fit - 1], side="right"))
+    return warp(tail[:count], lead_times[:fit], lead_walls, times[last], walls[last])
+
+
+def held_high(schedule, played):
+    #step pins a stop left high; they must go low or the next move's first step is lost
+    pins = schedule.pins[:played]
+    levels = schedule.levels[:played]
+    held = []
+    for pin in np.unique(pins[schedule.step_edges()[:played] == 1]).tolist():
+        if levels[np.flatnonzero(pins == pin)[-1]]:
+            held.append(pin)
+    return held
+
+
+def stop_result(gpio, schedule, played, actual_time, on_progress=None, max_late=0.0, mean_late=0.0):
+    #the last word on a stopped move: settle the step pins and count what really went out
+    for pin in held_high(schedule, played):
+        gpio.output(pin, 0)
+
+    steps = int(schedule.step_edges()[:played].sum())
+    if on_progress is not None:
+        on_progress(steps)
+    requested = float(schedule.times[played - 1]) if played else 0.0
+    return PlaybackResult(steps, requested, actual_time, max_late, mean_late, played, True)
+
+
+def merge_schedules(*schedules):
+    times = np.concatenate([s.times for s in schedules])
+    pins = np.concatenate([s.pins for s in schedules])
+    levels = np.concatenate([s.levels for s in schedules])
+
+    order = np.argsort(times, kind="stable")
+    steps = sum(s.steps for s in schedules)
+
+    counts = None
+    if any(s.counts is not None for s in schedules):
+        counts = np.concatenate([s.step_edges() for s in schedules])[order]
+
+    return PulseSchedule(times[order], pins[order], levels[order], steps, counts)
+
+
+def join_schedules(*schedules):
+    #schedules that already follow one another in time, put end to end without a sort
+    counts = None
+    if any(s.counts is not None for s in schedules):
+        counts = np.concatenate([s.step_edges() for s in schedules])
+
+    return PulseSchedule(np.concatenate([s.times for s in schedules]),
+                         np.concatenate([s.pins for s in schedules]),
+                         np.concatenate([s.levels for s in schedules]),
+                         sum(s.steps for s in schedules), counts)
+
+
+class BusyWaitPlayer:
+    name = "busy_wait"
+
+    def __init__(self, gpio, clock=time.perf_counter, sleep=time.sleep):
+        self.gpio = gpio
+        self.clock = clock
+        self.sleep = sleep
+
+    def play(self, schedule, on_progress=None, trace=None, control=None, limits=None, ramp_up=False):
+        #control is a shared word read before every edge; nonzero ramps the move down to a stop
+        #within limits (step pin -> steps/s^2). ramp_up starts a resumed move from rest.
+        walls = ramp_up_times(schedule, limits) if ramp_up else schedule.times
+
+        #tolist() so the hot loop touches plain floats, not numpy scalars
+        times = walls.tolist()
+        pins = schedule.pins.tolist()
+        levels = schedule.levels.tolist()
+        clock = self.clock
+
+        count = len(times)
+        chunk = count if on_progress is None else PROGRESS_EDGES
+        steps_done = progress_counts(schedule, chunk)
+
+        stamps = None
+        traced = 0
+        if trace is not None:
+            trace.begin(schedule, walls)
+            stamps = trace.stamps
+            traced = trace.count
+
+        self.max_late = 0.0
+        self.total_late = 0.0
+
+        start = clock() + START_LEAD
+        played = 0
+        for index, first in enumerate(range(0, count, max(chunk, 1))):
+            last = min(first + chunk, count)
+            played = self.play_edges(times, pins, levels, first, last, start, control, stamps, traced)
+            if played < last:
+                break
+            if on_progress is not None:
+                on_progress(steps_done[index])
+
+        stopped = played < count
+        if stopped:
+            #retime what still fits into the ramp down, drop the rest
+            ramp_times = stop_times(schedule, walls, played, limits).tolist()
+            times[played:played + len(ramp_times)] = ramp_times
+            played = self.play_edges(times, pins, levels, played, played + len(ramp_times), start,
+                                     None, stamps, traced)
+            if trace is not None:
+                trace.end(times, played)
+        end = clock()
+
+        mean_late = self.total_late / played if played else 0.0
+        if stopped:
+            return stop_result(self.gpio, schedule, played, end - start, on_progress, self.max_late, mean_late)
+        return PlaybackResult(schedule.steps, schedule.duration(), end - start, self.max_late, mean_late, count)
+
+    def play_edges(self, times, pins, levels, first, last, start, control, stamps, traced):
+        #returns the index of the first edge not played, short of last when control asked for a stop
+        output = self.gpio.output
+        clock = self.clock
+        sleep = self.sleep
+        max_late = self.max_late
+        total_late = self.total_late
+
+        for i in range(first, last):
+            if control is not None and control.value:
+                last = i
+                break
+
+            deadline = start + times[i]
+            now = clock()
+            if deadline - now > SPIN_THRESHOLD:
+                sleep(deadline - now - SPIN_THRESHOLD)
+            while now < deadline:
+                now = clock()
+            output(pins[i], levels[i])
+
+            late = now - deadline
+            total_late += late
+            if late > max_late:
+                max_late = late
+            if i < traced:
+                stamps[i] = now - start
+
+        self.max_late = max_late
+        self.total_late = total_late
+        return last
+
+
+class VirtualPlayer:
+    #Plays a schedule against a simulated clock: every edge lands exactly on time
+    name = "virtual"
+
+    def __init__(self, gpio):
+        self.gpio = gpio
+        self.clock = gpio.clock
+
+    def play(self, schedule, on_progress=None, trace=None, control=None, limits=None, ramp_up=False):
+        walls = ramp_up_times(schedule, limits) if ramp_up else schedule.times
+        times = walls.tolist()
+        pins = schedule.pins.tolist()
+        levels = schedule.levels.tolist()
+
+        count = len(times)
+        chunk = count if on_progress is None else PROGRESS_EDGES
+        steps_done = progress_counts(schedule, chunk)
+
+        traced = 0
+        if trace is not None:
+            trace.begin(schedule, walls)
+            traced = trace.count
+
+        #the same lead as the real player, so back-to-back moves are not glued together
+        start = self.clock.now() + START_LEAD
+        played = 0
+        for index, first in enumerate(range(0, count, max(chunk, 1))):
+            last = min(first + chunk, count)
+            played = self.play_edges(times, pins, levels, first, last, start, control, trace, traced)
+            if played < last:
+                break
+            if on_progress is not None:
+                on_progress(steps_done[index])
+
+        if played < count:
+            ramp_times = stop_times(schedule, walls, played, limits).tolist()
+            times[played:played + len(ramp_times)] = ramp_times
+            played = self.play_edges(times, pins, levels, played, played + len(ramp_times), start,
+                                     None, trace, traced)
+            if trace is not None:
+                trace.end(times, played)
+            return stop_result(self.gpio, schedule, played, self.clock.now() - start, on_progress)
+        return PlaybackResult(schedule.steps, schedule.duration(), self.clock.now() - start, played=count)
+
+    def play_edges(self, times, pins, levels, first, last, start, control, trace, traced):
+        output = self.gpio.output
+        advance_to = self.clock.advance_to
+
+        for i in range(first, last):
+            if control is not None and control.value:
+                return i
+            advance_to(start + times[i])
+            output(pins[i], levels[i])
+            if i < traced:
+                trace.stamps[i] = times[i]
+        return last
+
+
+class WaveformPlayer:
+    name = "waveform"
+
+    def __init__(self, pi):
+        self.pi = pi
+
+    def play(self, schedule, on_progress=None, trace=None, control=None, limits=None, ramp_up=False):
+        #edges are timed by DMA, there is nothing to trace on this side.
+        #The control word is read between waves. A stop ramps down from the end of the
+        #waves already queued, and the ramp is chained on behind them before they run out,
+        #so the motors never stop dead at speed.
+        start = time.perf_counter()
+
+        walls = ramp_up_times(schedule, limits) if ramp_up else schedule.times
+        pulses, ends = self.build_pulses(walls, schedule.pins, schedule.levels)
+        wave_ids = []
+        sent = self.queue(pulses, wave_ids, control, on_progress, schedule.steps)
+
+        if sent == len(pulses):
+            self.drain(wave_ids)
+            if on_progress is not None:
+                on_progress(schedule.steps)
+            end = time.perf_counter()
+            return PlaybackResult(schedule.steps, schedule.duration(), end - start, played=len(schedule))
+
+        played = ends[sent - 1] if sent else 0
+        ramp_times = stop_times(schedule, walls, played, limits)
+        ramp_end = played + len(ramp_times)
+        if len(ramp_times):
+            self.queue(self.ramp_pulses(schedule, walls, played, ramp_times), wave_ids)
+        self.drain(wave_ids)
+
+        end = time.perf_counter()
+        return stop_result(self, schedule, ramp_end, end - start, on_progress)
+
+    def ramp_pulses(self, schedule, walls, played, ramp_times):
+        #the last queued pulse already waits until walls[played]; the ramp is later than
+        #that, so an empty pulse makes up the difference
+        ramp_end = played + len(ramp_times)
+        pulses, _ = self.build_pulses(ramp_times - ramp_times[0], schedule.pins[played:ramp_end],
+                                      schedule.levels[played:ramp_end])
+        delay = int(round((ramp_times[0] - walls[played]) * 1e6))
+        if delay > 0:
+            pulses.insert(0, pigpio.pulse(0, 0, delay))
+        return pulses
+
+    def output(self, pin, level):
+        self.pi.write(BOARD_TO_BCM[pin], level)
+
+    def queue(self, pulses, wave_ids, control=None, on_progress=None, steps=0):
+        #queue pulses wave by wave behind wave_ids until they are all queued or the control
+        #word asks for a stop; returns the number of pulses queued. Nothing waits for them
+        #to finish, so more can be chained on before the DMA runs dry.
+        pulses_done = 0
+        sent = 0
+        for i in range(0, len(pulses), MAX_WAVE_PULSES):
+            if control is not None and control.value:
+                break
+            self.pi.wave_add_generic(pulses[i:i + MAX_WAVE_PULSES])
+            wave_id = self.pi.wave_create()
+            #ONE_SHOT_SYNC waits for the running wave to finish, so chunks play back to back
+            self.pi.wave_send_using_mode(wave_id, pigpio.WAVE_MODE_ONE_SHOT_SYNC)
+            wave_ids.append(wave_id)
+            sent = min(i + MAX_WAVE_PULSES, len(pulses))
+
+            #keep at most two waves queued so DMA memory stays bounded
+            while len(wave_ids) > 2:
+                while self.pi.wave_tx_at() == wave_ids[0]:
+                    time.sleep(0.001)
+                self.pi.wave_delete(wave_ids.pop(0))
+                pulses_done += MAX_WAVE_PULSES
+                if on_progress is not None:
+                    on_progress(steps * pulses_done // len(pulses))
+        return sent
+
+    def drain(self, wave_ids):
+        while self.pi.wave_tx_busy():
+            time.sleep(0.001)
+        for wave_id in wave_ids:
+            self.pi.wave_delete(wave_id)
+        del wave_ids[:]
+
+    def build_pulses(self, times, pins, levels):
+        #also returns how many edges are out after each pulse
+        times = times.tolist()
+        pins = pins.tolist()
+        levels = levels.tolist()
+
+        pulses = []
+        ends = []
+        i = 0
+        count = len(times)
+        while i < count:
+            on_mask = 0
+            off_mask = 0
+            t = times[i]
+            #edges sharing a timestamp go out in the same pulse
+            while i < count and times[i] == t:
+                bit = 1 << BOARD_TO_BCM[pins[i]]
+                if levels[i]:
+                    on_mask |= bit
+                else:
+                    off_mask |= bit
+                i += 1
+            next_t = times[i] if i < count else t
+            delay = int(round((next_t - t) * 1e6))
+            pulses.append(pigpio.pulse(on_mask, off_mask, delay))
+            ends.append(i)
+
+        return pulses, ends
+
+
+def get_player(gpio, backend="auto"):
+    if getattr(gpio, "clock", None) is not None:
+        return VirtualPlayer(gpio)
+
+    if backend in ("auto", "waveform") and pigpio is not None:
+        pi = pigpio.pi()
+        if pi.connected:
+            return WaveformPlayer(pi)
+        if backend == "waveform":
+            raise RuntimeError("pigpio daemon is not running")
+
+    if backend == "waveform":
+        raise RuntimeError("pigpio is not installed")
+
+    return BusyWaitPlayer(gpio)
@@ -0,0 +1,135 @@
+import os
+import struct
+import time
+from array import array
+import numpy as np
+
+
+#magic, version, edge count, wall clock start
+TRACE_HEADER = struct.Struct("<4sIId")
+TRACE_MAGIC = b"ASTR"
+TRACE_VERSION = 1
+
+#Edges later than this are counted as missed deadlines
+MISS_THRESHOLD = 50e-6
+
+#Upper edges of the lateness histogram buckets, in microseconds
+HISTOGRAM_BUCKETS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000]
+
+
+class TraceSummary:
+    def __init__(self, edges, steps, requested_rate, achieved_rate, p50, p99, worst, missed):
+        self.edges = edges
+        self.steps = steps
+        self.requested_rate = requested_rate
+        self.achieved_rate = achieved_rate
+        self.p50 = p50
+        self.p99 = p99
+        self.worst = worst
+        self.missed = missed
+
+    def __str__(self):
+        return (f"{self.steps} steps, {self.achieved_rate:.0f}/{self.requested_rate:.0f} steps/s, "
+                f"jitter p50 {self.p50 * 1e6:.1f} us, p99 {self.p99 * 1e6:.1f} us, "
+                f"max {self.worst * 1e6:.1f} us, {self.missed} missed deadlines")
+
+
+class StepTrace:
+    #The player writes one timestamp per edge into a buffer allocated up front,
+    #so tracing adds no allocation to the step loop.
+    def __init__(self, capacity=500000):
+        self.capacity = capacity
+        self.stamps = array('d', bytes(8 * capacity))
+        self.intended = np.zeros(0)
+        self.levels = np.zeros(0, dtype=np.uint8)
+        self.count = 0
+        self.wall_start = 0.0
+
+    def begin(self, schedule, walls=None):
+        #walls are the times the player aims for when a ramp re-times the schedule
+        self.intended = schedule.times if walls is None else walls
+        self.levels = schedule.step_edges()
+        self.count = min(len(schedule), self.capacity)
+        self.wall_start = time.time()
+
+    def end(self, intended, played):
+        #what the player really aimed at once a stop re-timed the tail, and the edges that went out
+        self.intended = np.asarray(intended[:played], dtype=np.float64)
+        self.count = min(played, self.capacity)
+
+    def actual(self):
+        return np.frombuffer(self.stamps, dtype=np.float64, count=self.count)
+
+    def lateness(self):
+        return self.actual() - self.intended[:self.count]
+
+    def summary(self):
+        if self.count == 0:
+            return TraceSummary(0, 0, 0.0, 0.0, 0.0, 0.0, 0.0, 0)
+
+        actual = self.actual()
+        late = np.abs(self.lateness())
+        steps = int(np.count_nonzero(self.levels[:self.count]))
+
+        requested_time = float(self.intended[self.count - 1])
+        actual_time = float(actual[-1])
+
+        return TraceSummary(self.count, steps,
+                            steps / requested_time if requested_time > 0 else 0.0,
+                            steps / actual_time if actual_time > 0 else 0.0,
+                            float(np.percentile(late, 50)),
+                            float(np.percentile(late, 99)),
+                            float(late.max()),
+                            int(np.count_nonzero(late > MISS_THRESHOLD)))
+
+    def histogram(self):
+        late_us = np.abs(self.lateness()) * 1e6
+        edges = [0] + HISTOGRAM_BUCKETS + [np.inf]
+        counts, _ = np.histogram(late_us, bins=edges)
+        return list(zip(edges[1:], counts.tolist()))
+
+    def histogram_report(self):
+        lines = [str(self.summary()), "", "lateness (us)      edges"]
+        buckets = self.histogram()
+        peak = max([count for _, count in buckets] + [1])
+
+        low = 0
+        for high, count in buckets:
+            label = f"{low}-{high}" if high != np.inf else f">{low}"
+            bar = "#" * int(40 * count / peak)
+            lines.append(f"{label:>12} {count:>10} {bar}")
+            low = high
+
+        return "\n".join(lines)
+
+    def export(self, path):
+        #intended time as uint32 microseconds, lateness as int32 nanoseconds: 8 bytes per edge
+        intended_us = np.round(self.intended[:self.count] * 1e6).astype("<u4")
+        late_ns = np.clip(np.round(self.lateness() * 1e9), -2**31, 2**31 - 1).astype("<i4")
+
+        with open(path, "wb") as f:
+            f.write(TRACE_HEADER.pack(TRACE_MAGIC, TRACE_VERSION, self.count, self.wall_start))
+            f.write(intended_us.tobytes())
+            f.write(late_ns.tobytes())
+
+    def save(self, directory, name):
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, name)
+
+        self.export(base + ".trace")
+        with open(base + ".txt", "w") as f:
+            f.write(self.histogram_report() + "\n")
+
+        return base
+
+
+def load_trace(path):
+    with open(path, "rb") as f:
+        magic, version, count, wall_start = TRACE_HEADER.unpack(f.read(TRACE_HEADER.size))
+        if magic != TRACE_MAGIC or version != TRACE_VERSION:
+            raise ValueError(f"{path} is not a step trace")
+
+        intended = np.frombuffer(f.read(4 * count), dtype="<u4") / 1e6
+        late = np.frombuffer(f.read(4 * count), dtype="<i4") / 1e9
+
+    return wall_start, intended, late
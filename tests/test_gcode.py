@@ -0,0 +1,116 @@
+import tracemalloc
+import numpy as np
+import pytest
+import gcode
+import gpio_backend
+import motor
+import path_planner
+import planner
+import step_engine
+
+
+@pytest.fixture
+def sim():
+    sim = gpio_backend.use_simulator(virtual_clock=True, record=False)
+    motor.init_motors()
+    #a little over the planner's limits, so only a step train that breaks them loses steps
+    for axis in ['x', 'y']:
+        velocity, accel, _ = planner.axis_limits(axis)
+        sim.machine.pull_out[axis] = (velocity * 1.5, accel * 1.5)
+    return sim
+
+
+def write(tmp_path, lines):
+    path = tmp_path / "program.nc"
+    path.write_text("\n".join(lines) + "\n")
+    return str(path)
+
+
+def segments(lines):
+    return list(gcode.interpret(gcode.parse(enumerate(lines, 1))))
+
+
+STRAIGHT = ["G20 G90 F240", "G1 X10", "G1 X20", "G1 X30", "G1 X40", "G28"]
+
+
+def test_blended_segments_play_without_a_gap(sim, tmp_path):
+    start = sim.clock.now()
+    assert gcode.run_program(write(tmp_path, STRAIGHT)) == 5
+
+    assert not any(sim.machine.stalled.values())
+    assert sim.machine.steps == {'x': 0, 'y': 0, 'z': 0}
+    #the cycle time estimate is what the player really took, gaps and all
+    blended, stopped = path_planner.compare_cycle_time(segments(STRAIGHT))
+    assert sim.clock.now() - start == pytest.approx(blended, abs=1e-9)
+    assert blended < stopped
+
+
+def test_a_gap_at_speed_loses_steps(sim, tmp_path):
+    #the same blended segments, each handed to the player on its own
+    for _, xy_plan, schedule in gcode.pipeline(write(tmp_path, STRAIGHT)):
+        motor.run_xy_plan(xy_plan, schedule=schedule)
+
+    assert sim.machine.stalled['x']
+    assert sim.machine.steps['x'] != 0
+
+
+def test_position_is_saved_once_per_program(sim, tmp_path, monkeypatch):
+    saves = []
+    monkeypatch.setattr(motor, "save_position", lambda moving: saves.append(moving))
+    gcode.run_program(write(tmp_path, STRAIGHT))
+
+    assert saves == [True, False]
+
+
+def test_an_axis_turning_round_waits_for_its_direction_pin(sim):
+    #x reverses at the corner, which the planner still takes at speed, and y sets off
+    lines = ["G20 G90 F240", "G1 X10", "G1 X5 Y5", "G28"]
+    plans = [xy_plan for _, xy_plan in path_planner.blend(segments(lines))]
+    run = plans[:2]
+    assert run[0].exit > 0
+
+    timing, _ = path_planner.run_timing(run)
+    (first_start, _, first_pins, _), (start, turn, pins, _) = timing
+    assert len(first_pins) == 1 and len(pins) == 2
+    assert start >= turn + path_planner.sequencer.DIR_SETUP
+    #at this speed the half step after the last edge covers it, so nothing waits
+    assert start == first_start + run[0].duration()
+
+    schedule = path_planner.compile_run(run, [gcode.interpolator.compile_xy(plan) for plan in run])
+    assert np.all(np.diff(schedule.times) >= -1e-12)
+    assert schedule.steps == sum(plan.total_steps() for plan in run)
+    done, _ = motor.executed_steps(schedule, len(schedule), {})
+    assert done == {axis: sum(plan.signed_steps(axis) for plan in run) for axis in ['x', 'y']}
+
+
+def square_loops(laps, side=10):
+    lines = ["G20 G90 F240", "G0 X1 Y1"]
+    for _ in range(laps):
+        lines += [f"G1 X{1 + side}", f"G1 Y{1 + side}", "G1 X1", "G1 Y1"]
+    return lines
+
+
+def test_a_long_path_comes_to_rest():
+    #the square's corners are taken at speed, so only the edge bound ends a run
+    runs = list(path_planner.runs(path_planner.blend(segments(square_loops(8))[1:])))
+
+    assert len(runs) > 1
+    for run in runs:
+        edges = sum(2 * plan.total_steps() for _, plan in run)
+        assert len(run) == 1 or edges <= path_planner.RUN_EDGES
+
+
+def test_program_memory_does_not_grow_with_its_length(sim, tmp_path, monkeypatch):
+    played = []
+    monkeypatch.setattr(motor, "run_schedule", lambda schedule, *args, **kwargs:
+                        played.append(len(schedule)) or step_engine.PlaybackResult(schedule.steps, 0.0, 0.0))
+
+    peaks = []
+    for laps in [2, 8]:
+        tracemalloc.start()
+        gcode.run_program(write(tmp_path, square_loops(laps)))
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    assert max(played) <= path_planner.RUN_EDGES + 2 * len(square_loops(8))
+    assert peaks[1] < peaks[0] * 1.5
@@ -0,0 +1,22 @@
+import socket
+import job_api
+
+
+def test_stop_after_the_port_was_taken(tmp_path):
+    with socket.socket() as taken:
+        taken.bind(("127.0.0.1", 0))
+        taken.listen()
+        api = job_api.JobApi("127.0.0.1", taken.getsockname()[1], str(tmp_path / "jobs.db")).start()
+
+        assert api.server is None
+        api.stop()
+        assert not api.thread.is_alive()
+
+
+def test_stop_closes_a_running_server(tmp_path):
+    api = job_api.JobApi("127.0.0.1", 0, str(tmp_path / "jobs.db")).start()
+    assert api.server is not None
+
+    api.stop()
+    assert not api.thread.is_alive()
+    api.stop()
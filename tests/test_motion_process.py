@@ -0,0 +1,96 @@
+import types
+import numpy as np
+import pytest
+import config
+import cycle_estimator
+import gpio_backend
+import motion_process
+import motor
+import move_cache
+import planner
+import sequencer
+from motion_events import STATE_DONE
+
+
+class Status:
+    def __init__(self):
+        self.states = []
+
+    def push(self, job_id, state, *fields):
+        self.states.append(state)
+        return True
+
+
+def pin_edges(sim, axis, pin):
+    times = np.frombuffer(sim.edge_times, dtype=np.float64)
+    pins = np.frombuffer(sim.edge_pins, dtype=np.uint8)
+    levels = np.frombuffer(sim.edge_levels, dtype=np.uint8)
+    mask = pins == config.motor_configs[axis][pin]
+    return times[mask], levels[mask]
+
+
+def step_times(sim, axis):
+    times, levels = pin_edges(sim, axis, 'pwm_pin')
+    return times[levels == 1]
+
+
+@pytest.mark.parametrize("overlap", [True, False])
+def test_the_blade_lifts_while_the_cut_stroke_slows_down(overlap, monkeypatch):
+    monkeypatch.setattr(config, "Z_OVERLAP", overlap)
+    sim = gpio_backend.use_simulator(virtual_clock=True, record=True)
+    motor.init_motors()
+    status = Status()
+    control = types.SimpleNamespace(value=motion_process.CONTROL_RUN)
+    cuts = [(10.0, 5.0), (20.0, 5.0)]
+
+    motion_process.run_job(1, motion_process.CMD_RUN_PATH, 0.0, 0.0, status, control, cuts)
+
+    assert status.states[-1] == STATE_DONE
+    assert sim.machine.position('x') == pytest.approx(20.0) and sim.machine.steps['z'] == 0
+    #the retract after the first cut: its first step, and the one that clears the stock
+    z_times = step_times(sim, 'z')
+    depth = int(config.Z_PLUNGE_DEPTH * planner.steps_per_inch('z'))
+    clearance = int(config.Z_CLEARANCE * planner.steps_per_inch('z'))
+    lift, clear = z_times[depth], z_times[depth + depth - clearance - 1]
+    xy_times = np.concatenate([step_times(sim, 'x'), step_times(sim, 'y')])
+    #only the stroke can step between the two, the next travel waits for the blade
+    under_the_lift = np.count_nonzero((xy_times > lift) & (xy_times < clear))
+    assert (under_the_lift > 0) == overlap
+
+
+@pytest.mark.parametrize("profile", ["trapezoid", "scurve"])
+@pytest.mark.parametrize("return_home", [False, True])
+def test_the_estimate_times_the_job_blocks(profile, return_home, monkeypatch):
+    monkeypatch.setattr(config, "MOTION_PROFILE", profile)
+    gpio_backend.use_simulator(virtual_clock=True, record=False)
+    motor.init_motors()
+    #a long travel, a stroke shorter than Z_CUT_STROKE and a cut where the head already is
+    cuts = [(30.0, 12.5), (30.5, 12.5), (30.5, 12.5), (4.0, 40.0)]
+
+    blocks = motion_process.job_blocks(motion_process.CMD_RUN_PATH, float(return_home), 0.0, cuts)
+    timelines = [sequencer.sequence(block, blade_down=index > 0) for index, block in enumerate(blocks)]
+    machine = cycle_estimator.Machine()
+    machine.return_home = return_home
+    estimate = cycle_estimator.estimate(cuts, machine, batch=True)
+
+    assert estimate.motion == pytest.approx(sum(timeline.duration() for timeline in timelines), abs=1e-6)
+    assert list(estimate.per_cut[1:-1]) == pytest.approx([timeline.duration() for timeline in timelines[2:-1]],
+                                                         abs=1e-6)
+
+
+def test_the_move_cache_is_written_once_the_worker_stops(monkeypatch):
+    gpio_backend.use_simulator(virtual_clock=True, record=False)
+    saves = []
+    monkeypatch.setattr(move_cache, "save", lambda: saves.append(True))
+    controller = motion_process.MotionController(mode="thread")
+    controller.start()
+    try:
+        for size in [(12.0, 6.0), (13.0, 7.0)]:
+            status = controller.wait(controller.submit_cut(*size), timeout=30)
+            assert status.state == STATE_DONE
+        #nothing is pickled between jobs, however many new moves they compiled
+        assert saves == []
+    finally:
+        controller.stop()
+
+    assert saves == [True]
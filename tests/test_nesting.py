@@ -0,0 +1,85 @@
+import random
+import pytest
+import config
+import cut_limits
+import nesting
+
+
+def random_parts(count, seed):
+    rng = random.Random(seed)
+    low = nesting.to_eighths(config.MIN_HORIZONTAL)
+    high = nesting.to_eighths(config.MAX_HORIZONTAL)
+    sizes = [(rng.randint(low, high), rng.randint(low, high)) for _ in range(max(count // 4, 1))]
+    return [rng.choice(sizes) for _ in range(count)]
+
+
+def replay(result, board, kerf):
+    #plays the board's cuts in order on the pieces they split; every cut has to run the full
+    #length of one piece, which is what keeps the layout guillotine
+    pieces = [(board.x, board.y, board.width, board.height)]
+    for cut in result.cuts:
+        if cut.board != board.index:
+            continue
+        for index, (x, y, width, height) in enumerate(pieces):
+            if cut.direction == "vertical" and cut.start == y and cut.length == height and x < cut.position < x + width:
+                pieces[index:index + 1] = [(x, y, cut.position - x, height),
+                                           (cut.position + kerf, y, x + width - cut.position - kerf, height)]
+                break
+            if cut.direction == "horizontal" and cut.start == x and cut.length == width and y < cut.position < y + height:
+                pieces[index:index + 1] = [(x, y, width, cut.position - y),
+                                           (x, cut.position + kerf, width, y + height - cut.position - kerf)]
+                break
+        else:
+            pytest.fail(f"{cut} does not cross a whole piece")
+    return pieces
+
+
+@pytest.mark.parametrize("sheet", [(48, 96), (48, 48), (36, 30), (100, 100)])
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_layout_is_guillotine_and_within_the_machine(sheet, seed):
+    kerf = nesting.to_eighths(config.KERF)
+    max_width = nesting.to_eighths(config.MAX_HORIZONTAL)
+    max_height = nesting.to_eighths(config.MAX_VERTICAL)
+    result = nesting.nest(random_parts(60, seed), nesting.to_eighths(sheet[0]), nesting.to_eighths(sheet[1]), kerf)
+
+    for board in result.boards:
+        assert board.width <= max_width and board.height <= max_height
+        pieces = replay(result, board, kerf)
+        #each part is a whole piece, or sits in the corner of one with only offcut beside it
+        for part in [p for p in result.placements if p.board == board.index]:
+            holders = [piece for piece in pieces if piece[0] == part.x and piece[1] == part.y]
+            assert len(holders) == 1
+            assert part.width <= holders[0][2] and part.height <= holders[0][3]
+            pieces.remove(holders[0])
+
+    for board, cut, (horizontal, vertical) in result.machine_cuts():
+        assert 0 < horizontal <= config.MAX_HORIZONTAL
+        assert 0 < vertical <= config.MAX_VERTICAL
+    valid, rejected = cut_limits.check_cuts(result.cut_list())
+    assert not rejected
+
+
+def test_tall_sheet_is_ripped_into_boards_the_machine_reaches():
+    result = nesting.nest_best([(nesting.to_eighths(40), nesting.to_eighths(40))] * 2)
+
+    assert result.sheets == 1
+    assert len(result.boards) == 2
+    assert [cut.position for cut in result.rip_cuts()] == [nesting.to_eighths(config.MAX_VERTICAL)]
+    #the second board starts past the kerf and its cuts are measured from its own corner
+    assert result.boards[1].y == nesting.to_eighths(config.MAX_VERTICAL + config.KERF)
+    assert sorted(result.cut_list()) == [(40.0, 40.0), (40.0, 40.0), (40.0, 47.875), (40.0, 48.0)]
+
+
+def test_kerf_is_in_the_positions():
+    part = (nesting.to_eighths(12), nesting.to_eighths(20))
+    result = nesting.nest([part] * 3, nesting.to_eighths(48), nesting.to_eighths(20), allow_rotation=False)
+
+    assert [horizontal for horizontal, _ in result.cut_list()] == [12.0, 24.125, 36.25]
+
+
+def test_parts_outside_the_machine_are_rejected():
+    too_big = (nesting.to_eighths(config.MAX_HORIZONTAL + 1), nesting.to_eighths(config.MAX_VERTICAL + 1))
+    result = nesting.nest([too_big])
+
+    assert result.rejected == [too_big]
+    assert result.cut_list() == []
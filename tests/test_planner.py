@@ -0,0 +1,99 @@
+import numpy as np
+import pytest
+import planner
+
+
+#Limits are checked on the step times themselves: the k-th divided difference of position
+#over time is k! times an average of the k-th derivative between those steps, so it can't
+#pass a limit the ramp itself keeps. The tolerances only cover float rounding, which grows
+#with each order of differencing on long moves.
+VELOCITY_TOLERANCE = 1e-9
+ACCEL_TOLERANCE = 1e-5
+JERK_TOLERANCE = 1e-2
+
+PROFILES = ["trapezoid", "scurve"]
+AXES = ["x", "y", "z"]
+#inches: from a few steps (never near cruise) to longer than the table
+DISTANCES = [0.002, 0.01, 0.05, 0.2, 1.0, 5.0, 40.0]
+
+
+def step_times(plan):
+    return np.concatenate([[0.0], np.cumsum(plan.intervals)])
+
+
+def divided_differences(times, order):
+    values = np.arange(len(times), dtype=np.float64)
+    for k in range(1, order + 1):
+        values = (values[1:] - values[:-1]) / (times[k:] - times[:-k])
+    return values
+
+
+def check_plan(plan, total_steps, max_velocity, max_accel, max_jerk):
+    assert plan.steps == total_steps
+    assert len(plan.intervals) == total_steps
+    assert np.all(plan.intervals > 0)
+    assert np.all(np.diff(step_times(plan)) > 0)
+
+    times = step_times(plan)
+    assert plan.peak_velocity <= max_velocity * (1 + VELOCITY_TOLERANCE)
+    assert divided_differences(times, 1).max() <= max_velocity * (1 + VELOCITY_TOLERANCE)
+    if total_steps >= 2:
+        assert np.abs(2 * divided_differences(times, 2)).max() <= max_accel * (1 + ACCEL_TOLERANCE)
+    if plan.profile == "scurve" and total_steps >= 3:
+        assert np.abs(6 * divided_differences(times, 3)).max() <= max_jerk * (1 + JERK_TOLERANCE)
+
+
+@pytest.mark.parametrize("profile", PROFILES)
+@pytest.mark.parametrize("axis", AXES)
+@pytest.mark.parametrize("distance", DISTANCES)
+def test_plan_move_within_limits(profile, axis, distance):
+    plan = planner.plan_move(axis, distance, profile)
+
+    assert plan.profile == profile
+    assert plan.axis == axis
+    assert plan.distance == distance
+    check_plan(plan, int(distance * planner.steps_per_inch(axis)), *planner.axis_limits(axis))
+
+
+@pytest.mark.parametrize("profile", PROFILES)
+@pytest.mark.parametrize("total_steps", [1, 2, 3, 7, 100, 1000, 25000])
+def test_plan_steps_within_limits(profile, total_steps):
+    limits = planner.axis_limits("x")
+    check_plan(planner.plan_steps(total_steps, *limits, profile=profile), total_steps, *limits)
+
+
+@pytest.mark.parametrize("profile", PROFILES)
+def test_short_move_never_reaches_cruise(profile):
+    velocity, accel, jerk = planner.axis_limits("x")
+    plan = planner.plan_steps(50, velocity, accel, jerk, profile)
+
+    assert plan.peak_velocity < velocity
+    #no cruise: the move speeds up to its middle and slows down after it
+    speeds = 1 / plan.intervals
+    middle = int(np.argmax(speeds))
+    assert abs(middle - plan.steps / 2) <= 1
+    assert np.all(np.diff(speeds[:middle]) > 0)
+    assert np.all(np.diff(speeds[middle + 1:]) < 0)
+
+
+@pytest.mark.parametrize("profile", PROFILES)
+def test_long_move_cruises_at_max_velocity(profile):
+    velocity, accel, jerk = planner.axis_limits("x")
+    plan = planner.plan_steps(100000, velocity, accel, jerk, profile)
+
+    assert plan.peak_velocity == velocity
+    assert np.isclose(plan.intervals[plan.steps // 2], 1 / velocity)
+
+
+@pytest.mark.parametrize("profile", PROFILES)
+def test_estimate_matches_plan(profile):
+    for distance in DISTANCES:
+        plan = planner.plan_move("x", distance, profile)
+        assert np.isclose(planner.estimate_move_time("x", distance, profile), plan.duration())
+
+
+def test_empty_and_unknown():
+    assert planner.plan_steps(0, 1000, 1000).steps == 0
+    assert planner.plan_move("x", 0).duration() == 0.0
+    with pytest.raises(ValueError):
+        planner.plan_steps(10, 1000, 1000, profile="linear")
@@ -0,0 +1,68 @@
+import random
+import pytest
+import config
+import cycle_estimator
+import scheduler
+
+
+def random_points(rng, count, grid):
+    #a small grid repeats sizes, so some moves leave an axis still
+    return [(rng.randint(1, grid) * 1.0, rng.randint(1, grid) * 1.0) for _ in range(count)]
+
+
+@pytest.mark.parametrize("end", [None, (0.0, 0.0)])
+@pytest.mark.parametrize("grid", [2, 4, 48])
+def test_reversal_delta_matches_path_cost(end, grid):
+    rng = random.Random(grid)
+    cost = scheduler.TravelCost()
+    finish = [end] if end is not None else []
+
+    for _ in range(40):
+        count = rng.randint(3, 10)
+        start = (rng.randint(0, grid) * 1.0, rng.randint(0, grid) * 1.0)
+        points = [start] + random_points(rng, count, grid) + finish
+        times = [[cost.move_time(a, b) for b in points] for a in points]
+        nodes = [0] + rng.sample(range(1, count + 1), count) + ([count + 1] if end is not None else [])
+        route = scheduler.Route(points, times, list(nodes))
+        base = cost.path_cost([points[node] for node in nodes[1:count + 1]] + finish, start)
+
+        for p in range(1, count):
+            for q in range(p + 1, count + 1):
+                travel, changes = route.reversal_delta(p, q)
+                reversed_nodes = nodes[:p] + nodes[p:q + 1][::-1] + nodes[q + 1:]
+                full = cost.path_cost([points[node] for node in reversed_nodes[1:count + 1]] + finish, start)
+                assert full - base == pytest.approx(travel + changes * config.BATCH_REVERSAL_PENALTY, abs=1e-9)
+
+
+def test_order_keeps_every_cut_and_saves_travel():
+    rng = random.Random(7)
+    cuts = [(rng.randint(16, 384) / 8, rng.randint(16, 240) / 8) for _ in range(60)]
+    plan = scheduler.schedule_batch(cuts, return_home=True)
+
+    assert sorted(plan.cuts) == sorted(cuts)
+    assert plan.estimated_time < plan.naive_time
+
+
+def test_the_estimate_is_the_batch_cycle_time(monkeypatch):
+    monkeypatch.setattr(config, "RETURN_HOME_AFTER_CUT", False)
+    cuts = [(24.0, 12.0), (12.0, 30.0), (36.0, 6.0), (6.0, 6.0)]
+    plan = scheduler.schedule_batch(cuts, start=(2.0, 2.0))
+
+    #the blade's plunges, strokes and retracts count, not only the XY travel
+    assert plan.estimated_time == pytest.approx(cycle_estimator.estimate(plan.cuts, batch=True, start=(2.0, 2.0)).motion)
+    assert plan.estimated_time > scheduler.TravelCost().path_time(plan.cuts, (2.0, 2.0))
+
+
+def test_a_nested_sequence_runs_as_written():
+    #each guillotine cut frees the piece the next one is measured on
+    cuts = [(30.0, 5.0), (2.0, 40.0), (28.0, 6.0), (3.0, 38.0)]
+    assert scheduler.schedule_batch(cuts).cuts != cuts
+
+    plan = scheduler.schedule_batch(cuts, keep_order=True)
+    assert plan.cuts == cuts
+    assert plan.estimated_time == pytest.approx(cycle_estimator.estimate(cuts, batch=True).motion)
+
+
+def test_short_lists_keep_their_order():
+    cuts = [(10.0, 10.0), (5.0, 5.0)]
+    assert scheduler.order_cuts(cuts) == cuts
@@ -0,0 +1,182 @@
+import collections
+import types
+import numpy as np
+import pytest
+import planner
+import step_engine
+import step_trace
+
+
+PIN = 12
+
+
+class TickClock:
+    #every read moves time on by a microsecond, so the busy-wait loop always gets there
+    def __init__(self):
+        self.time = 0.0
+
+    def now(self):
+        self.time += 1e-6
+        return self.time
+
+    def sleep(self, seconds):
+        self.time += max(seconds, 0.0)
+
+
+class NullGPIO:
+    def output(self, pin, level):
+        pass
+
+
+class Control:
+    def __init__(self):
+        self.value = 0
+
+
+def move(total_steps=4000):
+    velocity, accel, jerk = planner.axis_limits("x")
+    plan = planner.plan_steps(total_steps, velocity, accel, jerk, "trapezoid")
+    return step_engine.compile_pulse_train(PIN, plan.intervals), {PIN: accel}
+
+
+def player():
+    clock = TickClock()
+    return step_engine.BusyWaitPlayer(NullGPIO(), clock=clock.now, sleep=clock.sleep)
+
+
+def stop_after(control, calls):
+    seen = []
+
+    def on_progress(steps):
+        seen.append(steps)
+        if len(seen) == calls:
+            control.value = 1
+    return on_progress
+
+
+def test_full_move_is_traced_against_the_schedule():
+    schedule, limits = move()
+    trace = step_trace.StepTrace()
+    result = player().play(schedule, trace=trace, limits=limits)
+
+    summary = trace.summary()
+    assert trace.count == len(schedule) == result.played
+    assert summary.steps == schedule.steps
+    assert summary.worst < 10e-6
+    assert summary.missed == 0
+
+
+def test_stopped_move_traces_only_the_edges_played():
+    schedule, limits = move()
+    control = Control()
+    trace = step_trace.StepTrace()
+    result = player().play(schedule, stop_after(control, 3), trace, control, limits)
+
+    assert result.stopped
+    assert result.played < len(schedule)
+    assert trace.count == result.played
+    summary = trace.summary()
+    assert summary.steps == result.steps
+    #the ramp down is late against the schedule, but on time against the times it aimed for
+    assert summary.worst < 10e-6
+    assert summary.missed == 0
+    assert len(trace.intended) == result.played
+    assert trace.intended[-1] > schedule.times[result.played - 1]
+
+
+def test_resumed_move_is_traced_against_its_ramp():
+    schedule, limits = move()
+    control = Control()
+    stopped = player().play(schedule, stop_after(control, 3), None, control, limits)
+
+    rest = schedule.tail(stopped.played)
+    trace = step_trace.StepTrace()
+    result = player().play(rest, trace=trace, limits=limits, ramp_up=True)
+
+    assert trace.count == len(rest) == result.played
+    assert trace.summary().worst < 10e-6
+    assert np.all(trace.intended >= rest.times)
+
+
+@pytest.mark.parametrize("capacity", [10, 100000])
+def test_capacity_caps_the_count(capacity):
+    schedule, limits = move(200)
+    trace = step_trace.StepTrace(capacity)
+    player().play(schedule, trace=trace, limits=limits)
+
+    assert trace.count == min(capacity, len(schedule))
+    assert len(trace.lateness()) == trace.count
+
+
+Pulse = collections.namedtuple("Pulse", "on off delay")
+
+
+class FakePi:
+    #chains waves like ONE_SHOT_SYNC does; each one is over as soon as the next is queued.
+    #Once someone waits for the chain to run dry, the next wave starts after an idle gap.
+    def __init__(self):
+        self.pending = []
+        self.waves = {}
+        self.chain = []
+        self.dry = False
+
+    def wave_add_generic(self, pulses):
+        self.pending = list(pulses)
+
+    def wave_create(self):
+        self.waves[len(self.waves)] = self.pending
+        return len(self.waves) - 1
+
+    def wave_send_using_mode(self, wave_id, mode):
+        if self.dry:
+            self.chain.append(None)
+            self.dry = False
+        self.chain.append(wave_id)
+
+    def wave_tx_at(self):
+        return None
+
+    def wave_tx_busy(self):
+        self.dry = True
+        return False
+
+    def wave_delete(self, wave_id):
+        pass
+
+    def write(self, gpio, level):
+        pass
+
+    def rising(self, pin):
+        #when the pin's step edges go out, with the waves played back to back
+        bit = 1 << step_engine.BOARD_TO_BCM[pin]
+        times = []
+        now = 0.0
+        for wave_id in self.chain:
+            if wave_id is None:
+                now += 0.001
+                continue
+            for pulse in self.waves[wave_id]:
+                if pulse.on & bit:
+                    times.append(now)
+                now += pulse.delay * 1e-6
+        return np.array(times)
+
+
+def test_waveform_stop_ramps_on_from_the_queued_waves(monkeypatch):
+    monkeypatch.setattr(step_engine, "pigpio", types.SimpleNamespace(pulse=Pulse, WAVE_MODE_ONE_SHOT_SYNC=1))
+    schedule, limits = move(40000)
+    control = Control()
+    pi = FakePi()
+    result = step_engine.WaveformPlayer(pi).play(schedule, stop_after(control, 1), None, control, limits)
+
+    assert result.stopped
+    rising = pi.rising(PIN)
+    assert len(rising) == result.steps < schedule.steps
+    #no idle gap at the handoff: the ramp's first interval follows on from the cruise ones
+    queued = int(np.count_nonzero(schedule.pins[:3 * step_engine.MAX_WAVE_PULSES] == PIN) // 2)
+    intervals = np.diff(rising)
+    cruise = intervals[queued - 2]
+    assert cruise <= intervals[queued - 1] < cruise * 1.05
+    #then it only slows down, to about the speed a move from rest starts at
+    assert np.all(np.diff(intervals[queued - 1:]) > -2e-6)
+    assert intervals[-1] > 10 * cruise
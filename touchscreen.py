@@ -1,15 +1,14 @@
 import sys
+import assets
 import config
-import motor
-import requests
-import threading
-import time
+import cut_limits
+import metrics
+import motion_events
 import progress_window
+import screens
 import tkinter as tk
 from tkinter import ttk
-from tkinter import PhotoImage
 from tkinter import messagebox
-from io import BytesIO
 
 
 
@@ -34,10 +33,12 @@ class Application(tk.Tk):
 
         self.columnconfigure(0, weight=1)
         self.columnconfigure(1, weight=1)
+        self.columnconfigure(2, weight=1)
 
         self.rowconfigure(0, weight=1)
         self.rowconfigure(1, weight=1)
         self.rowconfigure(2, weight=1)
+        self.rowconfigure(3, weight=0)
         
         self.hor = InputMeasure(self, "Horizontal")
         self.hor.grid(row=0, column=0, sticky="nsew")
@@ -51,13 +52,92 @@ class Application(tk.Tk):
 
         self.keyboard = KeyBoard(self, [self.hor, self.vert])
         self.keyboard.grid(row=0, column=1, rowspan=3, sticky="nsew")
+        assets.report()
+
+        self.batch = []
+        #a nested list runs as loaded, the scheduler must not reorder it
+        self.batch_in_order = False
+        self.pending_batch = None
+        #(future, what to do with the plan) while a list is being ordered off the Tk thread
+        self.scheduling = None
+        self.schedule_pool = None
+        self.batch_panel = BatchPanel(self)
+        self.batch_panel.grid(row=0, column=2, rowspan=3, sticky="nsew")
+
+        #jobs sent over the job API: the next queued job, or one being confirmed or run
+        self.job_api = None
+        self.queued_jobs = []
+        self.pending_job = None
+        self.running_job = None
+        if config.API_ENABLED:
+            self.columnconfigure(3, weight=1)
+            self.queue_panel = QueuePanel(self)
+            self.queue_panel.grid(row=0, column=3, rowspan=3, sticky="nsew")
+            self.after_idle(self.refresh_queue)
+
+        self.metrics_server = None
+        if config.METRICS_ENABLED:
+            self.stats_panel = StatsPanel(self)
+            self.stats_panel.grid(row=3, column=0, columnspan=4, sticky="ew")
+            self.after(config.METRICS_PANEL_MS, self.refresh_stats)
+
+        #the motion controller owns the motors, the UI only sends jobs and reads status.
+        #It is started after the first paint (or on the first cut), see start_motion
+        self.motion = None
+
+        #every screen is built once here and only raised/withdrawn afterwards
+        self.confirm_screen = screens.ConfirmScreen(self, self.message_var, self.confirmation_result)
+        self.progress_window = progress_window.ProgressWindow(self, self.logger, self.message_var)
+        self.homing_screen = screens.HomingScreen(self, self.board_loaded)
+
+        self.screens = screens.ScreenManager(self, self.logger)
+        self.screens.add("confirm", self.confirm_screen.window)
+        self.screens.add("progress", self.progress_window.progress_window)
+        self.screens.add("homing", self.homing_screen.window)
 
     def exit_fullscreen(self, event=None):
         self.attributes("-fullscreen", False)
     
     def quit_program(self, event=None):
+        #the motion worker is stopped whatever else fails, or its process outlives the UI
+        try:
+            if self.schedule_pool is not None:
+                self.schedule_pool.shutdown(wait=False, cancel_futures=True)
+            if self.metrics_server is not None:
+                self.metrics_server.shutdown()
+            if self.job_api is not None:
+                self.job_api.stop()
+        except Exception:
+            self.logger.exception("Shutting down the background services failed")
+        if self.motion is not None:
+            self.motion.stop()
         sys.exit(0)
 
+    def start_motion(self):
+        #motion_process pulls in numpy, the planner and GPIO setup, so it is imported on first use
+        if self.motion is None:
+            import motion_process
+            self.motion = motion_process.MotionController()
+            self.motion.start()
+        return self.motion
+
+    def start_metrics(self):
+        self.metrics_server = metrics.serve()
+
+    def refresh_stats(self):
+        self.stats_panel.show(metrics.summary())
+        self.after(config.METRICS_PANEL_MS, self.refresh_stats)
+
+    def start_job_api(self):
+        import job_api
+        self.job_api = job_api.JobApi().start()
+
+    def head_position(self):
+        #the last position the motion layer reported; home until it has reported one
+        if self.motion is None or self.motion.last_status is None:
+            return (0.0, 0.0)
+        return (self.motion.last_status.x, self.motion.last_status.y)
+
     def update_message(self, message):
         self.message_var.set(message)
 
@@ -69,112 +149,223 @@ class Application(tk.Tk):
                        f"Vertical: {self.make_ver_printout()} in")
             self.update_message(message)
 
-            self.confirmation_response = None
-            self.confirm_cuts()
-
-            self.wait_window(self.confirmation_window)
-
-            if self.confirmation_response:
-                self.show_progress()
-                self.wait_window(self.progress_window)
-                messagebox.showinfo(self.cut_title, self.cut_message)
-                
-            else:
-                title = "Cut Canceled"
-                message = "The cut has been canceled."
-                messagebox.showinfo(title, message)
-
-        self.clear_entries()
-        self.keyboard.reset_entry()
-
-        messagebox.showinfo("Returning to Home", "Returning Cut Head to Home.  Wait to retrieve and load")
-
-    def confirm_cuts(self):
-        self.confirmation_window = tk.Toplevel(self)
-        self.confirmation_window.attributes("-topmost", True)
-        self.confirmation_window.attributes("-fullscreen", True)
-        self.confirmation_window.title("Confirm")
-
-        self.confirmation_window.columnconfigure(0, weight=1)
-        self.confirmation_window.columnconfigure(1, weight=1)
-        self.confirmation_window.rowconfigure(0, weight=1)
-        self.confirmation_window.rowconfigure(1, weight=1)
-        self.confirmation_window.rowconfigure(2, weight=3)
-
-        question_label = ttk.Label(self.confirmation_window, text="Is this the correct cut?", font="Arial 32", anchor='center')
-        question_label.grid(row=0, column=0, columnspan=2, sticky="nsew")
+            self.screens.show("confirm")
+        else:
+            self.reset_input()
 
-        cut_length = ttk.Label(self.confirmation_window, textvariable=self.message_var, font="Arial 24", anchor='center')
-        cut_length.grid(row=1, column=0, columnspan=2, sticky="nsew")
+    def add_to_batch(self):
+        self.validate_inputs()
+        if self.valid_inputs:
+            self.batch.append((self.horizontal_len, self.vertical_len))
+            self.batch_panel.add(f"{self.make_hor_printout()} x {self.make_ver_printout()}")
+        self.reset_input()
+
+    def load_batch(self, path=None, in_order=False):
+        import scheduler
+
+        path = path or config.BATCH_FILE
+        try:
+            cuts = scheduler.load_cut_list(path)
+        except (OSError, ValueError) as e:
+            messagebox.showwarning("Cut List", f"Could not load {path}:\n{e}")
+            return
+        self.batch_in_order = self.batch_in_order or in_order
+
+        skipped = 0
+        for horizontal_len, vertical_len in cuts:
+            if cut_limits.size_message(horizontal_len, vertical_len):
+                skipped += 1
+                continue
+            self.batch.append((horizontal_len, vertical_len))
+            self.batch_panel.add(f"{horizontal_len} x {vertical_len}")
+
+        metrics.rejected_cuts.inc(skipped)
+        self.logger.info(f"Loaded {len(cuts) - skipped} cuts from {path}, skipped {skipped}")
+        if skipped:
+            messagebox.showwarning("Cut Size Warning", f"Skipped {skipped} cuts outside the machine limits.")
+
+    def load_nested(self):
+        self.load_batch(config.NESTED_FILE, in_order=True)
+
+    def clear_batch(self):
+        self.batch = []
+        self.batch_in_order = False
+        self.batch_panel.clear()
+
+    def schedule_cuts(self, cuts, on_ready, keep_order=False):
+        #Ordering a long list takes a moment, so it runs on a worker thread while the screen
+        #keeps drawing; check_schedule hands the plan to on_ready back on the Tk thread.
+        #The scheduler needs the planner, which is only imported once a batch runs
+        import concurrent.futures
+        import scheduler
+
+        if self.schedule_pool is None:
+            self.schedule_pool = concurrent.futures.ThreadPoolExecutor(max_workers=1,
+                                                                       thread_name_prefix="scheduler")
+        future = self.schedule_pool.submit(scheduler.schedule_batch, list(cuts), self.head_position(),
+                                           None, keep_order)
+        self.scheduling = (future, on_ready)
+        self.batch_panel.show_status(f"Ordering {len(cuts)} cuts...")
+        self.after(max(int(1000 / config.UI_REFRESH_HZ), 1), self.check_schedule)
+
+    def check_schedule(self):
+        future, on_ready = self.scheduling
+        if not future.done():
+            self.after(max(int(1000 / config.UI_REFRESH_HZ), 1), self.check_schedule)
+            return
+
+        self.scheduling = None
+        self.batch_panel.show_status(None)
+        try:
+            plan = future.result()
+        except Exception as e:
+            self.logger.error(f"Could not order the cuts: {e}")
+            messagebox.showwarning("Cut List", f"Could not order the cuts:\n{e}")
+            return
+
+        #the operator moved on to a single cut meanwhile; they can run the batch again after
+        if self.screens.current != "input":
+            self.logger.info("Dropped a batch order, another screen came up while it was made")
+            return
+        on_ready(plan)
+
+    def run_batch(self):
+        if not self.batch or self.scheduling is not None:
+            return
+        self.schedule_cuts(self.batch, self.confirm_batch, self.batch_in_order)
+
+    def confirm_batch(self, plan):
+        self.pending_batch = plan
+        saved = self.pending_batch.naive_time - self.pending_batch.estimated_time
+        self.logger.info(f"Batch scheduled: {self.pending_batch.summary()}, "
+                         f"{saved:.1f} s less travel than returning home after every cut")
+
+        self.update_message(f"{self.pending_batch.summary()}\n"
+                            f"{saved:.0f} s saved by skipping returns to home")
+        self.screens.show("confirm")
+
+    def refresh_queue(self):
+        self.load_queue()
+        self.after(config.QUEUE_POLL_MS, self.refresh_queue)
+
+    def load_queue(self):
+        import job_queue
+
+        try:
+            jobs = job_queue.pending()
+        except Exception as e:
+            self.logger.warning(f"Could not read the job queue: {e}")
+            jobs = self.queued_jobs
+
+        metrics.queue_depth.set(len(jobs))
+        if [(job.id, job.state) for job in jobs] != [(job.id, job.state) for job in self.queued_jobs]:
+            self.queued_jobs = jobs
+            running = self.running_job.id if self.running_job is not None else None
+            self.queue_panel.show([job.label(job.id != running) for job in jobs])
+
+    def run_next_job(self):
+        #one tap: the oldest job goes straight to the confirm screen
+        if not self.queued_jobs or self.scheduling is not None:
+            return
+
+        job = self.queued_jobs[0]
+        if len(job.cuts) == 1:
+            self.pending_job = job
+            self.horizontal_len, self.vertical_len = job.cuts[0]
+            self.update_message(f"{job.label()}\n"
+                                f"Horizontal: {self.horizontal_len:g} in\n"
+                                f"Vertical: {self.vertical_len:g} in")
+            self.screens.show("confirm")
+        else:
+            self.schedule_cuts(job.cuts, lambda plan: self.confirm_job(job, plan))
 
-        confirmation_button = ttk.Button(self.confirmation_window, text="Confirm", command=lambda: self.confirmation_result(True))
-        confirmation_button.grid(row=2, column=0, sticky="nsew")
+    def confirm_job(self, job, plan):
+        self.pending_job = job
+        self.pending_batch = plan
+        self.update_message(f"{job.label()}\n{self.pending_batch.summary()}")
+        self.screens.show("confirm")
 
-        cancelation_button = ttk.Button(self.confirmation_window, text="Cancel", command=lambda: self.confirmation_result(False))
-        cancelation_button.grid(row=2, column=1, sticky="nsew")
+    def remove_job(self):
+        import job_queue
 
+        index = self.queue_panel.selected()
+        if index is None or index >= len(self.queued_jobs):
+            return
+        job = self.queued_jobs[index]
+        if job_queue.remove(job.id):
+            self.logger.info(f"Removed queued job {job.id}: {job.label()}")
 
     def confirmation_result(self, response):
         self.logger.info(f"Cut confirmation response: {response}")
-        self.confirmation_response = response
-        self.confirmation_window.destroy()
-
 
-    def show_progress(self):        
-        self.cancel_flag = False
+        if response and self.pending_job is not None:
+            import job_queue
+            job = self.pending_job
+            self.pending_job = None
+            #the job can be removed over the API while the operator reads the confirm screen
+            if not job_queue.start(job.id):
+                self.logger.warning(f"Queued job {job.id} was removed before it started")
+                self.pending_batch = None
+                self.screens.show("input")
+                messagebox.showinfo("Job Removed", f"{job.label()}\nwas removed from the queue and was not cut.")
+                self.load_queue()
+                self.reset_input()
+                return
+            self.running_job = job
+
+        if response and self.pending_batch is not None:
+            self.begin_batch()
+        elif response:
+            self.begin_progress()
+        else:
+            self.pending_batch = None
+            self.pending_job = None
+            self.screens.show("input")
+            title = "Cut Canceled"
+            message = "The cut has been canceled."
+            messagebox.showinfo(title, message)
+            self.reset_input()
 
-        self.progress_window = tk.Toplevel(self)
-        self.progress_window.attributes("-topmost", True)
-        self.progress_window.attributes("-fullscreen", True)
-        self.progress_window.title("Cutting")
+    def begin_progress(self):
+        motion = self.start_motion()
+        job_id = motion.submit_cut(self.horizontal_len, self.vertical_len)
 
-        self.progress_window.columnconfigure(0, weight=1)
+        self.screens.show("progress")
+        self.progress_window.begin_progress(motion, job_id, on_finish=self.finish_cut)
 
-        self.progress_window.rowconfigure(0, weight=1)
-        self.progress_window.rowconfigure(1, weight=1)
-        self.progress_window.rowconfigure(2, weight=1)
-        self.progress_window.rowconfigure(3, weight=3)
+    def begin_batch(self):
+        motion = self.start_motion()
+        job_id = motion.submit_path(self.pending_batch.points(), self.pending_batch.return_home)
+        self.logger.info(f"Starting batch of {len(self.pending_batch.cuts)} cuts")
 
-        progress_label = ttk.Label(self.progress_window, text="Cutting Board", font="Arial 32", anchor="center")
-        progress_label.grid(row=0, column=0, sticky="nsew")
+        self.pending_batch = None
+        #a queued job leaves the operator's own batch alone
+        if self.running_job is None:
+            self.clear_batch()
 
-        cut_length = ttk.Label(self.progress_window, textvariable=self.message_var, font="Arial 24", anchor="center")
-        cut_length.grid(row=1, column=0, sticky="nsew")
+        self.screens.show("progress")
+        self.progress_window.begin_progress(motion, job_id, on_finish=self.finish_cut)
 
-        self.progress_bar = ttk.Progressbar(self.progress_window, maximum=100)
-        self.progress_bar.grid(row=2, column=0, sticky="nsew")
+    def finish_cut(self, status):
+        self.cut_title, self.cut_message = self.progress_window.get_cut_message()
 
-        cancel_button = ttk.Button(self.progress_window, text="Cancel Cut", command=lambda: self.cancel_process())
-        cancel_button.grid(row=3, column=0, sticky="nsew")
+        if self.running_job is not None:
+            import job_queue
+            state = job_queue.DONE if status.state == motion_events.STATE_DONE else job_queue.CANCELED
+            job_queue.finish(self.running_job.id, state)
+            self.logger.info(f"Queued job {self.running_job.id} {state}")
+            self.running_job = None
 
-        self.begin_progress()
+        self.homing_screen.set_result(self.cut_title, self.cut_message)
+        self.screens.show("homing")
 
+    def board_loaded(self):
+        self.screens.show("input")
+        self.reset_input()
 
-    def begin_progress(self):
-        self.cancel_flag = False
-        self.progress_bar["value"]=0
-        threading.Thread(target=self.cut).start()
-        self.logger.info("Starting Cut") 
-
-    def cut(self):
-        for i in range(50):
-            if self.cancel_flag:
-                self.cut_title = "Cut Canceled"
-                self.cut_message = "The cut has been canceled without completing."
-                break
-            else:
-                self.progress_bar.step(2)
-            time.sleep(0.1)
-        if not self.cancel_flag:
-            self.cut_title = "Cut Completed"
-            self.cut_message = "The cut has been completed successfully"
-        self.logger.info(f"{self.cut_title} - {self.cut_message}")
-        print("done")
-        self.progress_window.destroy()
-
-
-    def cancel_process(self):
-        self.cancel_flag = True
+    def reset_input(self):
+        self.clear_entries()
+        self.keyboard.reset_entry()
   
      
         
@@ -198,46 +389,21 @@ class Application(tk.Tk):
     def check_numeric(self):
         self.numeric = True
         for i in range(0,4):
-            if self.vals[i]:
-                if not self.vals[i].isnumeric():
-                    self.logger.info(f"Invalid value: {self.vals[i]}")
-                    self.numeric = False
-                else:
-                    self.vals[i] = int(self.vals[i])
+            value = cut_limits.entry_value(self.vals[i])
+            if value is None:
+                self.logger.info(f"Invalid value: {self.vals[i]}")
+                self.numeric = False
             else:
-                self.vals[i] = int(0)
+                self.vals[i] = value
 
     
     def check_size(self):
         self.horizontal_len, self.vertical_len = self.combine_vals()
-        self.bad_cut_length = False
-        message = ""
-
-        if self.horizontal_len > config.MAX_HORIZONTAL:
-            message += (f"\nHorizontal cut is too large:\n"
-                       f"Max Horizontal Cut: {config.MAX_HORIZONTAL} in\n"
-                       f"Input Horizontal Cut: {self.horizontal_len} in\n")
-            self.bad_cut_length = True
-        
-        if self.horizontal_len < config.MIN_HORIZONTAL:
-            message += (f"\nHorizontal cut is too small:\n"
-                       f"Min Horizontal Cut: {config.MIN_HORIZONTAL} in\n"
-                       f"Input Horizontal Cut: {self.horizontal_len} in\n")
-            self.bad_cut_length = True
-
-        if self.vertical_len > config.MAX_VERTICAL:
-            message += (f"\nVertical cut is too large:\n"
-                       f"Max Vertical Cut: {config.MAX_VERTICAL} in)\n"
-                       f"Input Vertical Cut: {self.vertical_len} in)\n")
-            self.bad_cut_length = True
-                
-        if self.vertical_len < config.MIN_VERTICAL:
-            message += (f"\nVertical cut is too small:\n"
-                       f"Min Vertical Cut: {config.MIN_VERTICAL} in\n"
-                       f"Input Vertical Cut: {self.vertical_len} in\n")
-            self.bad_cut_length = True
+        message = cut_limits.size_message(self.horizontal_len, self.vertical_len)
+        self.bad_cut_length = bool(message)
 
         if self.bad_cut_length:
+            metrics.rejected_cuts.inc()
             messagebox.showwarning("Cut Size Warning", message)
 
         else:
@@ -245,8 +411,6 @@ class Application(tk.Tk):
         
         self.logger.info(message)
         print(message)
-            
-
 
     def make_hor_printout(self):
         hor_len = f"{self.vals[0]} {self.vals[1]}/8"
@@ -260,8 +424,8 @@ class Application(tk.Tk):
     
 
     def combine_vals(self):
-        hor_len = self.vals[0] + self.vals[1] * (1/8)
-        ver_len = self.vals[2] + self.vals[3] * (1/8)
+        hor_len = cut_limits.combine(self.vals[0], self.vals[1])
+        ver_len = cut_limits.combine(self.vals[2], self.vals[3])
 
         return hor_len, ver_len
     
@@ -297,6 +461,95 @@ class InputMeasure(ttk.Frame):
         self.frac_label = ttk.Label(self, text="1/8 inch", font=('Arial 12'))
         self.frac_label.grid(row=2, column=1, sticky="n")
 
+class BatchPanel(ttk.Frame):
+    def __init__(self, parent):
+        super().__init__(parent)
+
+        self.columnconfigure(0, weight=1)
+        self.columnconfigure(1, weight=1)
+
+        self.rowconfigure(0, weight=1)
+        self.rowconfigure(1, weight=4)
+        self.rowconfigure(2, weight=1)
+        self.rowconfigure(3, weight=1)
+        self.rowconfigure(4, weight=1)
+
+        self.title = ttk.Label(self, text="Batch", font=('Arial 16'))
+        self.title.grid(row=0, column=0, columnspan=2, sticky="ew")
+
+        self.cut_list = tk.Listbox(self, font=('Arial 12'))
+        self.cut_list.grid(row=1, column=0, columnspan=2, sticky="nsew")
+
+        self.add_button = ttk.Button(self, text="Add Cut", command=parent.add_to_batch)
+        self.add_button.grid(row=2, column=0, sticky="nsew")
+
+        self.load_button = ttk.Button(self, text="Load List", command=parent.load_batch)
+        self.load_button.grid(row=2, column=1, sticky="nsew")
+
+        self.clear_button = ttk.Button(self, text="Clear", command=parent.clear_batch)
+        self.clear_button.grid(row=3, column=0, sticky="nsew")
+
+        self.run_button = ttk.Button(self, text="Run Batch", command=parent.run_batch)
+        self.run_button.grid(row=3, column=1, sticky="nsew")
+
+        self.nested_button = ttk.Button(self, text="Load Nested", command=parent.load_nested)
+        self.nested_button.grid(row=4, column=0, columnspan=2, sticky="nsew")
+
+    def add(self, text):
+        self.cut_list.insert(tk.END, text)
+
+    def clear(self):
+        self.cut_list.delete(0, tk.END)
+
+    def show_status(self, text):
+        #shown in place of the title while the batch is busy, None for the title again
+        self.title.config(text=text or "Batch")
+
+class StatsPanel(ttk.Frame):
+    def __init__(self, parent):
+        super().__init__(parent)
+
+        self.columnconfigure(0, weight=1)
+
+        self.stats_var = tk.StringVar(value=metrics.summary())
+        self.stats_label = ttk.Label(self, textvariable=self.stats_var, font=('Arial 12'), anchor="center")
+        self.stats_label.grid(row=0, column=0, sticky="ew")
+
+    def show(self, text):
+        self.stats_var.set(text)
+
+class QueuePanel(ttk.Frame):
+    def __init__(self, parent):
+        super().__init__(parent)
+
+        self.columnconfigure(0, weight=1)
+        self.columnconfigure(1, weight=1)
+
+        self.rowconfigure(0, weight=1)
+        self.rowconfigure(1, weight=4)
+        self.rowconfigure(2, weight=2)
+
+        self.title = ttk.Label(self, text="Queue", font=('Arial 16'))
+        self.title.grid(row=0, column=0, columnspan=2, sticky="ew")
+
+        self.job_list = tk.Listbox(self, font=('Arial 12'))
+        self.job_list.grid(row=1, column=0, columnspan=2, sticky="nsew")
+
+        self.remove_button = ttk.Button(self, text="Remove", command=parent.remove_job)
+        self.remove_button.grid(row=2, column=0, sticky="nsew")
+
+        self.run_button = ttk.Button(self, text="Run Next", command=parent.run_next_job)
+        self.run_button.grid(row=2, column=1, sticky="nsew")
+
+    def show(self, labels):
+        self.job_list.delete(0, tk.END)
+        for label in labels:
+            self.job_list.insert(tk.END, label)
+
+    def selected(self):
+        selection = self.job_list.curselection()
+        return selection[0] if selection else None
+
 class KeyBoard(ttk.Frame):
     def __init__(self, parent, input_measures):
         super().__init__(parent)
@@ -340,22 +593,17 @@ class KeyBoard(ttk.Frame):
         self.nine = ttk.Button(self, text="9", command=lambda: self.insert_text(9))
         self.nine.grid(row=2, column=2, sticky="nsew")
 
-        self.checkmark_image = self.download_image(config.NEXT_IMAGE)
+        self.checkmark_image = assets.load_image(config.NEXT_IMAGE)
         self.next = ttk.Button(self, text="N", image=self.checkmark_image, command=self.switch_entry)
         self.next.grid(row=3, column=0, sticky="nsew")
 
         self.zero = ttk.Button(self, text="0", command=lambda: self.insert_text(0))
         self.zero.grid(row=3, column=1, sticky="nsew")
 
-        self.delete_image = self.download_image(config.DELETE_IMAGE)
+        self.delete_image = assets.load_image(config.DELETE_IMAGE)
         self.delete = ttk.Button(self, text="D", image=self.delete_image,  command=self.delete_text)
         self.delete.grid(row=3, column=2, sticky="nsew")
         
-    def download_image(self, image_url):
-        response = requests.get(image_url)
-        image_data = response.content
-        return PhotoImage(data=image_data)
-
     def insert_text(self, char):
         if self.active_entry:
             self.active_entry.insert(tk.END, str(char))
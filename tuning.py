@@ -0,0 +1,191 @@
+from gpio_backend import GPIO
+import config
+import homing
+import interpolator
+import machine_profile
+import motor
+import planner
+import step_engine
+from utils.logging_config import logger
+
+
+#Strokes start and end this far from home, so every check can latch back onto the switch
+START_OFFSET = 0.5      #in
+#The check runs back at safe settings to this far short of home, then creeps onto the switch
+CHECK_MARGIN = 0.1      #in
+
+
+class Trial:
+    #one velocity/acceleration pair tried on one axis
+    def __init__(self, axis, velocity, accel, lost_steps, stalled):
+        self.axis = axis
+        self.velocity = velocity
+        self.accel = accel
+        self.lost_steps = lost_steps
+        self.stalled = stalled
+
+    def passed(self):
+        return not self.stalled and abs(self.lost_steps) <= config.TUNING_TOLERANCE_STEPS
+
+    def __repr__(self):
+        outcome = "pass" if self.passed() else "FAIL"
+        stall = ", stalled" if self.stalled else ""
+        return (f"Trial({self.axis}: {self.velocity:.2f} in/s, {self.accel:.1f} in/s^2, "
+                f"lost {self.lost_steps} steps{stall}: {outcome})")
+
+
+def configured(axis):
+    #the config.py constants, not a profile from an earlier sweep, so tuning never drifts
+    name = axis.upper()
+    return (getattr(config, f"{name}_MAX_VELOCITY"), getattr(config, f"{name}_MAX_ACCEL"),
+            getattr(config, f"{name}_MAX_JERK"))
+
+
+def jerk_for(axis, accel):
+    #jerk follows acceleration so the S-curve keeps its shape
+    _, base_accel, base_jerk = configured(axis)
+    return accel * base_jerk / base_accel
+
+
+def plan_stroke(axis, distance, velocity, accel):
+    scale = planner.steps_per_inch(axis)
+    profile = planner.axis_profile(axis)
+    if profile == "constant":
+        #a fixed rate has no acceleration to tune
+        profile = "trapezoid"
+    return planner.plan_steps(int(round(abs(distance) * scale)), velocity * scale, accel * scale,
+                              jerk_for(axis, accel) * scale, profile)
+
+
+def reaches(axis, velocity, accel):
+    #a stroke too short to get up to speed would pass without testing the velocity at all
+    plan = plan_stroke(axis, config.TUNING_STROKE[axis], velocity, accel)
+    return plan.peak_velocity >= 0.99 * velocity * planner.steps_per_inch(axis)
+
+
+def stroke(axis, distance, velocity, accel):
+    #one move of a signed distance in inches; True when the driver reported a stall
+    config_data = config.motor_configs[axis]
+    level = config_data['direction'][interpolator.axis_direction(axis, distance)]
+    GPIO.output(config_data['dir_pin'], level)
+
+    plan = plan_stroke(axis, distance, velocity, accel)
+    schedule = step_engine.compile_pulse_train(config_data['pwm_pin'], plan.intervals)
+    moved = plan.steps if level == GPIO.HIGH else -plan.steps
+    motor.play(schedule, {axis: moved}, name=f"tune-{axis}", directions={axis: level})
+    return stalled(axis)
+
+
+def stalled(axis):
+    pin = config.motor_configs[axis].get('stall_pin')
+    return pin is not None and GPIO.input(pin) == config.STALL_ACTIVE
+
+
+def lost_steps(axis, safe):
+    #Run back to just short of home at safe settings and latch onto the switch one step at
+    #a time. The latch should take exactly the margin; anything else went missing on the way.
+    #Positive means the axis is nearer home than the step count says. Ends back at START_OFFSET.
+    scale = planner.steps_per_inch(axis)
+    margin = int(round(CHECK_MARGIN * scale))
+    stroke(axis, -(motor.position[axis] - margin) / scale, *safe)
+
+    search = 2 * CHECK_MARGIN + config.TUNING_TOLERANCE_STEPS / scale
+    try:
+        latched = homing.seek([axis], True, config.HOMING_LATCH_VELOCITY, search, 1)[axis]
+    except RuntimeError:
+        #the switch is further away than it can possibly be without losing steps
+        latched = int(search * scale)
+
+    motor.position[axis] = 0
+    stroke(axis, START_OFFSET, *safe)
+    return margin - latched
+
+
+def trial(axis, velocity, accel, safe):
+    #Out at the trial settings and back at safe ones, then the other way round, with a check
+    #after each: steps lost going out and coming back at the same speed would cancel out.
+    distance = config.TUNING_STROKE[axis]
+    stall = False
+    lost = 0
+    for fast_out in [True, False]:
+        out, back = ((velocity, accel), safe) if fast_out else (safe, (velocity, accel))
+        for _ in range(config.TUNING_CYCLES):
+            stall = stroke(axis, distance, *out) or stall
+            stall = stroke(axis, -distance, *back) or stall
+
+        error = lost_steps(axis, safe)
+        if abs(error) > abs(lost):
+            lost = error
+
+    result = Trial(axis, velocity, accel, lost, stall)
+    logger.info(f"Tuning {result}")
+    return result
+
+
+def sweep(axis):
+    #velocity first at the configured acceleration, then acceleration at the best velocity,
+    #then the winner has to pass TUNING_CONFIRM more times in a row
+    base_velocity, base_accel, _ = configured(axis)
+    safe = (base_velocity * config.TUNING_START_FACTOR, base_accel * config.TUNING_START_FACTOR)
+    trials = []
+
+    stroke(axis, START_OFFSET, *safe)
+
+    velocity = None
+    value = safe[0]
+    while value <= base_velocity * config.TUNING_MAX_FACTOR and reaches(axis, value, base_accel):
+        trials.append(trial(axis, value, base_accel, safe))
+        if not trials[-1].passed():
+            break
+        velocity = value
+        value *= config.TUNING_GROWTH
+    if velocity is None:
+        raise RuntimeError(f"{axis} axis loses steps at {safe[0]:.2f} in/s; check the mechanics before tuning")
+
+    accel = None
+    value = safe[1]
+    while value <= base_accel * config.TUNING_MAX_FACTOR:
+        trials.append(trial(axis, velocity, value, safe))
+        if not trials[-1].passed():
+            break
+        accel = value
+        value *= config.TUNING_GROWTH
+    if accel is None:
+        raise RuntimeError(f"{axis} axis loses steps at {safe[1]:.1f} in/s^2; check the mechanics before tuning")
+
+    while True:
+        confirm = [trial(axis, velocity, accel, safe) for _ in range(config.TUNING_CONFIRM)]
+        trials.extend(confirm)
+        if all(result.passed() for result in confirm):
+            break
+        #a marginal setting; back both off a notch and try again
+        velocity /= config.TUNING_GROWTH
+        accel /= config.TUNING_GROWTH
+        if velocity < safe[0] or accel < safe[1]:
+            raise RuntimeError(f"{axis} axis is not repeatable even at the starting settings")
+
+    stroke(axis, -START_OFFSET, *safe)
+    return velocity, accel, trials
+
+
+def tune(axes=None, margin=None):
+    #sweeps each axis in turn and writes the machine profile; returns axis -> profile entry
+    if margin is None:
+        margin = config.TUNING_SAFETY_MARGIN
+
+    homing.home_all()
+    profile = machine_profile.load()
+    for axis in axes or list(config.motor_configs):
+        velocity, accel, trials = sweep(axis)
+        profile[axis] = {'max_velocity': velocity * margin,
+                         'max_accel': accel * margin,
+                         'max_jerk': jerk_for(axis, accel) * margin,
+                         'tested_velocity': velocity,
+                         'tested_accel': accel,
+                         'trials': len(trials)}
+        logger.info(f"Tuned {axis}: passed {velocity:.2f} in/s and {accel:.1f} in/s^2 over {len(trials)} trials, "
+                    f"profile {velocity * margin:.2f} in/s and {accel * margin:.1f} in/s^2")
+
+    machine_profile.save(profile, margin)
+    machine_profile.apply()
+    return profile
@@ -1,18 +1,214 @@
+import atexit
+import collections
+import gzip
 import logging
+import logging.handlers
+import multiprocessing
 import os
+import queue
+import shutil
+import threading
+import time
 
 def init_logging():
     logging.getLogger('urllib3').setLevel(logging.WARNING)
+    setup()
 
 
 LOG_DIR = "logs"
-os.makedirs(LOG_DIR, exist_ok=True)
-
 LOG_FILE = os.path.join(LOG_DIR, "app.log")
-logging.basicConfig(
-    filename=LOG_FILE,
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s' 
-)
+#a child process (the motion worker) writes its own file, two processes can't share a rotation
+WORKER_LOG_FILE = os.path.join(LOG_DIR, "worker.log")
+LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+#A log call only puts the record on a queue; a writer thread formats and writes it, so the
+#motion loop never waits on the SD card. A full queue drops records (and counts them) rather than block.
+LOG_QUEUE_SIZE = 10000
+LOG_FLUSH_INTERVAL = 0.5        #s between the writer's batches; a warning or worse wakes it at once
+
+#Rotate at whichever comes first, gzip the old file and keep LOG_BACKUPS of them
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_ROTATE_SECONDS = 24 * 3600
+LOG_BACKUPS = 10
+
+#DEBUG records never reach the file on their own. The last DEBUG_RING_SIZE are kept in
+#memory and written out just ahead of the next ERROR, to show what led up to it.
+DEBUG_RING_SIZE = 2000
+
+class AsyncHandler(logging.handlers.QueueHandler):
+    def __init__(self, records):
+        super().__init__(records)
+        self.ring = collections.deque(maxlen=DEBUG_RING_SIZE)
+        self.dropped = 0
+        #set for a warning or worse, so it doesn't sit out the flush interval
+        self.urgent = threading.Event()
+
+    def emit(self, record):
+        if record.levelno < logging.INFO:
+            self.ring.append(record)
+            return
+        if record.levelno >= logging.ERROR:
+            self.dump_ring()
+        self.enqueue(self.prepare(record))
+        if record.levelno >= logging.WARNING:
+            self.urgent.set()
+
+    def prepare(self, record):
+        #fix the message now, the writer formats the rest later
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        if self.queue.qsize() >= LOG_QUEUE_SIZE:
+            self.dropped += 1
+            return
+        self.queue.put(record)
+
+    def dump_ring(self):
+        records = list(self.ring)
+        self.ring.clear()
+        for record in records:
+            self.enqueue(self.prepare(record))
+
+
+class RotatingLog(logging.handlers.RotatingFileHandler):
+    #Size is counted as records are written instead of asked of the file on every record,
+    #which would flush it each time. Only the writer thread calls emit; it flushes per batch.
+    def __init__(self, filename):
+        super().__init__(filename, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, delay=True)
+        self.namer = lambda name: name + ".gz"
+        self.rotator = compress
+        self.size = 0
+        self.rollover_at = time.time() + LOG_ROTATE_SECONDS
+
+    def emit(self, record):
+        try:
+            if self.stream is None:
+                os.makedirs(os.path.dirname(self.baseFilename), exist_ok=True)
+                self.stream = self._open()
+                self.size = self.stream.tell()
+            if self.size >= self.maxBytes or (self.size and time.time() >= self.rollover_at):
+                self.doRollover()
+                self.stream = self._open()
+                self.size = 0
+
+            msg = self.format(record) + self.terminator
+            self.stream.write(msg)
+            self.size += len(msg)
+        except Exception:
+            self.handleError(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self.rollover_at = time.time() + LOG_ROTATE_SECONDS
+
+
+def compress(source, dest):
+    with open(source, "rb") as f_in, gzip.open(dest, "wb") as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+class LogPipeline:
+    STOP = None
+
+    def __init__(self, filename):
+        self.records = queue.SimpleQueue()
+        self.handler = AsyncHandler(self.records)
+        self.file_handler = RotatingLog(filename)
+        self.file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        self.writer = threading.Thread(target=self.write, name="log-writer", daemon=True)
+        self.reported_drops = 0
+
+    def start(self):
+        self.writer.start()
+
+    def stop(self, timeout=2.0):
+        if self.writer.is_alive():
+            self.records.put(self.STOP)
+            self.handler.urgent.set()
+            self.writer.join(timeout)
+        self.file_handler.close()
+
+    def write(self):
+        #Wake on the first record of a batch, give the rest the flush interval to arrive, then
+        #write them all with one flush. Waking per record would fight the caller for the GIL.
+        while True:
+            batch = [self.records.get()]
+            self.handler.urgent.wait(LOG_FLUSH_INTERVAL)
+            self.handler.urgent.clear()
+            while not self.records.empty():
+                batch.append(self.records.get())
+
+            for record in batch:
+                if record is self.STOP:
+                    self.file_handler.flush()
+                    return
+                self.file_handler.handle(record)
+            self.report_drops()
+            self.file_handler.flush()
+
+    def report_drops(self):
+        dropped = self.handler.dropped
+        if dropped > self.reported_drops:
+            self.file_handler.handle(logging.makeLogRecord({
+                'name': "logging", 'levelno': logging.WARNING, 'levelname': "WARNING",
+                'msg': f"Log queue full, {dropped - self.reported_drops} records dropped"}))
+            self.reported_drops = dropped
+
+
+pipeline = None
+
+
+def install(filename):
+    #(re)builds this process's pipeline and puts it behind the root logger
+    global pipeline
+
+    root = logging.getLogger()
+    if pipeline is not None:
+        root.removeHandler(pipeline.handler)
+    pipeline = LogPipeline(filename)
+    pipeline.start()
+    root.addHandler(pipeline.handler)
+    root.setLevel(logging.DEBUG)
+
+
+def shutdown():
+    if pipeline is not None:
+        pipeline.stop()
+
+
+def before_fork():
+    #hold the file still so the child doesn't inherit a half-written buffer it would flush again
+    pipeline.file_handler.acquire()
+    pipeline.file_handler.flush()
+
+
+def after_fork_in_parent():
+    pipeline.file_handler.release()
+
+
+def after_fork_in_child():
+    #the parent's writer thread doesn't exist here; its file stays the parent's
+    install(WORKER_LOG_FILE)
+
+
+def setup():
+    #Starts the writer thread and the log file. Only the programs that run the machine call
+    #this (through init_logging); a module that just logs doesn't start a writer by importing.
+    #A worker forked after this gets its own pipeline from the fork hooks already.
+    if pipeline is not None:
+        return
+
+    #the format uses no thread or process, and looking them up costs every call
+    logging.logThreads = False
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+
+    install(WORKER_LOG_FILE if multiprocessing.parent_process() is not None else LOG_FILE)
+    atexit.register(shutdown)
+    os.register_at_fork(before=before_fork, after_in_parent=after_fork_in_parent,
+                        after_in_child=after_fork_in_child)
 
 logger = logging.getLogger("ArchimedesApp")
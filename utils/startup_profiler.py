@@ -0,0 +1,69 @@
+import os
+import time
+
+
+PROFILE_START = time.perf_counter()
+
+phases = []
+last_mark = PROFILE_START
+
+
+class phase:
+    #with phase("imports"): ... records how long the block took
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        global last_mark
+        end = time.perf_counter()
+        phases.append((self.name, end - self.start))
+        last_mark = end
+        return False
+
+
+def mark(name):
+    #time since the previous phase or mark ended, e.g. waiting for the first paint
+    global last_mark
+    now = time.perf_counter()
+    phases.append((name, now - last_mark))
+    last_mark = now
+
+
+def seconds_since_boot():
+    try:
+        with open("/proc/uptime") as f:
+            return float(f.read().split()[0])
+    except (OSError, ValueError):
+        return None
+
+
+def process_age():
+    #how long ago the interpreter started, which is before this module was imported
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        return seconds_since_boot() - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, TypeError):
+        return None
+
+
+def report(logger):
+    lines = [f"{name}: {seconds * 1000:.1f} ms" for name, seconds in phases]
+    total = time.perf_counter() - PROFILE_START
+
+    message = f"Startup phases - {', '.join(lines)} - ready {total * 1000:.1f} ms after launch"
+
+    age = process_age()
+    if age is not None:
+        message += f", {age:.2f} s after the process started"
+
+    uptime = seconds_since_boot()
+    if uptime is not None:
+        message += f", {uptime:.1f} s after boot"
+
+    logger.info(message)
+    return message